@@ -0,0 +1,155 @@
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+from psycopg.types.json import Json
+
+from . import queries as Q
+from .db import pool
+from .masking import masker
+
+logger = logging.getLogger(__name__)
+
+# sync  = durable: writes call audit.log_event inside the user's transaction (default)
+# async = writes are enqueued too; everything is flushed by the background sink
+AUDIT_MODE = os.getenv("AUDIT_MODE", "sync").strip().lower()
+AUDIT_DURABLE = AUDIT_MODE != "async"
+# Audit GET /config and GET /secret reads (always through the sink)
+AUDIT_READS = os.getenv("AUDIT_READS", "false").strip().lower() in ("1", "true", "yes")
+
+AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+# Backpressure when the queue is full: "block" (wait up to AUDIT_BLOCK_TIMEOUT, then drop) or "drop"
+AUDIT_OVERFLOW = os.getenv("AUDIT_OVERFLOW", "block").strip().lower()
+AUDIT_BLOCK_TIMEOUT = float(os.getenv("AUDIT_BLOCK_TIMEOUT", "0.05"))
+
+COPY_SQL = "copy audit.audit_logs(actor_id, actor_subject, action, path, extra) from stdin"
+
+_STOP = object()
+
+
+class AuditSink:
+    """
+    Bounded in-process queue of audit events, flushed by one background thread
+    with COPY into the partitioned audit.audit_logs. A batch is flushed when it
+    reaches `batch_size` events or `flush_interval` seconds have passed. If the
+    COPY fails, the batch is inserted event by event, so only rejected events
+    are dropped.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = AUDIT_QUEUE_MAX,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+        overflow: str = AUDIT_OVERFLOW,
+        block_timeout: float = AUDIT_BLOCK_TIMEOUT,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._q: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.flush_errors = 0
+
+    def emit(self, actor_id: str, actor_subject: str, action: str, path: str, extra: dict,
+             block: bool = True) -> bool:
+        """
+        Enqueue one event; returns False if it was dropped by the overflow policy.
+        Callers on the event loop pass block=False: a full queue then drops at
+        once instead of stalling every coroutine for up to block_timeout.
+        """
+        ev = (actor_id, actor_subject, action, path, extra)
+        try:
+            if block and self.overflow == "block":
+                self._q.put(ev, timeout=self.block_timeout)
+            else:
+                self._q.put_nowait(ev)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Audit queue full, dropped %s event for %s", action, path)
+            return False
+        self.enqueued += 1
+        return True
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="audit-sink", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush everything queued so far, then stop the flusher."""
+        if not self._thread:
+            return
+        self._q.put(_STOP)  # blocks if full; the flusher is draining
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "mode": "durable" if AUDIT_DURABLE else "async",
+            "queued": self._q.qsize(),
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "flush_errors": self.flush_errors,
+        }
+
+    def _run(self) -> None:
+        batch: list[tuple] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                ev = self._q.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                ev = None
+            stopping = ev is _STOP
+            if ev is not None and not stopping:
+                batch.append(ev)
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+            if stopping:
+                return
+
+    def _flush(self, batch: list[tuple]) -> None:
+        # Masked here, off the request path; stored (and /audit) never hold secrets
+        rows = [(actor_id, actor_subject, action, path, Json(masker.mask(extra)))
+                for actor_id, actor_subject, action, path, extra in batch]
+        try:
+            with pool.connection() as conn, conn.cursor() as cur:
+                with cur.copy(COPY_SQL) as cp:
+                    for row in rows:
+                        cp.write_row(row)
+                conn.commit()
+            self.flushed += len(rows)
+            return
+        except Exception as e:
+            self.flush_errors += 1
+            logger.error("Audit COPY of %d events failed, inserting them one by one: %s", len(rows), e)
+        self._insert_rows(rows)
+
+    def _insert_rows(self, rows: list[tuple]) -> None:
+        """Fallback: one audit.log_event per event, so a bad row only loses itself."""
+        for row in rows:
+            try:
+                with pool.connection() as conn:
+                    conn.execute(Q.AUDIT_LOG_EVENT, row)
+                    conn.commit()
+                self.flushed += 1
+            except Exception as e:
+                self.dropped += 1
+                logger.error("Audit event %s for %s dropped: %s", row[2], row[3], e)
+
+sink = AuditSink()
@@ -1,12 +1,24 @@
 import os
+import json
+import time
+import hashlib
 import logging
+import threading
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Optional
 from fastapi import Header, HTTPException
 
 import jwt  # PyJWT
 
+from .cache import LRUCache
+from .logging_config import RateLimitFilter, bind_principal
+from .metrics import JWT_VERIFY_LATENCY
+from . import timing
+from .verify_jwt import read_key_material
+
 logger = logging.getLogger(__name__)
+# One line per bad request would turn a credential-stuffing burst into a logging bottleneck
+logger.addFilter(RateLimitFilter())
 
 AUTH_TYPE = os.getenv("AUTH_TYPE", "API_KEY").strip().upper()
 
@@ -18,6 +30,16 @@ JWT_ALG = os.getenv("JWT_ALG", "HS256")
 JWT_SIGNING_KEY = os.getenv("JWT_SIGNING_KEY", "")
 JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "confmgr")
 ISSUER = os.getenv("ISSUER", "")
+# RS256/ES256: PEM string or path (same rules as verify_jwt.py)
+JWT_PUBLIC_KEY = os.getenv("JWT_PUBLIC_KEY", "")
+# JWKS document (path or inline JSON); keys are selected by the token's `kid`
+JWT_JWKS_FILE = os.getenv("JWT_JWKS_FILE", "")
+JWT_JWKS_CHECK_INTERVAL = float(os.getenv("JWT_JWKS_CHECK_INTERVAL", "5"))
+JWT_ALGS = [a.strip().upper() for a in os.getenv("JWT_ALGS", JWT_ALG).split(",") if a.strip()]
+
+# Verified-token cache (per worker; 0 disables). Entries also expire at the token's exp.
+JWT_CACHE_MAX = int(os.getenv("JWT_CACHE_MAX", "10000"))
+JWT_CACHE_TTL = float(os.getenv("JWT_CACHE_TTL", "300"))
 
 @dataclass
 class AuthPrincipal:
@@ -26,6 +48,128 @@ class AuthPrincipal:
     subject: Optional[str] = None
     issuer: Optional[str] = None
     scopes: Optional[list[str]] = None
+    # Authenticated with the shared API key rather than a bearer token
+    api_key: bool = False
+
+class KeyProvider:
+    """
+    Resolves the verification key for a token.
+
+    With a JWKS source, keys are indexed by `kid`; if the source is a file it
+    is re-read when its mtime changes (checked at most every `check_interval`
+    seconds), and a failed reload keeps the previous keys. While no keys are
+    loaded the source is retried on the same interval. Without one, the
+    single static key is used (JWT_SIGNING_KEY for HS*, JWT_PUBLIC_KEY otherwise).
+    """
+
+    def __init__(self, jwks: str = "", static_key: Optional[str] = None,
+                 check_interval: float = JWT_JWKS_CHECK_INTERVAL):
+        self.jwks = jwks
+        self.static_key = static_key
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.reload_errors = 0
+        self._keys: dict[Optional[str], jwt.PyJWK] = {}
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        if jwks:
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            mtime = os.stat(self.jwks).st_mtime if os.path.exists(self.jwks) else None
+            doc = json.loads(read_key_material(self.jwks))
+            keys = {}
+            for k in doc.get("keys", []):
+                if k.get("use", "sig") != "sig":
+                    continue
+                keys[k.get("kid")] = jwt.PyJWK(k)
+        except Exception as e:
+            self.reload_errors += 1
+            logger.error("JWKS load failed, keeping %d previous keys: %s", len(self._keys), e)
+            return
+        self._keys, self._mtime = keys, mtime
+        self.reloads += 1
+        _VERIFIED.clear()  # a removed key must not keep validating cached tokens
+        logger.info("JWKS loaded: %d keys", len(keys))
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now < self._next_check or (self._mtime is None and self._keys):
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            if not self._keys:
+                # Missing or malformed so far (e.g. at startup): retry until it loads
+                self._load()
+                return
+            try:
+                changed = os.stat(self.jwks).st_mtime != self._mtime
+            except OSError:
+                return
+            if changed:
+                self._load()
+
+    def key_for(self, token: str) -> tuple[Any, list[str]]:
+        """Return (key, allowed algorithms) for `token`; raises jwt.InvalidTokenError."""
+        if not self.jwks:
+            return self.static_key, JWT_ALGS
+        self._maybe_reload()
+        kid = jwt.get_unverified_header(token).get("kid")
+        keys = self._keys
+        jwk = keys.get(kid)
+        if jwk is None and kid is None and len(keys) == 1:
+            jwk = next(iter(keys.values()))
+        if jwk is None:
+            raise jwt.InvalidTokenError(f"unknown kid {kid!r}")
+        algs = [jwk.algorithm_name] if jwk.algorithm_name in JWT_ALGS else []
+        if not algs:
+            raise jwt.InvalidAlgorithmError(f"key {kid!r} algorithm {jwk.algorithm_name} not allowed")
+        return jwk.key, algs
+
+    def stats(self) -> dict:
+        return {
+            "source": "jwks" if self.jwks else "static",
+            "keys": len(self._keys) if self.jwks else 1,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+        }
+
+
+# sha256(token) -> (AuthPrincipal, exp)
+_VERIFIED = LRUCache("jwt", JWT_CACHE_MAX, JWT_CACHE_TTL)
+
+_verify_lock = threading.Lock()
+_verify_stats = {"count": 0, "total_s": 0.0, "max_s": 0.0}
+
+def _record_verify(elapsed: float) -> None:
+    JWT_VERIFY_LATENCY.observe(elapsed)
+    timing.add("jwt", elapsed)
+    with _verify_lock:
+        _verify_stats["count"] += 1
+        _verify_stats["total_s"] += elapsed
+        _verify_stats["max_s"] = max(_verify_stats["max_s"], elapsed)
+
+def _static_key() -> Optional[str]:
+    if JWT_ALGS and JWT_ALGS[0].startswith("HS"):
+        return JWT_SIGNING_KEY
+    return read_key_material(JWT_PUBLIC_KEY)
+
+key_provider = KeyProvider(JWT_JWKS_FILE, _static_key()) if AUTH_TYPE == "BEARER" else KeyProvider()
+
+def auth_stats() -> dict:
+    """Signature verification counters (cache hits skip verification entirely)."""
+    with _verify_lock:
+        n = _verify_stats["count"]
+        verify = {
+            "count": n,
+            "avg_ms": round(_verify_stats["total_s"] / n * 1000, 3) if n else 0.0,
+            "max_ms": round(_verify_stats["max_s"] * 1000, 3),
+        }
+    return {"verify": verify, "keys": key_provider.stats()}
 
 def _unauth(detail: str):
     logger.warning("Auth failed: %s", detail)
@@ -38,7 +182,8 @@ def _require_api_key(x_api_key: str | None = Header(default=None, alias="X-API-K
         _unauth("Missing X-API-Key header")
     if x_api_key != API_KEY:
         _unauth("Invalid API key")
-    return AuthPrincipal(id="api-key")
+    bind_principal("api-key")
+    return AuthPrincipal(id="api-key", api_key=True)
 
 def _require_bearer(authorization: str | None = Header(default=None)) -> AuthPrincipal:
     if not authorization:
@@ -48,22 +193,35 @@ def _require_bearer(authorization: str | None = Header(default=None)) -> AuthPri
         _unauth("Malformed Authorization header")
 
     token = parts[1]
+    digest = hashlib.sha256(token.encode()).digest()
+    hit = _VERIFIED.get(digest)
+    if hit is not None and hit[1] > time.time():
+        bind_principal(hit[0].id)
+        return hit[0]
+
     try:
+        t0 = time.perf_counter()
+        key, algorithms = key_provider.key_for(token)
         payload = jwt.decode(
             token,
-            JWT_SIGNING_KEY,
-            algorithms=[JWT_ALG],
+            key,
+            algorithms=algorithms,
             audience=JWT_AUDIENCE,
             issuer=ISSUER,
             leeway=30,
             options={"require": ["exp", "iat", "sub"]},
         )
-        return AuthPrincipal(
+        _record_verify(time.perf_counter() - t0)
+        principal = AuthPrincipal(
             id=payload["sub"],
             subject=payload.get("sub"),
             issuer=payload.get("iss"),
             scopes=payload.get("scope", "").split() if "scope" in payload else None
         )
+        # Cached only until exp (without the decode leeway)
+        _VERIFIED.put(digest, (principal, float(payload["exp"])))
+        bind_principal(principal.id)
+        return principal
     except jwt.ExpiredSignatureError:
         _unauth("Token expired")
     except jwt.InvalidAudienceError:
@@ -85,4 +243,4 @@ def resolve_created_by(principal: AuthPrincipal, x_actor_id: str | None) -> str:
 require_api_key = _require_api_key
 require_bearer = _require_bearer
 
-__all__ = ["require_api_key", "require_bearer", "AuthPrincipal", "resolve_created_by"]
\ No newline at end of file
+__all__ = ["require_api_key", "require_bearer", "AuthPrincipal", "resolve_created_by", "auth_stats"]
\ No newline at end of file
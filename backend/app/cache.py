@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+# Registry of named caches, used by the diagnostic stats endpoint
+CACHES: dict[str, "LRUCache"] = {}
+
+
+class LRUCache:
+    """
+    Thread-safe bounded LRU cache with a per-entry TTL.
+
+    - max_size == 0 disables the cache (get always misses, put is a no-op)
+    - with a weigher, max_size bounds the sum of weigher(value) (e.g. bytes)
+      instead of the entry count
+    - expired entries are swept at most every ttl/2 seconds, from get/put and
+      from the CacheSweeper thread, so they are dropped even on an idle worker
+    - generation is bumped on every invalidation; a loader that read the
+      generation before going to the DB passes it to put(), so a row loaded
+      concurrently with a write is never stored
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int,
+        ttl: float,
+        weigher: Optional[Callable[[Any], int]] = None,
+    ):
+        self.name = name
+        self.max_size = max(0, max_size)
+        self.ttl = ttl
+        self.weigher = weigher
+        self.weight = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._data: "OrderedDict[Hashable, tuple[float, int, Any]]" = OrderedDict()
+        self._next_sweep = time.monotonic() + ttl / 2
+        self._lock = threading.Lock()
+        CACHES[name] = self
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.max_size:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, _, value = entry
+            if expires_at <= now:
+                self._drop(key)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        if not self.max_size:
+            return
+        w = self.weigher(value) if self.weigher else 1
+        if w > self.max_size:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if now >= self._next_sweep:
+                self._sweep(now)
+            self._drop(key)
+            self._data[key] = (now + self.ttl, w, value)
+            self.weight += w
+            while self.weight > self.max_size:
+                old_key = next(iter(self._data))
+                self._drop(old_key)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            self._data.clear()
+            self.weight = 0
+
+    def sweep(self) -> None:
+        """Drop expired entries if a sweep is due (called by CacheSweeper)."""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.weight -= entry[1]
+
+    def _sweep(self, now: float) -> None:
+        expired = [k for k, (exp, _, _) in self._data.items() if exp <= now]
+        for k in expired:
+            self._drop(k)
+        self.evictions += len(expired)
+        self._next_sweep = now + self.ttl / 2
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "weight": self.weight,
+                "max_size": self.max_size,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def cache_stats() -> dict[str, dict]:
+    """Snapshot of counters for every registered cache."""
+    return {name: c.stats() for name, c in CACHES.items()}
+
+
+class CacheSweeper:
+    """
+    Background thread sweeping every registered cache, so decrypted values
+    past their TTL leave memory without waiting for the next get/put.
+    """
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def sweep(self) -> None:
+        for c in list(CACHES.values()):
+            c.sweep()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sweep()
+
+
+sweeper = CacheSweeper()
@@ -1,6 +1,11 @@
-import os, base64, secrets
+import os, base64, secrets, asyncio, zlib, lzma
+from concurrent.futures import ThreadPoolExecutor
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
+from .cache import LRUCache
+from .metrics import CRYPTO_LATENCY
+from .timing import span
+
 # 32 байта (256 бит) в hex. Пример: openssl rand -hex 32
 MASTER_KEY_HEX = os.getenv("DATA_KEY_HEX")
 if not MASTER_KEY_HEX:
@@ -16,6 +21,167 @@ def seal(plaintext: bytes, aad: bytes | None = None) -> tuple[bytes, bytes]:
 def open_sealed(nonce: bytes, ct: bytes, aad: bytes | None = None) -> bytes:
     return _MASTER.decrypt(nonce, ct, aad)
 
+# ---------- Compression ----------
+# Ciphertext does not compress (TOAST cannot help), so large plaintexts are
+# compressed before sealing. Frame: b"\x00" + alg byte + compressed bytes.
+# Canonical JSON never starts with NUL, so unframed rows read unchanged.
+# SECRET_COMPRESS=none|zlib|lzma; opt-in, because the stored length then
+# depends on the content (a length side channel for partly attacker-controlled
+# secrets). Only payloads >= SECRET_COMPRESS_MIN bytes are tried, and the
+# frame is kept only if it is smaller.
+SECRET_COMPRESS = os.getenv("SECRET_COMPRESS", "none").strip().lower()
+SECRET_COMPRESS_MIN = int(os.getenv("SECRET_COMPRESS_MIN", "1024"))
+
+_FRAME = b"\x00"
+_CODECS = {
+    "zlib": (b"z", lambda b: zlib.compress(b, 6), zlib.decompress),
+    "lzma": (b"x", lzma.compress, lzma.decompress),
+}
+_DECODERS = {tag: dec for tag, _, dec in _CODECS.values()}
+if SECRET_COMPRESS not in _CODECS and SECRET_COMPRESS != "none":
+    raise RuntimeError(f"Invalid SECRET_COMPRESS '{SECRET_COMPRESS}' (zlib, lzma or none)")
+
+def pack_plaintext(plaintext: bytes, alg: str | None = None) -> bytes:
+    """Compress `plaintext` for sealing when it is large enough to pay off (alg: SECRET_COMPRESS)."""
+    alg = alg or SECRET_COMPRESS
+    if alg == "none" or len(plaintext) < SECRET_COMPRESS_MIN or plaintext[:1] == _FRAME:
+        return plaintext
+    tag, enc, _ = _CODECS[alg]
+    framed = _FRAME + tag + enc(plaintext)
+    return framed if len(framed) < len(plaintext) else plaintext
+
+def unpack_plaintext(data: bytes) -> bytes:
+    if data[:1] != _FRAME:
+        return data
+    dec = _DECODERS.get(data[1:2])
+    if dec is None:
+        raise ValueError(f"unknown compression tag {data[1:2]!r}")
+    return dec(data[2:])
+
+# ---------- Envelope encryption ----------
+# Secret versions with alg AES256-GCM-ENV are encrypted with a per-item data key
+# (DEK). The DEK is stored on core.secret_items wrapped by a master key (KEK)
+# identified by kek_id, so rotating the KEK only re-wraps one small blob per item
+# (python -m app.rekey). Rows with the legacy alg are sealed with DATA_KEY_HEX.
+#
+# MASTER_KEYS="2024:<hex>,2025:<hex>"  MASTER_KEY_ID=2025 (default: last listed)
+# Unset: one KEK "default" = DATA_KEY_HEX.
+LEGACY_ALG = "AES256-GCM"
+ENVELOPE_ALG = "AES256-GCM-ENV"
+SECRET_ALGS = (LEGACY_ALG, ENVELOPE_ALG)
+
+def _parse_master_keys(spec: str) -> dict[str, AESGCM]:
+    keys = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        kid, _, hexkey = part.partition(":")
+        if not kid or len(hexkey) != 64:
+            raise RuntimeError(f"Invalid MASTER_KEYS entry '{kid}' (expected id:<64 hex chars>)")
+        keys[kid] = AESGCM(bytes.fromhex(hexkey))
+    return keys
+
+_KEKS = _parse_master_keys(os.getenv("MASTER_KEYS", "")) or {"default": _MASTER}
+MASTER_KEY_ID = os.getenv("MASTER_KEY_ID") or list(_KEKS)[-1]
+if MASTER_KEY_ID not in _KEKS:
+    raise RuntimeError(f"MASTER_KEY_ID '{MASTER_KEY_ID}' is not in MASTER_KEYS")
+
+# (item_id, dek_nonce) -> AESGCM(dek). A re-wrap changes dek_nonce, so stale
+# entries simply age out; the DEK itself never changes.
+DEK_CACHE = LRUCache(
+    "dek",
+    max_size=int(os.getenv("DEK_CACHE_MAX", "10000")),
+    ttl=float(os.getenv("DEK_CACHE_TTL", "300")),
+)
+
+def _dek_aad(item_id: int) -> bytes:
+    # Binds a wrapped DEK to its item: it cannot be copied onto another row
+    return f"dek|{item_id}".encode()
+
+def wrap_dek(dek: bytes, item_id: int, kek_id: str = MASTER_KEY_ID) -> tuple[bytes, bytes]:
+    """Wrap `dek` with master key `kek_id`; returns (dek_nonce, wrapped_dek)."""
+    nonce = secrets.token_bytes(12)
+    return nonce, _KEKS[kek_id].encrypt(nonce, dek, _dek_aad(item_id))
+
+def unwrap_dek(item_id: int, kek_id: str, dek_nonce: bytes, wrapped_dek: bytes) -> bytes:
+    kek = _KEKS.get(kek_id)
+    if kek is None:
+        raise KeyError(f"master key '{kek_id}' is not loaded (MASTER_KEYS)")
+    return kek.decrypt(dek_nonce, wrapped_dek, _dek_aad(item_id))
+
+def new_item_dek(item_id: int) -> tuple[AESGCM, bytes, bytes, str]:
+    """Fresh DEK for an item; returns (aead, dek_nonce, wrapped_dek, kek_id)."""
+    dek = AESGCM.generate_key(bit_length=256)
+    nonce, wrapped = wrap_dek(dek, item_id)
+    aead = AESGCM(dek)
+    DEK_CACHE.put((item_id, bytes(nonce)), aead)
+    return aead, nonce, wrapped, MASTER_KEY_ID
+
+def item_dek(item_id: int, kek_id: str, dek_nonce: bytes, wrapped_dek: bytes) -> AESGCM:
+    """AEAD for an item's DEK, unwrapped at most once per DEK_CACHE_TTL."""
+    key = (item_id, bytes(dek_nonce))
+    aead = DEK_CACHE.get(key)
+    if aead is None:
+        aead = AESGCM(unwrap_dek(item_id, kek_id, dek_nonce, wrapped_dek))
+        DEK_CACHE.put(key, aead)
+    return aead
+
+def writer_dek(item: dict) -> tuple[AESGCM, tuple[bytes, bytes, str] | None]:
+    """
+    DEK for sealing a new version of a locked item (Q.SECRET_LOCK_ITEM row).
+    The second value is (dek_nonce, wrapped_dek, kek_id) to store with
+    Q.SECRET_SET_DEK when the item has no DEK yet, else None.
+    """
+    if item["wrapped_dek"] is not None:
+        return item_dek(item["id"], item["kek_id"], item["dek_nonce"], item["wrapped_dek"]), None
+    aead, nonce, wrapped, kek_id = new_item_dek(item["id"])
+    return aead, (nonce, wrapped, kek_id)
+
+def seal_item(aead: AESGCM, plaintext: bytes, aad: bytes) -> tuple[bytes, bytes]:
+    """Seal a new secret version (compressing it first, see pack_plaintext)."""
+    with CRYPTO_LATENCY.time("seal"), span("crypto"):
+        nonce = secrets.token_bytes(12)
+        return nonce, aead.encrypt(nonce, pack_plaintext(plaintext), aad)
+
+def open_row(row: dict, aad: bytes) -> bytes:
+    """
+    Decrypt one secret_versions row. Envelope rows need item_id, kek_id,
+    dek_nonce and wrapped_dek from the joined secret_items row.
+    """
+    with CRYPTO_LATENCY.time("open"), span("crypto"):
+        return _open_row(row, aad)
+
+def _open_row(row: dict, aad: bytes) -> bytes:
+    if row["alg"] == ENVELOPE_ALG:
+        aead = item_dek(row["item_id"], row["kek_id"], row["dek_nonce"], row["wrapped_dek"])
+        return unpack_plaintext(aead.decrypt(row["nonce"], row["ciphertext"], aad))
+    if row["alg"] == LEGACY_ALG:
+        return unpack_plaintext(open_sealed(row["nonce"], row["ciphertext"], aad))
+    raise ValueError(f"unsupported alg {row['alg']!r}")
+
+# AES-GCM in `cryptography` releases the GIL, so batches decrypt in parallel.
+# Small batches stay inline: thread hand-off costs more than a few decrypts.
+CRYPTO_WORKERS = int(os.getenv("CRYPTO_WORKERS", str(min(8, os.cpu_count() or 1))))
+CRYPTO_PARALLEL_MIN = int(os.getenv("CRYPTO_PARALLEL_MIN", "8"))
+_EXECUTOR = ThreadPoolExecutor(max_workers=CRYPTO_WORKERS, thread_name_prefix="crypto")
+
+def _open_or_error(item: tuple[dict, bytes]) -> bytes | Exception:
+    try:
+        return open_row(*item)
+    except Exception as e:  # InvalidTag etc.; reported per item
+        return e
+
+def open_many(items: list[tuple[dict, bytes]]) -> list[bytes | Exception]:
+    """Decrypt (row, aad) pairs (see open_row); failures are returned in place, not raised."""
+    if len(items) < CRYPTO_PARALLEL_MIN:
+        return [_open_or_error(i) for i in items]
+    # Executor threads have no request context: the batch counts as one span
+    with span("crypto"):
+        return list(_EXECUTOR.map(_open_or_error, items))
+
+async def run_crypto(fn, *args):
+    """Run seal/open off the event loop (async serving mode)."""
+    with span("crypto"):
+        return await asyncio.get_running_loop().run_in_executor(_EXECUTOR, fn, *args)
+
 def b64(x: bytes) -> str:
     return base64.b64encode(x).decode("ascii")
 
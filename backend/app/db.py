@@ -1,25 +1,174 @@
-import os, psycopg
-from psycopg_pool import ConnectionPool  # встроен в psycopg[binary]
+import os, time, asyncio, logging, psycopg
+from psycopg_pool import ConnectionPool, AsyncConnectionPool  # встроен в psycopg[binary]
+
+from .metrics import POOLS, TimedCursor, TimedAsyncCursor
+from . import queries as Q
+from . import timing
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# How long startup waits for DB_POOL_MIN connections before serving anyway
+DB_POOL_WARM_TIMEOUT = float(os.getenv("DB_POOL_WARM_TIMEOUT", "10"))
+# Server-side prepare of Q.PREPARE_ON_CONNECT on every new connection
+# (turn off behind a transaction-pooling pgbouncer)
+DB_PREPARE = os.getenv("DB_PREPARE", "true").strip().lower() in ("1", "true", "yes")
 
 def _conn_str() -> str:
     # libpq варианты читаются из окружения (PGHOST, PGUSER, PGDATABASE и т.д.)
     return ""
 
-pool = ConnectionPool(
-    conninfo=_conn_str(),
-    kwargs=dict(
-        host=os.getenv("PGHOST", "postgres"),
-        dbname=os.getenv("PGDATABASE", "postgres"),
-        user=os.getenv("PGUSER", "confmgr_db"),
-        sslmode=os.getenv("PGSSLMODE", "verify-full"),
-        sslrootcert=os.getenv("PGSSLROOTCERT"),
-        sslcert=os.getenv("PGSSLCERT"),
-        sslkey=os.getenv("PGSSLKEY"),
+def _conn_kwargs(prefix: str = "") -> dict:
+    # prefix="REPLICA_": REPLICA_PGHOST etc., each falling back to the primary's PG* value
+    def env(name, default=None):
+        return os.getenv(prefix + name, os.getenv(name, default))
+    return dict(
+        host=env("PGHOST", "postgres"),
+        port=env("PGPORT"),
+        dbname=env("PGDATABASE", "postgres"),
+        user=env("PGUSER", "confmgr_db"),
+        sslmode=env("PGSSLMODE", "verify-full"),
+        sslrootcert=env("PGSSLROOTCERT"),
+        sslcert=env("PGSSLCERT"),
+        sslkey=env("PGSSLKEY"),
         connect_timeout=5,
-    ),
-    max_size=int(os.getenv("DB_POOL_MAX", "10")),
+    )
+
+# Read replica (hot standby) for GET handlers; unset = everything on the primary
+REPLICA_PGHOST = os.getenv("REPLICA_PGHOST", "").strip()
+REPLICA_POOL_MAX = int(os.getenv("REPLICA_POOL_MAX", str(DB_POOL_MAX)))
+
+def _configure(conn: psycopg.Connection) -> None:
+    """
+    Pool configure callback. Runs every hot statement once with prepare=True so
+    psycopg keeps it prepared on this connection: the first real request skips
+    parse/plan instead of waiting for the 5th execution (prepare_threshold).
+    """
+    if not DB_PREPARE:
+        return
+    for sql, params in Q.PREPARE_ON_CONNECT:
+        try:
+            conn.execute(sql, params, prepare=True)
+        except psycopg.Error as e:  # e.g. schema not migrated yet: still usable
+            logger.warning("PREPARE failed on new connection: %s", e)
+        conn.rollback()
+
+async def _aconfigure(conn: psycopg.AsyncConnection) -> None:
+    """Async twin of _configure for make_async_pool()."""
+    if not DB_PREPARE:
+        return
+    for sql, params in Q.PREPARE_ON_CONNECT:
+        try:
+            await conn.execute(sql, params, prepare=True)
+        except psycopg.Error as e:
+            logger.warning("PREPARE failed on new connection: %s", e)
+        await conn.rollback()
+
+class TimedPool(ConnectionPool):
+    """Pool whose checkout wait counts as the "pool" phase of the current request (timing.py)."""
+
+    def getconn(self, timeout: float | None = None):
+        t0 = time.perf_counter()
+        try:
+            return super().getconn(timeout)
+        finally:
+            timing.add("pool", time.perf_counter() - t0)
+
+class TimedAsyncPool(AsyncConnectionPool):
+    """Async twin of TimedPool."""
+
+    async def getconn(self, timeout: float | None = None):
+        t0 = time.perf_counter()
+        try:
+            return await super().getconn(timeout)
+        finally:
+            timing.add("pool", time.perf_counter() - t0)
+
+# Opened by the app lifespan (main.py) or a CLI via warm_pool() / pool.open()
+pool = TimedPool(
+    conninfo=_conn_str(),
+    kwargs={**_conn_kwargs(), "cursor_factory": TimedCursor},
+    min_size=min(DB_POOL_MIN, DB_POOL_MAX),
+    max_size=DB_POOL_MAX,
     timeout=10,
+    configure=_configure,
+    open=False,
 )
+POOLS["sync"] = pool
+
+# Same statements prepared; opened next to `pool` (see replica.py for routing)
+replica_pool = TimedPool(
+    conninfo=_conn_str(),
+    kwargs={**_conn_kwargs("REPLICA_"), "cursor_factory": TimedCursor},
+    min_size=min(DB_POOL_MIN, REPLICA_POOL_MAX),
+    max_size=REPLICA_POOL_MAX,
+    timeout=10,
+    configure=_configure,
+    open=False,
+    name="replica",
+) if REPLICA_PGHOST else None
+if replica_pool is not None:
+    POOLS["replica"] = replica_pool
+
+# Per-worker max_size chosen by app.serve from the connection budget. Applied
+# by warm_pool()/awarm_pool(): psycopg_pool can only resize an open pool, and
+# pools must stay closed until after the fork.
+POOL_MAX_OVERRIDE: int | None = None
+
+def _sizes(p) -> tuple[int, int]:
+    # Never raise min_size: only max_size is budgeted
+    return min(p.min_size, POOL_MAX_OVERRIDE), POOL_MAX_OVERRIDE
+
+def warm_pool(p: ConnectionPool, timeout: float = DB_POOL_WARM_TIMEOUT) -> int:
+    """
+    Open `p` and wait up to `timeout` for its min_size connections; returns how
+    many are idle and ready. Unlike pool.open(wait=True) an unreachable database
+    does not close the pool: it keeps connecting in the background and /readyz
+    reports not ready until it succeeds.
+    """
+    p.open(wait=False)
+    if POOL_MAX_OVERRIDE:
+        p.resize(*_sizes(p))
+    deadline = time.monotonic() + timeout
+    while p.get_stats()["pool_available"] < p.min_size and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return p.get_stats()["pool_available"]
+
+def make_async_pool(replica: bool = False) -> AsyncConnectionPool | None:
+    """
+    Async pool for the async serving mode (main_async.py); opened in its lifespan.
+    replica=True returns the REPLICA_* pool, or None when no replica is configured.
+    """
+    if replica and not REPLICA_PGHOST:
+        return None
+    max_size = REPLICA_POOL_MAX if replica else DB_POOL_MAX
+    apool = TimedAsyncPool(
+        conninfo=_conn_str(),
+        kwargs={**_conn_kwargs("REPLICA_" if replica else ""), "cursor_factory": TimedAsyncCursor},
+        min_size=min(DB_POOL_MIN, max_size),
+        max_size=max_size,
+        timeout=10,
+        configure=_aconfigure,
+        open=False,
+        name="async_replica" if replica else None,
+    )
+    POOLS["async_replica" if replica else "async"] = apool
+    return apool
+
+async def awarm_pool(p: AsyncConnectionPool, timeout: float = DB_POOL_WARM_TIMEOUT) -> int:
+    """warm_pool() for an AsyncConnectionPool."""
+    await p.open(wait=False)
+    if POOL_MAX_OVERRIDE:
+        await p.resize(*_sizes(p))
+    deadline = time.monotonic() + timeout
+    while p.get_stats()["pool_available"] < p.min_size and time.monotonic() < deadline:
+        await asyncio.sleep(0.02)
+    return p.get_stats()["pool_available"]
+
+def connect(autocommit: bool = True) -> psycopg.Connection:
+    """Dedicated connection outside the pool (e.g. for long-lived LISTEN)."""
+    return psycopg.connect(_conn_str(), autocommit=autocommit, **_conn_kwargs())
 
 def qrow(sql: str, params: tuple | None = None):
     with pool.connection() as conn:
@@ -0,0 +1,65 @@
+# app/fastjson.py
+# Pre-encoded JSON for the hot config/secret paths.
+#
+# Handlers return these bytes in a plain Response, which FastAPI passes through
+# without response_model validation or another encode; the response_model on
+# the route still documents the shape. Bodies carry the same fields in the
+# same order as the model. JSON values that are already encoded (secret
+# plaintext, canonical config bytes, jsonb::text) are spliced in as-is.
+#
+# dumps() uses orjson (JSON_ENCODER=json switches to the stdlib). Both render
+# the same JSON values; only exponent floats differ in spelling (1e16 vs
+# 1e+16). canonical() always uses the stdlib: checksums and sealed plaintext
+# must stay byte-identical to what earlier versions stored.
+import json
+import os
+from typing import Any, Optional
+
+import orjson
+from fastapi import Response
+
+from .timing import span
+
+if os.getenv("JSON_ENCODER", "").strip().lower() == "json":
+    orjson = None
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON, as FastAPI's JSONResponse would render it."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:  # e.g. integers beyond 64 bits: the stdlib handles them
+            pass
+    return _encoder.encode(obj).encode()
+
+
+def canonical(obj: Any) -> bytes:
+    """Sorted-key compact JSON used for checksums and secret plaintext."""
+    with span("encode"):
+        return json.dumps(obj, separators=(",", ":"), sort_keys=True).encode()
+
+
+def config_body(path: str, version: int, value: bytes, created_at: str) -> bytes:
+    """ConfigOut with `value` already encoded."""
+    with span("encode"):
+        return b'{"path":%s,"version":%d,"value":%s,"created_at":%s}' % (
+            dumps(path), version, value, dumps(created_at))
+
+
+def secret_body(path: str, version: int, value: bytes, created_at: str, mask_response: bool = False) -> bytes:
+    """SecretOut with `value` already encoded."""
+    with span("encode"):
+        return b'{"path":%s,"version":%d,"value":%s,"created_at":%s,"mask_response":%s}' % (
+            dumps(path), version, value, dumps(created_at), b"true" if mask_response else b"false")
+
+
+def response(body: bytes, etag: Optional[str] = None, status_code: int = 200) -> Response:
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type="application/json",
+        headers={"ETag": etag} if etag else None,
+    )
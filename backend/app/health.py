@@ -0,0 +1,120 @@
+# app/health.py
+# Liveness and readiness for probes.
+#
+# /livez answers from the process alone. /readyz (and /health, /healthz) never
+# touch the database themselves: a background thread runs `select now()` on one
+# pooled connection every HEALTH_CHECK_INTERVAL seconds and probes read that
+# cached result plus the pools' own saturation counters. Probe frequency and
+# the number of probers therefore cost Postgres nothing.
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from .db import pool
+from .metrics import POOLS, Collector
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "5"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+# A successful check older than this makes the worker unready
+HEALTH_STALE_AFTER = float(os.getenv("HEALTH_STALE_AFTER", str(3 * HEALTH_CHECK_INTERVAL)))
+# Unready while more requests than this wait for a connection in any pool (-1 disables)
+READY_MAX_WAITING = int(os.getenv("READY_MAX_WAITING", os.getenv("DB_POOL_MAX", "10")))
+
+# Roughly process start: imported with the app module
+IMPORTED_AT = time.monotonic()
+
+
+class Readiness:
+    """Periodic DB check plus startup state; status() is cheap and lock-free for readers."""
+
+    def __init__(self, interval: float = HEALTH_CHECK_INTERVAL, timeout: float = HEALTH_CHECK_TIMEOUT):
+        self.interval = interval
+        self.timeout = timeout
+        self.startup_seconds: Optional[float] = None
+        self.last_ok: Optional[float] = None  # monotonic time of the last successful check
+        self.db_time: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> bool:
+        try:
+            with pool.connection(timeout=self.timeout) as conn, conn.cursor() as cur:
+                cur.execute("select now()")
+                self.db_time = cur.fetchone()[0]
+        except Exception as e:
+            if self.error is None:
+                logger.warning("Readiness check failed: %s", e)
+            self.error = str(e) or type(e).__name__
+            return False
+        if self.error is not None:
+            logger.info("Readiness check recovered")
+        self.last_ok, self.error = time.monotonic(), None
+        return True
+
+    def mark_started(self, lifespan_seconds: float, warm: int) -> None:
+        self.startup_seconds = time.monotonic() - IMPORTED_AT
+        logger.info(
+            "Startup complete in %.0f ms (lifespan %.0f ms, %d/%d pool connections warm)",
+            self.startup_seconds * 1000, lifespan_seconds * 1000, warm, pool.min_size,
+        )
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="readiness", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.interval)
+
+    def status(self) -> tuple[bool, dict]:
+        now = time.monotonic()
+        age = None if self.last_ok is None else now - self.last_ok
+        waiting = {name: p.get_stats().get("requests_waiting", 0) for name, p in POOLS.items()}
+        saturated = [n for n, w in waiting.items() if 0 <= READY_MAX_WAITING < w]
+        reasons = []
+        if self.startup_seconds is None:
+            reasons.append("starting")
+        if age is None or age > HEALTH_STALE_AFTER:
+            reasons.append(f"database: {self.error or 'no successful check yet'}")
+        if saturated:
+            reasons.append(f"pool saturated: {', '.join(saturated)}")
+        return not reasons, {
+            "status": "ok" if not reasons else "unavailable",
+            "reasons": reasons,
+            "db_time_utc": self.db_time.isoformat() if self.db_time else None,
+            "checked_age_s": None if age is None else round(age, 3),
+            "pool_waiting": waiting,
+            "startup_s": None if self.startup_seconds is None else round(self.startup_seconds, 3),
+        }
+
+
+readiness = Readiness()
+
+
+def _health_metrics() -> list:
+    ready, _ = readiness.status()
+    samples = [
+        ("confmgr_ready", "gauge", "1 if /readyz would answer 200", [({}, int(ready))]),
+    ]
+    if readiness.startup_seconds is not None:
+        samples.append(("confmgr_startup_seconds", "gauge", "Import to end of lifespan startup",
+                        [({}, readiness.startup_seconds)]))
+    return samples
+
+
+Collector(_health_metrics)
@@ -0,0 +1,221 @@
+# app/history.py
+# Config version history with delta-encoded storage (postgres/initdb/78_config_deltas.sql).
+#
+# The current version is always stored in full, so GET /config/{path} never
+# reconstructs anything. With CONFIG_STORAGE=delta a background compactor
+# rewrites older versions as reverse JSON Patches against the next version,
+# keeping a full snapshot every CONFIG_SNAPSHOT_INTERVAL versions. Rebuilding
+# any version therefore reads and patches at most that many rows.
+#
+# CLI:
+#   python -m app.history                  # compact once, then print storage stats
+#   python -m app.history --stats-only
+import argparse
+import copy
+import json
+import logging
+import os
+import sys
+import threading
+from typing import Any, Optional
+
+from psycopg.rows import dict_row
+from psycopg.types.json import Json
+
+from . import jsonpatch
+from .cache import LRUCache
+from .db import pool
+
+logger = logging.getLogger(__name__)
+
+# full = keep every version as written (default); delta = run the compactor
+CONFIG_STORAGE = os.getenv("CONFIG_STORAGE", "full").strip().lower()
+CONFIG_SNAPSHOT_INTERVAL = max(1, int(os.getenv("CONFIG_SNAPSHOT_INTERVAL", "16")))
+CONFIG_COMPACT_INTERVAL = float(os.getenv("CONFIG_COMPACT_INTERVAL", "300"))
+CONFIG_COMPACT_BATCH = int(os.getenv("CONFIG_COMPACT_BATCH", "100"))
+
+# (item_id, version) -> reconstructed value. Versions are immutable: no invalidation.
+HISTORY_CACHE = LRUCache(
+    "config_history",
+    max_size=int(os.getenv("CONFIG_HISTORY_CACHE_MAX", "256")),
+    ttl=float(os.getenv("CONFIG_HISTORY_CACHE_TTL", "600")),
+)
+
+ITEM_ID = "select id from core.config_items where path = %s"
+
+CURRENT_VERSION = "select version from core.config_versions where item_id = %s and is_current"
+
+VERSIONS_PAGE = """
+    select version, is_current, checksum, created_at, created_by
+    from core.config_versions
+    where item_id = %s and version < %s
+    order by version desc
+    limit %s
+"""
+
+# Rows needed to rebuild `version`: itself up to the nearest full row above it
+# (the current row is always full, so the chain always ends)
+CHAIN = """
+    select version, storage, value_json, delta
+    from core.config_versions
+    where item_id = %s and version >= %s
+      and version <= (
+        select min(version) from core.config_versions
+        where item_id = %s and version >= %s and storage = 'full'
+      )
+    order by version desc
+"""
+
+COMPACT_CANDIDATES = """
+    select distinct item_id
+    from core.config_versions
+    where storage = 'full' and not is_current and version %% %s <> 0 and item_id > %s
+    order by item_id
+    limit %s
+"""
+
+LOCK_ITEM = "select id from core.config_items where id = %s for update skip locked"
+
+ITEM_VERSIONS = """
+    select version, is_current, storage, value_json, delta
+    from core.config_versions
+    where item_id = %s
+    order by version desc
+"""
+
+SET_DELTA = """
+    update core.config_versions
+    set storage = 'delta', delta = %s, value_json = null
+    where item_id = %s and version = %s and storage = 'full' and not is_current
+"""
+
+STATS = """
+    select storage, count(*) as versions,
+           coalesce(sum(pg_column_size(value_json)), 0) as value_bytes,
+           coalesce(sum(pg_column_size(delta)), 0) as delta_bytes
+    from core.config_versions
+    group by storage
+    order by storage
+"""
+
+
+def value_at(cur, item_id: int, version: int) -> Optional[Any]:
+    """
+    Value of one version, rebuilt from the nearest full row if needed.
+    Returned objects may be shared with the cache: treat them as read-only.
+    """
+    key = (item_id, version)
+    hit = HISTORY_CACHE.get(key)
+    if hit is not None:
+        return hit
+    cur.execute(CHAIN, (item_id, version, item_id, version))
+    rows = cur.fetchall()
+    if not rows or rows[-1]["version"] != version:
+        return None
+    value = rows[0]["value_json"]  # freshly decoded: safe to patch in place
+    for r in rows[1:]:
+        value = jsonpatch.apply(value, r["delta"])
+    if len(rows) > 1:
+        HISTORY_CACHE.put(key, value)
+    return value
+
+
+def compact_item(cur, item_id: int, interval: int = CONFIG_SNAPSHOT_INTERVAL) -> int:
+    """Turn eligible full versions of one (locked) item into deltas; returns rows changed."""
+    cur.execute(ITEM_VERSIONS, (item_id,))
+    updates = []
+    newer = None  # value of the next higher version
+    for r in cur.fetchall():
+        if r["storage"] == "full":
+            value = r["value_json"]
+        else:
+            value = jsonpatch.apply(copy.deepcopy(newer), r["delta"])
+        if (r["storage"] == "full" and not r["is_current"] and newer is not None
+                and r["version"] % interval != 0):
+            delta = jsonpatch.diff(newer, value)
+            # Keep the full row when the patch would not be smaller
+            if len(json.dumps(delta)) < len(json.dumps(value)):
+                updates.append((Json(delta), item_id, r["version"]))
+        newer = value
+    if updates:
+        cur.executemany(SET_DELTA, updates)
+    return len(updates)
+
+
+def compact(batch: int = CONFIG_COMPACT_BATCH, interval: int = CONFIG_SNAPSHOT_INTERVAL) -> int:
+    """One pass over every item with compactable versions; one transaction per item."""
+    done, last_id = 0, 0
+    while True:
+        with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(COMPACT_CANDIDATES, (interval, last_id, batch))
+            item_ids = [r["item_id"] for r in cur.fetchall()]
+            conn.commit()
+            for item_id in item_ids:
+                # Same lock as core.put_config: a concurrent write waits, or we skip
+                cur.execute(LOCK_ITEM, (item_id,))
+                if cur.fetchone():
+                    done += compact_item(cur, item_id, interval)
+                conn.commit()
+        if len(item_ids) < batch:
+            break
+        last_id = item_ids[-1]
+    if done:
+        logger.info("Config history: %d versions delta-encoded", done)
+    return done
+
+
+def stats() -> list[dict]:
+    with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(STATS)
+        return cur.fetchall()
+
+
+class HistoryCompactor:
+    """Runs compact() on start and then every `interval` seconds."""
+
+    def __init__(self, interval: float = CONFIG_COMPACT_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="config-history", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                compact()
+            except Exception as e:
+                logger.error("Config history compaction failed: %s", e)
+            self._stop.wait(self.interval)
+
+
+compactor = HistoryCompactor()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Delta-encode old core.config_versions rows")
+    ap.add_argument("--interval", type=int, default=CONFIG_SNAPSHOT_INTERVAL, help="keep every Nth version full")
+    ap.add_argument("--batch", type=int, default=CONFIG_COMPACT_BATCH, help="items per candidate scan")
+    ap.add_argument("--stats-only", action="store_true")
+    args = ap.parse_args()
+    pool.open(wait=True)
+
+    if not args.stats_only:
+        print(f"versions delta-encoded: {compact(args.batch, max(1, args.interval))}")
+    for r in stats():
+        print(f"{r['storage']:6s} {r['versions']:>10d} versions  value={r['value_bytes']}B  delta={r['delta_bytes']}B")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# app/jsonpatch.py
+# Minimal RFC 6902 JSON Patch used for config history deltas and /diff.
+# diff() emits only add/remove/replace; apply() understands the same three.
+from typing import Any
+
+
+class PatchError(ValueError):
+    pass
+
+
+def _escape(key: str) -> str:
+    return key.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def diff(src: Any, dst: Any) -> list[dict]:
+    """Operations that turn `src` into `dst`."""
+    ops: list[dict] = []
+    _diff(src, dst, "", ops)
+    return ops
+
+
+def _diff(src: Any, dst: Any, path: str, ops: list[dict]) -> None:
+    if isinstance(src, dict) and isinstance(dst, dict):
+        for k, v in src.items():
+            p = f"{path}/{_escape(k)}"
+            if k not in dst:
+                ops.append({"op": "remove", "path": p})
+            else:
+                _diff(v, dst[k], p, ops)
+        for k, v in dst.items():
+            if k not in src:
+                ops.append({"op": "add", "path": f"{path}/{_escape(k)}", "value": v})
+    elif isinstance(src, list) and isinstance(dst, list):
+        common = min(len(src), len(dst))
+        for i in range(common):
+            _diff(src[i], dst[i], f"{path}/{i}", ops)
+        for i in range(common, len(dst)):
+            ops.append({"op": "add", "path": f"{path}/{i}", "value": dst[i]})
+        # Remove from the end so earlier indexes stay valid
+        for i in range(len(src) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{i}"})
+    # type() check: 1 == 1.0 == True in Python, but not in JSON
+    elif type(src) is not type(dst) or src != dst:
+        ops.append({"op": "replace", "path": path, "value": dst})
+
+
+def apply(doc: Any, ops: list[dict]) -> Any:
+    """
+    Apply `ops` to `doc` IN PLACE and return the result (a new object only
+    when the root is replaced). Callers that must keep `doc` pass a copy.
+    """
+    for op in ops:
+        kind, path = op.get("op"), op.get("path")
+        if kind not in ("add", "remove", "replace") or path is None:
+            raise PatchError(f"unsupported operation {op!r}")
+        if path == "":
+            if kind == "remove":
+                raise PatchError("cannot remove the document root")
+            doc = op["value"]
+            continue
+
+        tokens = [_unescape(t) for t in path.split("/")[1:]]
+        try:
+            parent = doc
+            for t in tokens[:-1]:
+                parent = parent[int(t)] if isinstance(parent, list) else parent[t]
+            last = tokens[-1]
+            if isinstance(parent, list):
+                if kind == "add":
+                    parent.insert(len(parent) if last == "-" else int(last), op["value"])
+                elif kind == "remove":
+                    del parent[int(last)]
+                else:
+                    parent[int(last)] = op["value"]
+            elif isinstance(parent, dict):
+                if kind == "remove":
+                    del parent[last]
+                elif kind == "replace" and last not in parent:
+                    raise PatchError(f"replace of missing member {path!r}")
+                else:
+                    parent[last] = op["value"]
+            else:
+                raise PatchError(f"{path!r} does not point into a container")
+        except (KeyError, IndexError, ValueError, TypeError) as e:
+            if isinstance(e, PatchError):
+                raise
+            raise PatchError(f"cannot apply {kind} at {path!r}: {e}") from e
+    return doc
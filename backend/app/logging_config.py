@@ -1,20 +1,281 @@
+# app/logging_config.py
+# Non-blocking logging: the root logger has a single QueueHandler, and a
+# QueueListener thread formats the records and writes them to stdout. A log
+# call on a request thread only masks and enqueues.
+#
+# LOG_FORMAT=json (default) writes one JSON object per line; LOG_FORMAT=text
+# keeps the "time [LEVEL] logger: message" layout. Records logged while a
+# request is being handled carry request_id and principal
+# (RequestLogMiddleware). The middleware also writes one access line per
+# request with route and latency (LOG_REQUESTS; LOG_REQUEST_SAMPLE samples all
+# but 5xx). Repetitive events (auth failures, 401/403 lines) go through
+# RateLimitFilter.
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import os
+import queue
+import random
 import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
 
-def setup_logging(level=logging.INFO):
-    """Configure root logger for the backend app."""
-    handler = logging.StreamHandler(sys.stdout)
-    formatter = logging.Formatter(
-        "%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-        "%Y-%m-%d %H:%M:%S",
-    )
-    handler.setFormatter(formatter)
+from .masking import masker
+from .metrics import route_template
 
-    root = logging.getLogger()
-    root.setLevel(level)
-    root.addHandler(handler)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").strip().lower()
+LOG_REQUESTS = os.getenv("LOG_REQUESTS", "true").strip().lower() in ("1", "true", "yes")
+LOG_REQUEST_SAMPLE = float(os.getenv("LOG_REQUEST_SAMPLE", "1.0"))  # share of non-error requests logged
+# Repetitive events (e.g. auth failures): `burst` at once, then `rate` per second
+LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", "1"))
+LOG_RATE_BURST = int(os.getenv("LOG_RATE_BURST", "10"))
 
-    # silence noisy libraries if needed
-    logging.getLogger("psycopg").setLevel(logging.WARNING)
-    logging.getLogger("cryptography").setLevel(logging.WARNING)
+# Per-request context; a mutable dict so dependencies running on the
+# threadpool (in a copied context) can still add the principal
+_request: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_log", default=None)
 
+# Record attributes copied into the JSON line when present
+_FIELDS = ("request_id", "principal", "method", "route", "status", "latency_ms", "spans", "profile", "suppressed")
+
+_EXC_FORMATTER = logging.Formatter()
+
+
+def bind_principal(principal_id: str) -> None:
+    """Attach the authenticated principal to the current request's log context."""
+    ctx = _request.get()
+    if ctx is not None:
+        ctx["principal"] = principal_id
+
+
+class MaskingFilter(logging.Filter):
+    """Masks dict/list arguments of log calls (logger.info("...%s", payload))."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        args = record.args
+        if isinstance(args, dict):
+            record.args = masker.mask(args)
+        elif args and any(isinstance(a, (dict, list)) for a in args):
+            record.args = tuple(masker.mask(a) for a in args)
+        return True
+
+
+class ContextFilter(logging.Filter):
+    """Copies the request context onto records logged on the request's thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        ctx = _request.get()
+        if ctx is not None:
+            for k, v in ctx.items():
+                if not hasattr(record, k):
+                    setattr(record, k, v)
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per (logger, message template): `burst` records pass at once,
+    then `rate` per second. The next record that passes carries the number
+    dropped in between as `suppressed`.
+    """
+
+    def __init__(self, rate: float = LOG_RATE_LIMIT, burst: int = LOG_RATE_BURST):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[tuple, list] = {}  # key -> [tokens, last refill, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                if len(self._buckets) >= 1024:  # templates are few; formatted messages would not be
+                    self._buckets.clear()
+                b = self._buckets[key] = [float(self.burst), now, 0]
+            b[0] = min(float(self.burst), b[0] + (now - b[1]) * self.rate)
+            b[1] = now
+            if b[0] < 1:
+                b[2] += 1
+                return False
+            b[0] -= 1
+            if b[2]:
+                record.suppressed, b[2] = b[2], 0
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for k in _FIELDS:
+            v = getattr(record, k, None)
+            if v is not None:
+                out[k] = v
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    """Merges args into the message (after masking) and pre-renders tracebacks before enqueueing."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+def setup_logging(level=None):
+    """Configure the root logger for the backend app. Safe to call more than once."""
+    global _handler, _listener
+    with _lock:
+        if _listener is not None:
+            return
+        out = logging.StreamHandler(sys.stdout)
+        if LOG_FORMAT == "text":
+            out.setFormatter(logging.Formatter(
+                "%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+                "%Y-%m-%d %H:%M:%S",
+            ))
+        else:
+            out.setFormatter(JsonFormatter())
+
+        q: queue.SimpleQueue = queue.SimpleQueue()
+        _handler = _QueueHandler(q)
+        # Filters run on the calling thread, before the record leaves it
+        _handler.addFilter(MaskingFilter())
+        _handler.addFilter(ContextFilter())
+        _listener = QueueListener(q, out)
+        _listener.start()
+
+        root = logging.getLogger()
+        root.setLevel(level if level is not None else LOG_LEVEL)
+        root.addHandler(_handler)
+
+        # silence noisy libraries if needed
+        logging.getLogger("psycopg").setLevel(logging.WARNING)
+        logging.getLogger("cryptography").setLevel(logging.WARNING)
+        # uvicorn's loggers propagate to the root handler instead of writing themselves;
+        # its access log duplicates RequestLogMiddleware's
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            logging.getLogger(name).handlers.clear()
+            logging.getLogger(name).propagate = True
+        if LOG_REQUESTS:
+            logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
+
+
+def flush_logging() -> None:
+    """Write out everything queued so far; logging keeps working afterwards."""
+    with _lock:
+        if _listener is not None:
+            _listener.stop()  # drains the queue up to its sentinel
+            _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Drain the queue and stop the listener thread (at exit)."""
+    global _handler, _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        logging.getLogger().removeHandler(_handler)
+        _handler, _listener = None, None
+
+
+def _after_fork_in_child() -> None:
+    # The listener thread does not survive fork(): a forked worker (app.serve)
+    # gets its own queue and thread; whatever the parent still had queued stays there
+    global _lock, _listener
+    _lock = threading.Lock()
+    if _listener is not None:
+        q: queue.SimpleQueue = queue.SimpleQueue()
+        _handler.queue = q
+        _listener = QueueListener(q, *_listener.handlers)
+        _listener.start()
+
+
+atexit.register(shutdown_logging)
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+# ---------- Request context / access log ----------
+access_logger = logging.getLogger("app.access")
+# 401/403 lines are rate-limited: a credential-stuffing burst must not flood the log
+denied_logger = logging.getLogger("app.access.denied")
+denied_logger.addFilter(RateLimitFilter())
+
+
+def _request_id(scope) -> str:
+    for k, v in scope.get("headers", ()):
+        if k == b"x-request-id":
+            rid = v.decode("latin-1")[:128]
+            if rid.isprintable():
+                return rid
+    return uuid.uuid4().hex
+
+
+class RequestLogMiddleware:
+    """
+    ASGI middleware: binds request_id (X-Request-Id, echoed back or generated)
+    for every record logged during the request, then writes the access line.
+    """
+
+    def __init__(self, app, fastapi_app):
+        self.app = app
+        self.fastapi_app = fastapi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        rid = _request_id(scope)
+        ctx = {"request_id": rid}
+        token = _request.set(ctx)
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", ()), (b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if LOG_REQUESTS and (status >= 500 or LOG_REQUEST_SAMPLE >= 1 or random.random() < LOG_REQUEST_SAMPLE):
+                (denied_logger if status in (401, 403) else access_logger).info(
+                    "%s %s %d", scope["method"], scope["path"], status,
+                    extra={
+                        "method": scope["method"],
+                        "route": route_template(self.fastapi_app, scope),
+                        "status": status,
+                        "latency_ms": round((time.perf_counter() - t0) * 1000, 2),
+                    },
+                )
+            _request.reset(token)
@@ -4,19 +4,46 @@ import re
 import json
 import hashlib
 import uuid
+import asyncio
+import base64
+import csv
+import io
+import time
+from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, Header, Depends, Query
+from fastapi import FastAPI, HTTPException, Header, Depends, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 
 from psycopg.rows import dict_row
 from psycopg.types.json import Json
 
-from .db import pool
+from .db import pool, replica_pool, warm_pool
+from .health import readiness
+from .replica import router as replicas
+from . import queries as Q
+from .cache import LRUCache, cache_stats, sweeper as cache_sweeper
+from .notify import listener
+from .watch import hub
+from .audit import sink as audit_sink, AUDIT_DURABLE, AUDIT_READS
+from .partitions import maintainer as partition_maintainer, AUDIT_PARTITION_MAINT
+from . import history, jsonpatch
+from . import metrics
+from . import timing
+from . import fastjson
+from .masking import masker
 # Auth: API-key or JWT, выбирается один раз на старте
-from .auth import require_api_key, require_bearer, AuthPrincipal, resolve_created_by
-from .crypto import seal, open_sealed
-from .models import PutConfigIn, ConfigOut, PutSecretIn, SecretOut
-from .logging_config import setup_logging
+from .auth import require_api_key, require_bearer, AuthPrincipal, resolve_created_by, auth_stats
+from .crypto import open_row, open_many, writer_dek, seal_item, ENVELOPE_ALG, SECRET_ALGS
+from .models import (
+    PutConfigIn, ConfigOut, PutSecretIn, SecretOut,
+    BatchGetIn, BatchGetOut, TokenIn, TokenOut,
+)
+from . import tokens
+from .logging_config import setup_logging, flush_logging, RequestLogMiddleware
 
 setup_logging()
 
@@ -29,39 +56,139 @@ elif AUTH_TYPE == "BEARER":
 else:
     raise RuntimeError(f"Invalid AUTH_TYPE '{AUTH_TYPE}'. Expected 'API_KEY' or 'BEARER'.")
 
-app = FastAPI(title="confmgr-backend")
+# ---------- Read cache ----------
+# Per-worker cache of (etag, current config row, encoded ConfigOut body or None),
+# keyed by normalized path.
+# Invalidated locally on write and across replicas via NOTIFY (see notify.py).
+CONFIG_CACHE = LRUCache(
+    "config",
+    max_size=int(os.getenv("CONFIG_CACHE_MAX", "10000")),
+    ttl=float(os.getenv("CONFIG_CACHE_TTL", "60")),
+)
+
+# Opt-in cache of decrypted secrets keyed by (path, version), bounded in bytes.
+# version=None is the "current" lookup and is invalidated by writes; explicit
+# versions are immutable and only leave the cache by TTL or LRU pressure.
+SECRET_CACHE = LRUCache(
+    "secret",
+    max_size=int(os.getenv("SECRET_CACHE_BYTES", "0")),
+    ttl=float(os.getenv("SECRET_CACHE_TTL", "30")),
+    weigher=lambda e: len(e[2]) + 128,  # plaintext + rough per-entry overhead
+)
+
+def _on_change(kind: str, path: str | None, version: int | None):
+    if kind == "*":
+        CONFIG_CACHE.clear()
+        SECRET_CACHE.clear()
+    elif kind == "config" and path:
+        CONFIG_CACHE.invalidate(path)
+    elif kind == "secret" and path:
+        SECRET_CACHE.invalidate((path, None))
+
+listener.subscribe(_on_change)
+listener.subscribe(hub.publish)
+listener.subscribe(tokens.on_change)
+listener.subscribe(replicas.note_version)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    t0 = time.monotonic()
+    # min_size connections with hot statements prepared before the first request
+    warm = await run_in_threadpool(warm_pool, pool)
+    if replica_pool is not None:
+        await run_in_threadpool(warm_pool, replica_pool)
+        await run_in_threadpool(replicas.check)
+        replicas.start()
+    readiness.check()
+    readiness.start()
+    # Always on: feeds both cache invalidation and /watch
+    listener.start()
+    # Expired cache entries (decrypted secrets) leave memory on idle workers too
+    cache_sweeper.start()
+    # Only under app.serve: samples for the merged /metrics of all workers
+    metrics.sample_writer.start()
+    audit_sink.start()
+    if AUDIT_PARTITION_MAINT:
+        partition_maintainer.start()
+    if history.CONFIG_STORAGE == "delta":
+        history.compactor.start()
+    readiness.mark_started(time.monotonic() - t0, warm)
+    yield
+    readiness.stop()
+    history.compactor.stop()
+    partition_maintainer.stop()
+    listener.stop()
+    cache_sweeper.stop()
+    audit_sink.stop()  # flush queued audit events
+    metrics.sample_writer.stop()  # final samples, folded into the archive on exit
+    replicas.stop()
+    if replica_pool is not None:
+        replica_pool.close()
+    pool.close()
+    flush_logging()
 
 # ---------- CORS ----------
 # Allowed origins (comma-separated). Dev default: http://localhost:3000
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000")
 origins = [o.strip() for o in CORS_ORIGINS.split(",") if o.strip()]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,                # explicit origins (no "*")
-    allow_credentials=True,               # allow cookies/auth if needed
-    allow_methods=["GET", "POST", "OPTIONS"],
-    allow_headers=[
-        "Content-Type",
-        "Authorization",
-        "X-API-Key",
-        "X-Actor-Id",
-        "X-Actor-Subject",
-    ],
-)
+# gzip responses of at least GZIP_MIN_SIZE bytes for clients sending Accept-Encoding: gzip (0 disables)
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+
+def configure_app(app: FastAPI) -> None:
+    """Middleware shared by the sync app and the async app (main_async.py)."""
+    if GZIP_MIN_SIZE > 0:
+        app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,                # explicit origins (no "*")
+        allow_credentials=True,               # allow cookies/auth if needed
+        allow_methods=["GET", "POST", "OPTIONS"],
+        allow_headers=[
+            "Content-Type",
+            "Authorization",
+            "X-API-Key",
+            "X-Actor-Id",
+            "X-Actor-Subject",
+            "If-None-Match",
+        ],
+        expose_headers=["ETag"],
+    )
+    # Phase timings: Server-Timing header, slow-request and profile lines (inside
+    # RequestLogMiddleware, so those lines carry the request_id)
+    app.add_middleware(timing.TimingMiddleware, fastapi_app=app)
+    # request_id for every log record of the request, then the access line
+    app.add_middleware(RequestLogMiddleware, fastapi_app=app)
+    # Outermost, so latency includes every other middleware
+    app.add_middleware(metrics.MetricsMiddleware, fastapi_app=app)
+
+app = FastAPI(title="confmgr-backend", lifespan=lifespan)
+configure_app(app)
 
 # ---------- Health ----------
+# Probes never borrow a connection: see health.py
+@app.get("/livez")
+async def livez():
+    """Liveness: the process is up and its event loop answers."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz(response: Response):
+    """Readiness from the cached DB check and pool saturation; 503 when not ready."""
+    ready, body = readiness.status()
+    if not ready:
+        response.status_code = 503
+    return body
+
 @app.get("/health")
-def health():
-    """Simple DB round-trip to prove connectivity and time source."""
-    with pool.connection() as conn, conn.cursor() as cur:
-        cur.execute("select now()")
-        return {"status": "ok", "db_time_utc": cur.fetchone()[0].isoformat()}
+async def health(response: Response):
+    """DB connectivity and time source as of the last background check."""
+    return await readyz(response)
 
 @app.get("/healthz")
-def healthz():
+async def healthz(response: Response):
     """Alias commonly used by probes."""
-    return health()
+    return await readyz(response)
 
 # Диагностический эндпоинт. Использует уже выбранную зависимость AUTH_DEP.
 @app.get("/__whoami")
@@ -88,6 +215,87 @@ def whoami(principal: AuthPrincipal = Depends(AUTH_DEP)):  # Remove None type
         }
     }
 
+# ---------- Client credentials ----------
+@app.post("/token", response_model=TokenOut)
+async def issue_token(body: TokenIn):
+    """
+    Exchange api_clients credentials for a short-lived JWT accepted by
+    require_bearer (sub = api_clients.id, cid = client_id).
+    """
+    if AUTH_TYPE != "BEARER":
+        raise HTTPException(404, "token endpoint requires AUTH_TYPE=BEARER")
+    try:
+        client = await tokens.verify_client(body.client_id, body.client_secret)
+        token, expires_in = tokens.issue_token(client)
+    except tokens.TokenError as e:
+        raise HTTPException(e.status, e.detail)
+    # On the event loop: never wait for room in the audit queue
+    audit_sink.emit(str(client["id"]), client["client_id"], "token.issue", f"client/{client['client_id']}", {},
+                    block=False)
+    return TokenOut(access_token=token, expires_in=expires_in)
+
+# ---------- Metrics ----------
+metrics.register_statements(Q)
+metrics.register_statements(history)
+metrics.register_statements(tokens)
+
+def _app_metrics() -> list:
+    caches = cache_stats()
+    audit = audit_sink.stats()
+    def per_cache(field):
+        return [({"cache": name}, st[field]) for name, st in caches.items()]
+    return [
+        ("confmgr_cache_hits_total", "counter", "Cache hits", per_cache("hits")),
+        ("confmgr_cache_misses_total", "counter", "Cache misses", per_cache("misses")),
+        ("confmgr_cache_evictions_total", "counter", "Entries evicted or expired", per_cache("evictions")),
+        ("confmgr_cache_entries", "gauge", "Entries currently cached", per_cache("size")),
+        ("confmgr_cache_hit_ratio", "gauge", "hits / (hits + misses) since start", [
+            ({"cache": name}, st["hits"] / (st["hits"] + st["misses"]) if st["hits"] + st["misses"] else 0.0)
+            for name, st in caches.items()
+        ]),
+        ("confmgr_audit_events_total", "counter", "Audit sink events by outcome", [
+            ({"outcome": k}, audit[k]) for k in ("enqueued", "flushed", "dropped")
+        ]),
+        ("confmgr_audit_queue_depth", "gauge", "Audit events waiting to be flushed", [({}, audit["queued"])]),
+        ("confmgr_change_listener_connected", "gauge", "1 if the LISTEN connection is up", [({}, int(listener.connected))]),
+        ("confmgr_watchers", "gauge", "Parked /watch requests", [({}, len(hub))]),
+        *_replica_metrics(),
+    ]
+
+def _replica_metrics() -> list:
+    if not replicas.enabled:
+        return []
+    st = replicas.stats()
+    return [
+        ("confmgr_replica_lag_seconds", "gauge", "Last measured replay lag (-1 = check failing)",
+         [({}, -1 if st["lag_s"] is None else st["lag_s"])]),
+        ("confmgr_replica_reads_total", "counter", "Routed reads by target",
+         [({"target": k}, v) for k, v in st["reads"].items()]),
+        ("confmgr_replica_fallbacks_total", "counter", "Reads sent to the primary by reason",
+         [({"reason": k}, v) for k, v in st["fallbacks"].items()]),
+    ]
+
+metrics.Collector(_app_metrics)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus text exposition (unauthenticated, like /health; METRICS_ENABLED=false disables)."""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(404, "metrics disabled")
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/__stats")
+def __stats(principal: AuthPrincipal = Depends(AUTH_DEP)):
+    """Diagnostic: in-process cache counters for this worker."""
+    return {
+        "caches": cache_stats(),
+        "listener_connected": listener.connected,
+        "watchers": len(hub),
+        "audit": audit_sink.stats(),
+        "auth": auth_stats(),
+        "replica": replicas.stats(),
+    }
+
 # ---------- Path normalization / validation ----------
 PATH_RE = re.compile(r"^(?:[A-Za-z0-9._-]+)(?:/[A-Za-z0-9._-]+)*$")
 
@@ -104,34 +312,226 @@ def normalize_path(p: str) -> str:
         raise HTTPException(status_code=400, detail="invalid path")
     return p
 
+# Prefix may be empty (everything) and may end with '/'
+PREFIX_RE = re.compile(r"^(?:[A-Za-z0-9._-]+/)*[A-Za-z0-9._-]*$")
+
+def normalize_prefix(p: str) -> str:
+    p = p.strip()
+    if not PREFIX_RE.fullmatch(p):
+        raise HTTPException(status_code=400, detail="invalid prefix")
+    return p
+
+# ---------- Conditional GET ----------
+def config_etag(checksum: bytes) -> str:
+    """Strong ETag from core.config_versions.checksum (sha256 of canonical JSON)."""
+    return f'"{checksum.hex()}"'
+
+def secret_etag(path: str, version: int) -> str:
+    """Strong ETag for an immutable secret version; reveals nothing about the value."""
+    return '"' + hashlib.sha256(f"{path}|{version}".encode()).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 13.1.2): W/ prefixes are ignored for If-None-Match
+    return any(t.strip().removeprefix("W/") == etag for t in if_none_match.split(","))
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+def config_out(path: str, row: dict) -> dict:
+    return {
+        "path": path,
+        "version": row["version"],
+        "value": row["value_json"],
+        "created_at": row["created_at"].isoformat(),
+    }
+
+def config_body(out: dict) -> bytes:
+    """Encoded ConfigOut for a config_out() dict."""
+    return fastjson.config_body(out["path"], out["version"], fastjson.dumps(out["value"]), out["created_at"])
+
+# ---------- Prefix listing (NDJSON) ----------
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "500"))
+
+def _iter_prefix(sql: str, prefix: str, to_line, db=pool):
+    """
+    Keyset-paginate `sql` over the "C"-ordered path range [prefix, prefix+0x7f)
+    and yield one NDJSON chunk per page (to_line encodes one row). Each page borrows a connection from `db`
+    only for its own query, so a slow client never pins a connection.
+    """
+    lo, hi = prefix, prefix + "\x7f"  # paths are ASCII, so every match sorts below 0x7f
+    after = ""
+    while True:
+        with db.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(sql, (lo, hi, after, LIST_PAGE_SIZE))
+            rows = cur.fetchall()
+        if rows:
+            yield b"".join(to_line(r) + b"\n" for r in rows)
+        if len(rows) < LIST_PAGE_SIZE:
+            return
+        after = rows[-1]["path"]
+
+# ---------- Batch helpers ----------
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "200"))
+
+def _batch_requests(body: BatchGetIn) -> list[tuple[str, str, int | None]]:
+    """Validate a batch body -> [(result_key, path, version)], deduplicated."""
+    if len(body.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(400, f"too many items (max {BATCH_MAX_ITEMS})")
+    reqs = {}
+    for it in body.items:
+        path = normalize_path(it.path)
+        key = path if it.version is None else f"{path}@{it.version}"
+        reqs[key] = (key, path, it.version)
+    return list(reqs.values())
+
+def _audit_scope(paths: list[str]) -> str:
+    """Longest common path prefix (whole segments) used as the audit 'path' of a batch."""
+    common = []
+    for segs in zip(*(p.split("/") for p in paths)):
+        if any(s != segs[0] for s in segs):
+            break
+        common.append(segs[0])
+    return "/".join(common) or "*"
+
+def actor_subject_of(principal: AuthPrincipal, x_actor_subject: str | None) -> str:
+    """Derive actor_subject (JWT > header > fallback)."""
+    return x_actor_subject or (principal.subject if principal else None) or ("bearer" if AUTH_TYPE == "BEARER" else "api_key")
+
+def _audit_actor(principal: AuthPrincipal, x_actor_id: str | None, x_actor_subject: str | None) -> tuple[str, str]:
+    """(actor_id uuid, actor_subject) for audit rows; non-UUID principals map to a stable uuid5."""
+    created_by = resolve_created_by(principal, x_actor_id)
+    try:
+        actor_id = str(uuid.UUID(created_by))
+    except ValueError:
+        actor_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"confmgr:{created_by}"))
+    return actor_id, actor_subject_of(principal, x_actor_subject)
+
+def audit_read(principal: AuthPrincipal, action: str, path: str, extra: dict, block: bool = True) -> None:
+    """Read auditing (AUDIT_READS) always goes through the batched sink; block=False on the event loop."""
+    if AUDIT_READS:
+        audit_sink.emit(*_audit_actor(principal, None, None), action, path, extra, block=block)
+
 # ===================== CONFIG =====================
 
+# History routes are ":verb" suffixes (never a path segment, since paths cannot
+# contain ":"), registered before the /config/{path:path} catch-all
+HISTORY_PAGE_MAX = int(os.getenv("HISTORY_PAGE_MAX", "500"))
+
+def _config_item_id(cur, path: str) -> int:
+    cur.execute(history.ITEM_ID, (path,))
+    item = cur.fetchone()
+    if not item:
+        raise HTTPException(404, "Config not found")
+    return item["id"]
+
+@app.get("/config/{path:path}:versions")
+def config_versions(
+    path: str,
+    before: int | None = Query(default=None, description="next_before from the previous page"),
+    limit: int = Query(default=50, ge=1),
+    principal: AuthPrincipal = Depends(AUTH_DEP)
+):
+    """Version metadata, newest first (values are fetched with ?version / batchGet / diff)."""
+    path = normalize_path(path)
+    limit = min(limit, HISTORY_PAGE_MAX)
+    with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        item_id = _config_item_id(cur, path)
+        cur.execute(history.VERSIONS_PAGE, (item_id, before if before is not None else 2**31 - 1, limit))
+        rows = cur.fetchall()
+    return {
+        "path": path,
+        "versions": [{
+            "version": r["version"],
+            "is_current": r["is_current"],
+            "checksum": r["checksum"].hex(),
+            "created_at": r["created_at"].isoformat(),
+            "created_by": str(r["created_by"]),
+        } for r in rows],
+        "next_before": rows[-1]["version"] if len(rows) == limit else None,
+    }
+
+@app.get("/config/{path:path}:diff")
+def config_diff(
+    path: str,
+    from_version: int | None = Query(default=None, alias="from", description="default: to - 1"),
+    to_version: int | None = Query(default=None, alias="to", description="default: current"),
+    principal: AuthPrincipal = Depends(AUTH_DEP)
+):
+    """JSON Patch (RFC 6902) that turns version `from` into version `to`."""
+    path = normalize_path(path)
+    with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        item_id = _config_item_id(cur, path)
+        if to_version is None:
+            cur.execute(history.CURRENT_VERSION, (item_id,))
+            to_version = cur.fetchone()["version"]
+        if from_version is None:
+            from_version = to_version - 1
+        src = history.value_at(cur, item_id, from_version)
+        dst = history.value_at(cur, item_id, to_version)
+    if src is None or dst is None:
+        raise HTTPException(404, "Version not found")
+    audit_read(principal, "config.diff", path, {"from": from_version, "to": to_version})
+    return {"path": path, "from": from_version, "to": to_version, "patch": jsonpatch.diff(src, dst)}
+
+def _read_config(db, path: str, if_none_match: str | None) -> tuple[dict | None, str | None]:
+    """Current row of `path` from pool `db`, or (None, etag) when If-None-Match matches it."""
+    with db.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        if if_none_match:
+            cur.execute(Q.CONFIG_CURRENT_ETAG, (path,))
+            current = cur.fetchone()
+            if current and etag_matches(if_none_match, config_etag(current["checksum"])):
+                return None, config_etag(current["checksum"])
+
+        cur.execute(Q.CONFIG_CURRENT, (path,))
+        return cur.fetchone(), None
+
 @app.get(
     "/config/{path:path}",
     response_model=ConfigOut,
 )
 def get_config(
     path: str,
+    min_version: int | None = Query(default=None, ge=1),
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
     principal: AuthPrincipal = Depends(AUTH_DEP)  # Remove None type
 ):
     path = normalize_path(path)
-    sql = """
-    select cv.version, cv.value_json, cv.created_at
-    from core.config_items ci
-    join core.config_versions cv on cv.item_id = ci.id
-    where ci.path = %s and cv.is_current
-    """
-    with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
-        cur.execute(sql, (path,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(404, "Config not found")
-        return {
-            "path": path,
-            "version": row["version"],
-            "value": row["value_json"],
-            "created_at": row["created_at"].isoformat(),
-        }
+    cached = CONFIG_CACHE.get(path)
+    if cached is not None and cached[1]["version"] >= (min_version or 0):
+        etag, out, body = cached
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        audit_read(principal, "config.get", path, {"version": out["version"]})
+        # Pre-encoded: no response_model validation or re-encode on a hit
+        return fastjson.response(body or config_body(out), etag)
+
+    # Read the generation before the query: a concurrent invalidation wins
+    gen = CONFIG_CACHE.generation
+    row = None
+    if replicas.use_replica(principal):
+        floor = replicas.floor("config", path, min_version)
+        # A matching ETag on the replica proves nothing once a newer version is known
+        row, etag = _read_config(replica_pool, path, None if floor else if_none_match)
+        if etag:
+            return not_modified(etag)
+        if not replicas.accept(row and row["version"], floor):
+            row = None
+    if row is None:
+        row, etag = _read_config(pool, path, if_none_match)
+        if etag:
+            return not_modified(etag)
+    if not row:
+        raise HTTPException(404, "Config not found")
+    etag = config_etag(row["checksum"])
+    out = config_out(path, row)
+    body = config_body(out)
+    CONFIG_CACHE.put(path, (etag, out, body), generation=gen)
+    audit_read(principal, "config.get", path, {"version": out["version"]})
+    return fastjson.response(body, etag)
 
 @app.post(
     "/config/{path:path}",
@@ -148,67 +548,209 @@ def put_config(
     path = normalize_path(path)
     value = payload.value
 
-    # Canonical JSON for deterministic checksum
-    value_canon = json.dumps(value, separators=(",", ":"), sort_keys=True).encode()
+    # Canonical JSON for deterministic checksum; the same bytes are sent as
+    # the jsonb parameter and echoed in the response (no second encode)
+    value_canon = fastjson.canonical(value)
     checksum = hashlib.sha256(value_canon).digest()
     created_by = resolve_created_by(principal, x_actor_id)
+    actor_subject = actor_subject_of(principal, x_actor_subject)
 
     with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
-        # Ensure item exists
-        cur.execute(
-            "insert into core.config_items(path, created_by) values (%s, %s) on conflict(path) do nothing",
-            (path, created_by),
-        )
-
-        # Optional idempotency: if current checksum matches, short-circuit
-        cur.execute("""
-            select cv.version, cv.checksum, cv.created_at
-            from core.config_items ci
-            join core.config_versions cv on cv.item_id = ci.id
-            where ci.path = %s and cv.is_current
-        """, (path,))
-        current = cur.fetchone()
-        if current and current["checksum"] == checksum:
-            return {
-                "path": path,
-                "version": current["version"],
-                "value": value,
-                "created_at": current["created_at"].isoformat(),
-            }
-
-        # Insert new version; DB trigger or default increments version when 'null'
-        cur.execute("""
-            insert into core.config_versions(item_id, version, is_current, value_json, checksum, created_by)
-            select id, null, true, %s::jsonb, %s::bytea, %s
-            from core.config_items where path = %s
-            returning version, created_at
-        """, (Json(value), checksum, created_by, path))
+        # BEGIN + core.put_config + COMMIT in one pipelined round trip
+        with conn.pipeline():
+            cur.execute(Q.CONFIG_PUT, (
+                path,
+                value_canon.decode(),  # text, cast to jsonb by the statement
+                checksum,
+                created_by,
+                actor_subject,
+                AUDIT_DURABLE,  # durable: audit row in the same transaction
+            ))
+            conn.commit()
         row = cur.fetchone()
 
-        # Derive actor_subject (JWT > header > fallback)
-        actor_subject = (
-            x_actor_subject
-            or (principal.subject if principal else None)
-            or ("bearer" if AUTH_TYPE == "BEARER" else "api_key")
-        )
+    if row["changed"]:
+        if not AUDIT_DURABLE:
+            audit_sink.emit(created_by, actor_subject, "config.put", path, {"version": row["version"]})
+        # Other replicas are invalidated by the NOTIFY from trg_config_versions_notify
+        CONFIG_CACHE.invalidate(path)
+    replicas.note_write(principal, "config", path, row["version"])
+    body = fastjson.config_body(path, row["version"], value_canon, row["created_at"].isoformat())
+    return fastjson.response(body, config_etag(checksum), status_code=201)
 
-        # Audit log
-        cur.execute("""
-            select audit.log_event(%s::uuid, %s::text, %s::text, %s::text, %s::jsonb)
-        """, (
-            created_by,
-            actor_subject,
-            "config.put",
-            path,
-            Json({"version": row["version"]}),
-        ))
+@app.get("/config")
+def list_config(
+    prefix: str = Query(..., description="Path prefix, e.g. app/prod/"),
+    principal: AuthPrincipal = Depends(AUTH_DEP)
+):
+    """Stream current versions of every config under `prefix` as NDJSON."""
+    prefix = normalize_prefix(prefix)
+    sql = """
+    select ci.path, cv.version, cv.value_json::text as value_text, cv.created_at
+    from core.config_items ci
+    join core.config_versions cv on cv.item_id = ci.id and cv.is_current
+    where ci.path collate "C" >= %s and ci.path collate "C" < %s
+      and ci.path collate "C" > %s
+    order by ci.path collate "C"
+    limit %s
+    """
+    return StreamingResponse(
+        # jsonb::text is spliced in as-is: values are never decoded
+        _iter_prefix(sql, prefix, lambda r: fastjson.config_body(
+            r["path"], r["version"], r["value_text"].encode(), r["created_at"].isoformat(),
+        ), replica_pool if replicas.use_replica(principal) else pool),
+        media_type="application/x-ndjson",
+    )
 
-        conn.commit()
+@app.post(
+    "/config:batchGet",
+    response_model=BatchGetOut,
+)
+def batch_get_config(
+    body: BatchGetIn,
+    x_actor_id: str | None = Header(default=None, alias="X-Actor-Id"),
+    x_actor_subject: str | None = Header(default=None, alias="X-Actor-Subject"),
+    principal: AuthPrincipal = Depends(AUTH_DEP)
+):
+    """Resolve many config paths with one query and one audit event."""
+    reqs = _batch_requests(body)
+    results = {}
+    pending = []
+    for key, path, version in reqs:
+        cached = CONFIG_CACHE.get(path) if version is None else None
+        if cached is not None:
+            out = cached[1]
+            results[key] = {"found": True, **{k: out[k] for k in ("version", "value", "created_at")}}
+        else:
+            pending.append((key, path, version))
+
+    gen = CONFIG_CACHE.generation
+    actor_id, actor_subject = _audit_actor(principal, x_actor_id, x_actor_subject)
+    rows = []
+    if pending:
+        with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+            # One round trip for exactly the requested rows (see Q.CONFIG_BATCH)
+            cur.execute(Q.CONFIG_BATCH, Q.batch_params(pending))
+            rows = cur.fetchall()
+            for r in rows:
+                if r["value_json"] is None:  # delta-encoded history row
+                    r["value_json"] = history.value_at(cur, r["item_id"], r["version"])
 
-    return {"path": path, "version": row["version"], "value": value, "created_at": row["created_at"].isoformat()}
+    found = {(r["path"], r["requested"]): r for r in rows}
+    for key, path, version in pending:
+        row = found.get((path, version))
+        if not row:
+            results[key] = {"found": False}
+            continue
+        out = {
+            "version": row["version"],
+            "value": row["value_json"],
+            "created_at": row["created_at"].isoformat(),
+        }
+        results[key] = {"found": True, **out}
+        if row["is_current"]:
+            # Body encoded lazily by get_config if this entry is ever hit
+            CONFIG_CACHE.put(path, (config_etag(row["checksum"]), {"path": path, **out}, None), generation=gen)
+
+    audit_sink.emit(
+        actor_id,
+        actor_subject,
+        "config.batch_get",
+        _audit_scope([p for _, p, _ in reqs]),
+        {"items": list(results), "found": sum(r["found"] for r in results.values())},
+    )
+    return {"results": results}
 
 # ===================== SECRETS (AES-GCM at rest) =====================
 
+def _read_secret(db, path: str, version: int | None,
+                 if_none_match: str | None) -> tuple[dict | None, str | None]:
+    """Explicit or current version of `path` from pool `db`, or (None, etag) on an ETag match."""
+    # Either fetch explicit version, or the current one
+    if version is None:
+        sql, params = Q.SECRET_CURRENT, (path,)
+    else:
+        sql, params = Q.SECRET_VERSION, (path, version)
+
+    with db.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        if if_none_match:
+            # Revalidate without fetching the ciphertext; an explicit version
+            # must still exist, so a stale ETag for a missing one gets the 404
+            if version is None:
+                cur.execute(Q.SECRET_CURRENT_VERSION, (path,))
+            else:
+                cur.execute(Q.SECRET_VERSION_EXISTS, (path, version))
+            current = cur.fetchone()
+            if current and etag_matches(if_none_match, secret_etag(path, current["version"])):
+                return None, secret_etag(path, current["version"])
+
+        cur.execute(sql, params)
+        return cur.fetchone(), None
+
+# ":versions" like the config history routes; registered before the
+# /secret/{path:path} catch-all
+SECRET_BULK_MAX = int(os.getenv("SECRET_BULK_MAX", "100"))
+
+@app.get("/secret/{path:path}:versions")
+def secret_versions(
+    path: str,
+    before: int | None = Query(default=None, description="next_before from the previous page"),
+    limit: int = Query(default=50, ge=1),
+    values: bool = Query(default=False, description="also decrypt each version (page capped at SECRET_BULK_MAX)"),
+    x_actor_id: str | None = Header(default=None, alias="X-Actor-Id"),
+    x_actor_subject: str | None = Header(default=None, alias="X-Actor-Subject"),
+    principal: AuthPrincipal = Depends(AUTH_DEP)
+):
+    """Version metadata, newest first; ?values=true decrypts the page in one query."""
+    path = normalize_path(path)
+    limit = min(limit, SECRET_BULK_MAX if values else HISTORY_PAGE_MAX)
+    gen = SECRET_CACHE.generation
+    with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(Q.SECRET_ITEM_ID, (path,))
+        item = cur.fetchone()
+        if not item:
+            raise HTTPException(404, "Secret not found")
+        sql = Q.SECRET_VERSIONS_PAGE_VALUES if values else Q.SECRET_VERSIONS_PAGE
+        cur.execute(sql, (item["id"], before if before is not None else 2**31 - 1, limit))
+        rows = cur.fetchall()
+
+    versions = [{
+        "version": r["version"],
+        "is_current": r["is_current"],
+        "alg": r["alg"],
+        "created_at": r["created_at"].isoformat(),
+        "created_by": str(r["created_by"]),
+    } for r in rows]
+    if values:
+        if any(r["alg"] not in SECRET_ALGS for r in rows):
+            raise HTTPException(500, "Unsupported algorithm")
+        # Versions are immutable: only the ones not cached are decrypted, in parallel
+        plain = {}
+        for r in rows:
+            cached = SECRET_CACHE.get((path, r["version"]))
+            if cached is not None:
+                plain[r["version"]] = cached[2]
+        missing = [r for r in rows if r["version"] not in plain]
+        # AAD binds each ciphertext to (path|version)
+        for r, plaintext in zip(missing, open_many([(r, f"{path}|{r['version']}".encode()) for r in missing])):
+            if isinstance(plaintext, Exception):
+                raise HTTPException(500, "Secret decryption failed")
+            plain[r["version"]] = plaintext
+            SECRET_CACHE.put((path, r["version"]), (r["version"], r["created_at"].isoformat(), plaintext), generation=gen)
+        for out in versions:
+            out["value"] = json.loads(plain[out["version"]])
+        audit_sink.emit(
+            *_audit_actor(principal, x_actor_id, x_actor_subject),
+            "secret.versions_get",
+            path,
+            {"versions": [r["version"] for r in rows]},
+        )
+    return {
+        "path": path,
+        "versions": versions,
+        "next_before": rows[-1]["version"] if len(rows) == limit else None,
+    }
+
 @app.get(
     "/secret/{path:path}",
     response_model=SecretOut,
@@ -216,48 +758,56 @@ def put_config(
 def get_secret(
     path: str,
     version: int | None = Query(default=None),
+    min_version: int | None = Query(default=None, ge=1),
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
     principal: AuthPrincipal = Depends(AUTH_DEP)
 ):
     path = normalize_path(path)
-    # Either fetch explicit version, or the current one
-    if version is None:
-        sql = """
-        select sv.version, sv.ciphertext, sv.nonce, sv.alg, sv.created_at
-        from core.secret_items si
-        join core.secret_versions sv on sv.item_id = si.id
-        where si.path = %s and sv.is_current
-        """
-        params = (path,)
-    else:
-        sql = """
-        select sv.version, sv.ciphertext, sv.nonce, sv.alg, sv.created_at
-        from core.secret_items si
-        join core.secret_versions sv on sv.item_id = si.id
-        where si.path = %s and sv.version = %s
-        """
-        params = (path, version)
+    cache_key = (path, version)
+    cached = SECRET_CACHE.get(cache_key)
+    if cached is not None and (version is not None or cached[0] >= (min_version or 0)):
+        ver, created_at, plaintext = cached
+        if etag_matches(if_none_match, secret_etag(path, ver)):
+            return not_modified(secret_etag(path, ver))
+        audit_read(principal, "secret.get", path, {"version": ver})
+        # The canonical plaintext is the JSON value: spliced, never decoded
+        return fastjson.response(fastjson.secret_body(path, ver, plaintext, created_at), secret_etag(path, ver))
 
-    with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
-        cur.execute(sql, params)
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(404, "Secret not found")
-        if row["alg"] != "AES256-GCM":
-            raise HTTPException(500, "Unsupported algorithm")
+    gen = SECRET_CACHE.generation
+    row = None
+    if replicas.use_replica(principal):
+        # Explicit versions are immutable: only a missing row falls back
+        floor = replicas.floor("secret", path, min_version) if version is None else 0
+        row, etag = _read_secret(replica_pool, path, version, None if floor else if_none_match)
+        if etag:
+            return not_modified(etag)
+        if not replicas.accept(row and row["version"], floor):
+            row = None
+    if row is None:
+        row, etag = _read_secret(pool, path, version, if_none_match)
+        if etag:
+            return not_modified(etag)
+    if not row:
+        raise HTTPException(404, "Secret not found")
+    if row["alg"] not in SECRET_ALGS:
+        raise HTTPException(500, "Unsupported algorithm")
 
-        # AAD binds ciphertext to (path|version)
-        aad = f"{path}|{row['version']}".encode()
-        plaintext = open_sealed(row["nonce"], row["ciphertext"], aad=aad)
-        value = json.loads(plaintext.decode())
-
-        # Return actual values for GET requests
-        return SecretOut(
-            path=path,
-            version=row["version"],
-            value=value,
-            created_at=row["created_at"].isoformat(),
-            mask_response=False  # Don't mask GET responses
-        )
+    # AAD binds ciphertext to (path|version)
+    aad = f"{path}|{row['version']}".encode()
+    plaintext = open_row(row, aad)
+
+    created_at = row["created_at"].isoformat()
+    SECRET_CACHE.put(cache_key, (row["version"], created_at, plaintext), generation=gen)
+    if version is None:
+        # The same row also answers the explicit-version lookup
+        SECRET_CACHE.put((path, row["version"]), (row["version"], created_at, plaintext), generation=gen)
+
+    audit_read(principal, "secret.get", path, {"version": row["version"]})
+    # Return actual values for GET requests (mask_response=false)
+    return fastjson.response(
+        fastjson.secret_body(path, row["version"], plaintext, created_at),
+        secret_etag(path, row["version"]),
+    )
 
 @app.post(
     "/secret/{path:path}",
@@ -276,63 +826,332 @@ def put_secret(
     created_by = resolve_created_by(principal, x_actor_id)
 
     # Canonical plaintext for deterministic crypto
-    plaintext = json.dumps(value, separators=(",", ":"), sort_keys=True).encode()
+    plaintext = fastjson.canonical(value)
 
     with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
         # 1) Ensure parent item exists
-        cur.execute("""
-            insert into core.secret_items(path, created_by)
-            values (%s, %s)
-            on conflict(path) do nothing
-        """, (path, created_by))
+        cur.execute(Q.SECRET_ENSURE_ITEM, (path, created_by))
 
         # 2) Lock the parent row to serialize writers (no FOR UPDATE on aggregates)
-        cur.execute("select id from core.secret_items where path = %s for update", (path,))
+        cur.execute(Q.SECRET_LOCK_ITEM, (path,))
         item = cur.fetchone()
         if not item:
             raise HTTPException(500, "Secret item not created")
         item_id = item["id"]
 
         # 3) Compute next version under the parent lock
-        cur.execute("select coalesce(max(version), 0) as mv from core.secret_versions where item_id = %s", (item_id,))
+        cur.execute(Q.SECRET_MAX_VERSION, (item_id,))
         next_ver = cur.fetchone()["mv"] + 1
 
-        # 4) Encrypt with AAD binding ciphertext to (path|version)
+        # 4) Encrypt with the item's data key, AAD binding ciphertext to (path|version)
+        aead, new_dek = writer_dek(item)
+        if new_dek:
+            cur.execute(Q.SECRET_SET_DEK, (*new_dek, item_id))
         aad = f"{path}|{next_ver}".encode()
-        nonce, ct = seal(plaintext, aad=aad)
+        nonce, ct = seal_item(aead, plaintext, aad)
 
         # 5) Flip current and insert the new current version atomically
-        cur.execute("update core.secret_versions set is_current = false where item_id = %s and is_current", (item_id,))
-        cur.execute("""
-            insert into core.secret_versions(item_id, version, is_current, ciphertext, nonce, alg, created_by)
-            values (%s, %s, true, %s::bytea, %s::bytea, 'AES256-GCM', %s)
-            returning version, created_at
-        """, (item_id, next_ver, ct, nonce, created_by))
+        cur.execute(Q.SECRET_UNSET_CURRENT, (item_id,))
+        cur.execute(Q.SECRET_INSERT_VERSION, (item_id, next_ver, ct, nonce, ENVELOPE_ALG, created_by))
         ver_row = cur.fetchone()
 
-        # Derive actor_subject (JWT > header > fallback)
-        actor_subject = x_actor_subject or (principal.subject if principal else None) or ("bearer" if AUTH_TYPE == "BEARER" else "api_key")
-
-        # Audit log
-        cur.execute("""
-            select audit.log_event(%s::uuid, %s::text, %s::text, %s::text, %s::jsonb)
-        """, (
-            created_by,
-            actor_subject,
-            "secret.put",
-            path,
-            Json({"version": ver_row["version"]}),
-        ))
+        # Audit log (durable mode: same transaction as the write)
+        actor_subject = actor_subject_of(principal, x_actor_subject)
+        if AUDIT_DURABLE:
+            cur.execute(Q.AUDIT_LOG_EVENT, (
+                created_by,
+                actor_subject,
+                "secret.put",
+                path,
+                Json({"version": ver_row["version"]}),
+            ))
 
         conn.commit()
 
+    if not AUDIT_DURABLE:
+        audit_sink.emit(created_by, actor_subject, "secret.put", path, {"version": ver_row["version"]})
+    # Other replicas are invalidated by the NOTIFY from trg_secret_versions_notify
+    SECRET_CACHE.invalidate((path, None))
+    replicas.note_write(principal, "secret", path, ver_row["version"])
+
     # Mask values only in POST response
-    return SecretOut(
-        path=path,
-        version=ver_row["version"],
-        value=value,
-        created_at=ver_row["created_at"].isoformat(),
-        mask_response=True  # Mask POST responses
+    return fastjson.response(fastjson.secret_body(
+        path, ver_row["version"], fastjson.dumps(masker.mask(value)),
+        ver_row["created_at"].isoformat(), mask_response=True,
+    ), status_code=201)
+
+@app.get("/secret")
+def list_secret(
+    prefix: str = Query(..., description="Path prefix, e.g. app/prod/"),
+    principal: AuthPrincipal = Depends(AUTH_DEP)
+):
+    """Stream metadata (never values) of every secret under `prefix` as NDJSON."""
+    prefix = normalize_prefix(prefix)
+    sql = """
+    select si.path, sv.version, sv.created_at
+    from core.secret_items si
+    join core.secret_versions sv on sv.item_id = si.id and sv.is_current
+    where si.path collate "C" >= %s and si.path collate "C" < %s
+      and si.path collate "C" > %s
+    order by si.path collate "C"
+    limit %s
+    """
+    return StreamingResponse(
+        _iter_prefix(sql, prefix, lambda r: fastjson.dumps({
+            "path": r["path"],
+            "version": r["version"],
+            "created_at": r["created_at"].isoformat(),
+        }), replica_pool if replicas.use_replica(principal) else pool),
+        media_type="application/x-ndjson",
     )
 
+@app.post(
+    "/secret:batchGet",
+    response_model=BatchGetOut,
+)
+def batch_get_secret(
+    body: BatchGetIn,
+    x_actor_id: str | None = Header(default=None, alias="X-Actor-Id"),
+    x_actor_subject: str | None = Header(default=None, alias="X-Actor-Subject"),
+    principal: AuthPrincipal = Depends(AUTH_DEP)
+):
+    """Resolve many secrets with one query, decrypting the batch in parallel."""
+    reqs = _batch_requests(body)
+    results = {}
+    pending = []
+    for key, path, version in reqs:
+        cached = SECRET_CACHE.get((path, version))
+        if cached is not None:
+            ver, created_at, plaintext = cached
+            results[key] = {"found": True, "version": ver, "value": json.loads(plaintext), "created_at": created_at}
+        else:
+            pending.append((key, path, version))
+
+    gen = SECRET_CACHE.generation
+    actor_id, actor_subject = _audit_actor(principal, x_actor_id, x_actor_subject)
+    rows = []
+    if pending:
+        with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+            # Exactly the requested rows (see Q.SECRET_BATCH)
+            cur.execute(Q.SECRET_BATCH, Q.batch_params(pending))
+            rows = cur.fetchall()
+
+    found = {(r["path"], r["requested"]): r for r in rows}
+    matched = []
+    for key, path, version in pending:
+        row = found.get((path, version))
+        if not row:
+            results[key] = {"found": False}
+        elif row["alg"] not in SECRET_ALGS:
+            raise HTTPException(500, "Unsupported algorithm")
+        else:
+            matched.append((key, path, version, row))
+
+    plaintexts = open_many([
+        (row, f"{path}|{row['version']}".encode())
+        for _, path, _, row in matched
+    ])
+    for (key, path, version, row), plaintext in zip(matched, plaintexts):
+        if isinstance(plaintext, Exception):
+            raise HTTPException(500, "Secret decryption failed")
+        created_at = row["created_at"].isoformat()
+        results[key] = {"found": True, "version": row["version"], "value": json.loads(plaintext), "created_at": created_at}
+        SECRET_CACHE.put((path, version), (row["version"], created_at, plaintext), generation=gen)
+
+    audit_sink.emit(
+        actor_id,
+        actor_subject,
+        "secret.batch_get",
+        _audit_scope([p for _, p, _ in reqs]),
+        {"items": list(results), "found": sum(r["found"] for r in results.values())},
+    )
+    return {"results": results}
+
+# ===================== WATCH (long-poll) =====================
+
+WATCH_MAX_TIMEOUT = float(os.getenv("WATCH_MAX_TIMEOUT", "60"))
+WATCH_MAX_EVENTS = int(os.getenv("WATCH_MAX_EVENTS", "1000"))
+
+_WATCH_SQL = {
+    "config": """
+        select ci.path, cv.version
+        from core.config_items ci
+        join core.config_versions cv on cv.item_id = ci.id and cv.is_current
+        where ci.path collate "C" >= %s and ci.path collate "C" < %s and cv.version > %s
+        order by ci.path collate "C"
+        limit %s
+    """,
+    "secret": """
+        select si.path, sv.version
+        from core.secret_items si
+        join core.secret_versions sv on sv.item_id = si.id and sv.is_current
+        where si.path collate "C" >= %s and si.path collate "C" < %s and sv.version > %s
+        order by si.path collate "C"
+        limit %s
+    """,
+}
+
+def _changed_since(kind: str, prefix: str, since_version: int) -> list[dict]:
+    with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(_WATCH_SQL[kind], (prefix, prefix + "\x7f", since_version, WATCH_MAX_EVENTS))
+        return [{"kind": kind, "path": r["path"], "version": r["version"]} for r in cur.fetchall()]
+
+@app.get("/watch")
+async def watch(
+    prefix: str = Query(default="", description="Path prefix to watch"),
+    since_version: int | None = Query(default=None, description="Return immediately if a current version is newer"),
+    kind: str = Query(default="config", pattern="^(config|secret)$"),
+    timeout: float = Query(default=30, ge=0),
+    principal: AuthPrincipal = Depends(AUTH_DEP)
+):
+    """
+    Long-poll until a path under `prefix` changes (or `timeout` elapses).
+    Parked requests wait on the in-process WatchHub, fed by the single LISTEN
+    connection; they hold no pool connection while waiting.
+    """
+    prefix = normalize_prefix(prefix)
+    # Register before the catch-up query so nothing committed in between is missed
+    waiter = hub.register(kind, prefix, since_version)
+    if waiter is None:
+        raise HTTPException(503, "Too many watchers")
+    try:
+        if since_version is not None:
+            changes = await run_in_threadpool(_changed_since, kind, prefix, since_version)
+            if changes:
+                return {"changes": changes, "reset": False}
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=min(timeout, WATCH_MAX_TIMEOUT))
+        except asyncio.TimeoutError:
+            pass
+        return {"changes": waiter.changes[:WATCH_MAX_EVENTS], "reset": waiter.reset}
+    finally:
+        hub.unregister(waiter)
+
+# ===================== AUDIT (read path) =====================
+
+AUDIT_MAX_RANGE_DAYS = int(os.getenv("AUDIT_MAX_RANGE_DAYS", "92"))
+AUDIT_PAGE_MAX = int(os.getenv("AUDIT_PAGE_MAX", "1000"))
+AUDIT_EXPORT_PAGE = int(os.getenv("AUDIT_EXPORT_PAGE", "5000"))
+AUDIT_FIELDS = ["id", "created_at", "actor_id", "actor_subject", "action", "path", "client_ip", "mfa", "extra"]
+
+def _encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["created_at"].isoformat(), row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        ts, rid = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(ts), int(rid)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "invalid cursor")
+
+def _audit_item(r: dict) -> dict:
+    return {
+        "id": r["id"],
+        "created_at": r["created_at"].isoformat(),
+        "actor_id": str(r["actor_id"]),
+        "actor_subject": r["actor_subject"],
+        "action": r["action"],
+        "path": r["path"],
+        "client_ip": str(r["client_ip"]) if r["client_ip"] is not None else None,
+        "mfa": r["mfa"],
+        "extra": r["extra"],
+    }
+
+def _audit_page(where: str, params: list, after: tuple[datetime, int], limit: int) -> list[dict]:
+    # Both time bounds are always in `where`, so only the matching partitions are scanned
+    sql = f"""
+        select {", ".join(AUDIT_FIELDS)}
+        from audit.audit_logs
+        where {where} and (created_at, id) > (%s, %s)
+        order by created_at, id
+        limit %s
+    """
+    with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(sql, (*params, *after, limit))
+        return cur.fetchall()
+
+def _iter_audit_export(where: str, params: list, after: tuple[datetime, int], fmt: str):
+    """Keyset-paginate the whole range, one encoded chunk per page."""
+    if fmt == "csv":
+        buf = io.StringIO()
+        csv.writer(buf).writerow(AUDIT_FIELDS)
+        yield buf.getvalue().encode()
+    while True:
+        rows = _audit_page(where, params, after, AUDIT_EXPORT_PAGE)
+        if rows:
+            items = [_audit_item(r) for r in rows]
+            if fmt == "csv":
+                buf = io.StringIO()
+                w = csv.writer(buf)
+                for it in items:
+                    w.writerow([json.dumps(it["extra"]) if k == "extra" else it[k] for k in AUDIT_FIELDS])
+                yield buf.getvalue().encode()
+            else:
+                yield "".join(json.dumps(it, separators=(",", ":")) + "\n" for it in items).encode()
+        if len(rows) < AUDIT_EXPORT_PAGE:
+            return
+        after = (rows[-1]["created_at"], rows[-1]["id"])
+
+@app.get("/audit")
+def query_audit(
+    since: datetime | None = Query(default=None, description="Inclusive lower bound (default: until - 24h)"),
+    until: datetime | None = Query(default=None, description="Exclusive upper bound (default: now)"),
+    actor_id: uuid.UUID | None = Query(default=None),
+    action: str | None = Query(default=None),
+    path_prefix: str | None = Query(default=None),
+    limit: int = Query(default=100, ge=1),
+    cursor: str | None = Query(default=None, description="next_cursor from the previous page"),
+    format: str = Query(default="json", pattern="^(json|ndjson|csv)$"),
+    principal: AuthPrincipal = Depends(AUTH_DEP)
+):
+    """
+    Query audit.audit_logs with keyset pagination on (created_at, id).
+    format=json returns one page plus next_cursor; ndjson/csv stream the whole
+    range page by page.
+    """
+    # Every bearer principal needs the audit:read scope, including tokens
+    # without a scope claim; the shared API key is an operator credential
+    if not principal.api_key and "audit:read" not in (principal.scopes or ()):
+        raise HTTPException(403, "audit:read scope required")
+
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(days=1)
+    if until.tzinfo is None:
+        until = until.replace(tzinfo=timezone.utc)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if since >= until:
+        raise HTTPException(400, "since must be before until")
+    if until - since > timedelta(days=AUDIT_MAX_RANGE_DAYS):
+        raise HTTPException(400, f"time range too large (max {AUDIT_MAX_RANGE_DAYS} days)")
+
+    where = ["created_at >= %s", "created_at < %s"]
+    params: list = [since, until]
+    if actor_id is not None:
+        where.append("actor_id = %s")
+        params.append(actor_id)
+    if action:
+        where.append("action = %s")
+        params.append(action)
+    if path_prefix:
+        prefix = normalize_prefix(path_prefix)
+        where.append('path collate "C" >= %s and path collate "C" < %s')
+        params += [prefix, prefix + "\x7f"]
+    where_sql = " and ".join(where)
+    after = _decode_cursor(cursor) if cursor else (since, 0)
+
+    if format != "json":
+        return StreamingResponse(
+            _iter_audit_export(where_sql, params, after, format),
+            media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        )
+
+    limit = min(limit, AUDIT_PAGE_MAX)
+    rows = _audit_page(where_sql, params, after, limit)
+    return {
+        "items": [_audit_item(r) for r in rows],
+        "next_cursor": _encode_cursor(rows[-1]) if len(rows) == limit else None,
+    }
+
 # ===================== END =====================
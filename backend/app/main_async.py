@@ -0,0 +1,305 @@
+# app/main_async.py
+# Async serving mode: `uvicorn app.main_async:app`
+#
+# Hot handlers (config/secret get+put) are `async def` and use an
+# AsyncConnectionPool, so an in-flight read costs a coroutine, not a threadpool
+# thread. AES-GCM runs on the crypto executor. Every other route (listing,
+# batch, watch, ...) is shared with the sync app in main.py unchanged. Audit
+# events are enqueued with block=False, so a full queue never stalls the loop.
+#
+# The shared routes still use the sync pool, so lifespan opens both: under
+# plain uvicorn each worker can hold 2 x DB_POOL_MAX connections plus its
+# LISTEN connection (and the same again for a replica). `python -m app.serve
+# --app app.main_async:app` counts both pools against DB_CONNECTION_BUDGET.
+import hashlib
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, APIRouter, HTTPException, Header, Depends, Query
+from fastapi.routing import APIRoute
+from psycopg.rows import dict_row
+from psycopg.types.json import Json
+
+from . import main as sync
+from . import queries as Q
+from . import fastjson
+from .masking import masker
+from .logging_config import flush_logging
+from .db import make_async_pool, awarm_pool
+from .auth import AuthPrincipal, resolve_created_by
+from .crypto import open_row, writer_dek, seal_item, run_crypto, ENVELOPE_ALG, SECRET_ALGS
+from .models import PutConfigIn, ConfigOut, PutSecretIn, SecretOut
+from .audit import sink as audit_sink, AUDIT_DURABLE
+from .replica import router as replicas
+from .main import (
+    AUTH_DEP, CONFIG_CACHE, SECRET_CACHE,
+    normalize_path, config_etag, secret_etag, etag_matches, not_modified,
+    config_out, config_body, actor_subject_of, audit_read,
+)
+
+apool = make_async_pool()
+areplica = make_async_pool(replica=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await awarm_pool(apool)
+    if areplica is not None:
+        await awarm_pool(areplica)
+    async with sync.lifespan(app):
+        yield
+    if areplica is not None:
+        await areplica.close()
+    await apool.close()
+    flush_logging()
+
+router = APIRouter()
+
+# ===================== CONFIG =====================
+
+async def _read_config(db, path: str, if_none_match: str | None) -> tuple[dict | None, str | None]:
+    """Current row of `path` from pool `db`, or (None, etag) when If-None-Match matches it."""
+    async with db.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        if if_none_match:
+            await cur.execute(Q.CONFIG_CURRENT_ETAG, (path,))
+            current = await cur.fetchone()
+            if current and etag_matches(if_none_match, config_etag(current["checksum"])):
+                return None, config_etag(current["checksum"])
+
+        await cur.execute(Q.CONFIG_CURRENT, (path,))
+        return await cur.fetchone(), None
+
+@router.get(
+    "/config/{path:path}",
+    response_model=ConfigOut,
+)
+async def get_config(
+    path: str,
+    min_version: int | None = Query(default=None, ge=1),
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+    principal: AuthPrincipal = Depends(AUTH_DEP)
+):
+    path = normalize_path(path)
+    cached = CONFIG_CACHE.get(path)
+    if cached is not None and cached[1]["version"] >= (min_version or 0):
+        etag, out, body = cached
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        audit_read(principal, "config.get", path, {"version": out["version"]}, block=False)
+        return fastjson.response(body or config_body(out), etag)
+
+    gen = CONFIG_CACHE.generation
+    row = None
+    if replicas.use_replica(principal):
+        floor = replicas.floor("config", path, min_version)
+        row, etag = await _read_config(areplica, path, None if floor else if_none_match)
+        if etag:
+            return not_modified(etag)
+        if not replicas.accept(row and row["version"], floor):
+            row = None
+    if row is None:
+        row, etag = await _read_config(apool, path, if_none_match)
+        if etag:
+            return not_modified(etag)
+    if not row:
+        raise HTTPException(404, "Config not found")
+    etag = config_etag(row["checksum"])
+    out = config_out(path, row)
+    body = config_body(out)
+    CONFIG_CACHE.put(path, (etag, out, body), generation=gen)
+    audit_read(principal, "config.get", path, {"version": out["version"]}, block=False)
+    return fastjson.response(body, etag)
+
+@router.post(
+    "/config/{path:path}",
+    response_model=ConfigOut,
+    status_code=201,
+)
+async def put_config(
+    path: str,
+    payload: PutConfigIn,
+    x_actor_id: str | None = Header(default=None, alias="X-Actor-Id"),
+    x_actor_subject: str | None = Header(default=None, alias="X-Actor-Subject"),
+    principal: AuthPrincipal = Depends(AUTH_DEP)
+):
+    path = normalize_path(path)
+    value = payload.value
+
+    # Canonical JSON for deterministic checksum, also the jsonb parameter and response value
+    value_canon = fastjson.canonical(value)
+    checksum = hashlib.sha256(value_canon).digest()
+    created_by = resolve_created_by(principal, x_actor_id)
+    actor_subject = actor_subject_of(principal, x_actor_subject)
+
+    async with apool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        async with conn.pipeline():
+            await cur.execute(Q.CONFIG_PUT, (
+                path,
+                value_canon.decode(),
+                checksum,
+                created_by,
+                actor_subject,
+                AUDIT_DURABLE,
+            ))
+            await conn.commit()
+        row = await cur.fetchone()
+
+    if row["changed"]:
+        if not AUDIT_DURABLE:
+            audit_sink.emit(created_by, actor_subject, "config.put", path, {"version": row["version"]}, block=False)
+        CONFIG_CACHE.invalidate(path)
+    replicas.note_write(principal, "config", path, row["version"])
+    body = fastjson.config_body(path, row["version"], value_canon, row["created_at"].isoformat())
+    return fastjson.response(body, config_etag(checksum), status_code=201)
+
+# ===================== SECRETS (AES-GCM at rest) =====================
+
+async def _read_secret(db, path: str, version: int | None,
+                       if_none_match: str | None) -> tuple[dict | None, str | None]:
+    """Explicit or current version of `path` from pool `db`, or (None, etag) on an ETag match."""
+    if version is None:
+        sql, params = Q.SECRET_CURRENT, (path,)
+    else:
+        sql, params = Q.SECRET_VERSION, (path, version)
+
+    async with db.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        if if_none_match:
+            if version is None:
+                await cur.execute(Q.SECRET_CURRENT_VERSION, (path,))
+            else:
+                await cur.execute(Q.SECRET_VERSION_EXISTS, (path, version))
+            current = await cur.fetchone()
+            if current and etag_matches(if_none_match, secret_etag(path, current["version"])):
+                return None, secret_etag(path, current["version"])
+
+        await cur.execute(sql, params)
+        return await cur.fetchone(), None
+
+@router.get(
+    "/secret/{path:path}",
+    response_model=SecretOut,
+)
+async def get_secret(
+    path: str,
+    version: int | None = Query(default=None),
+    min_version: int | None = Query(default=None, ge=1),
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+    principal: AuthPrincipal = Depends(AUTH_DEP)
+):
+    path = normalize_path(path)
+    cache_key = (path, version)
+    cached = SECRET_CACHE.get(cache_key)
+    if cached is not None and (version is not None or cached[0] >= (min_version or 0)):
+        ver, created_at, plaintext = cached
+        if etag_matches(if_none_match, secret_etag(path, ver)):
+            return not_modified(secret_etag(path, ver))
+        audit_read(principal, "secret.get", path, {"version": ver}, block=False)
+        return fastjson.response(fastjson.secret_body(path, ver, plaintext, created_at), secret_etag(path, ver))
+
+    gen = SECRET_CACHE.generation
+    row = None
+    if replicas.use_replica(principal):
+        floor = replicas.floor("secret", path, min_version) if version is None else 0
+        row, etag = await _read_secret(areplica, path, version, None if floor else if_none_match)
+        if etag:
+            return not_modified(etag)
+        if not replicas.accept(row and row["version"], floor):
+            row = None
+    if row is None:
+        row, etag = await _read_secret(apool, path, version, if_none_match)
+        if etag:
+            return not_modified(etag)
+    if not row:
+        raise HTTPException(404, "Secret not found")
+    if row["alg"] not in SECRET_ALGS:
+        raise HTTPException(500, "Unsupported algorithm")
+
+    aad = f"{path}|{row['version']}".encode()
+    plaintext = await run_crypto(open_row, row, aad)
+
+    created_at = row["created_at"].isoformat()
+    SECRET_CACHE.put(cache_key, (row["version"], created_at, plaintext), generation=gen)
+    if version is None:
+        SECRET_CACHE.put((path, row["version"]), (row["version"], created_at, plaintext), generation=gen)
+
+    audit_read(principal, "secret.get", path, {"version": row["version"]}, block=False)
+    return fastjson.response(
+        fastjson.secret_body(path, row["version"], plaintext, created_at),
+        secret_etag(path, row["version"]),
+    )
+
+@router.post(
+    "/secret/{path:path}",
+    response_model=SecretOut,
+    status_code=201,
+)
+async def put_secret(
+    path: str,
+    payload: PutSecretIn,
+    x_actor_id: str | None = Header(default=None, alias="X-Actor-Id"),
+    x_actor_subject: str | None = Header(default=None, alias="X-Actor-Subject"),
+    principal: AuthPrincipal = Depends(AUTH_DEP)
+):
+    path = normalize_path(path)
+    value = payload.value
+    created_by = resolve_created_by(principal, x_actor_id)
+    plaintext = fastjson.canonical(value)
+
+    async with apool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        await cur.execute(Q.SECRET_ENSURE_ITEM, (path, created_by))
+        await cur.execute(Q.SECRET_LOCK_ITEM, (path,))
+        item = await cur.fetchone()
+        if not item:
+            raise HTTPException(500, "Secret item not created")
+        item_id = item["id"]
+
+        await cur.execute(Q.SECRET_MAX_VERSION, (item_id,))
+        next_ver = (await cur.fetchone())["mv"] + 1
+
+        aead, new_dek = writer_dek(item)
+        if new_dek:
+            await cur.execute(Q.SECRET_SET_DEK, (*new_dek, item_id))
+        aad = f"{path}|{next_ver}".encode()
+        nonce, ct = await run_crypto(seal_item, aead, plaintext, aad)
+
+        await cur.execute(Q.SECRET_UNSET_CURRENT, (item_id,))
+        await cur.execute(Q.SECRET_INSERT_VERSION, (item_id, next_ver, ct, nonce, ENVELOPE_ALG, created_by))
+        ver_row = await cur.fetchone()
+
+        actor_subject = actor_subject_of(principal, x_actor_subject)
+        if AUDIT_DURABLE:
+            await cur.execute(Q.AUDIT_LOG_EVENT, (
+                created_by,
+                actor_subject,
+                "secret.put",
+                path,
+                Json({"version": ver_row["version"]}),
+            ))
+
+        await conn.commit()
+
+    if not AUDIT_DURABLE:
+        audit_sink.emit(created_by, actor_subject, "secret.put", path, {"version": ver_row["version"]},
+                        block=False)
+    SECRET_CACHE.invalidate((path, None))
+    replicas.note_write(principal, "secret", path, ver_row["version"])
+    # Values masked in the POST echo (SecretOut.mask_response)
+    return fastjson.response(fastjson.secret_body(
+        path, ver_row["version"], fastjson.dumps(masker.mask(value)),
+        ver_row["created_at"].isoformat(), mask_response=True,
+    ), status_code=201)
+
+# ===================== APP =====================
+
+def _merge_routes(app: FastAPI) -> None:
+    """
+    Keep the sync app's route order (it matters for catch-all paths), swapping
+    in the async handler wherever one exists for the same path and methods.
+    """
+    overrides = {(r.path, frozenset(r.methods)): r for r in router.routes}
+    for r in sync.app.router.routes:
+        if isinstance(r, APIRoute):  # docs/openapi: this app has its own
+            app.router.routes.append(overrides.pop((r.path, frozenset(r.methods)), r))
+    app.router.routes.extend(overrides.values())
+
+app = FastAPI(title="confmgr-backend", lifespan=lifespan)
+sync.configure_app(app)
+_merge_routes(app)
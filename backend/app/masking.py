@@ -1,21 +1,94 @@
+# app/masking.py
+# Masking of sensitive values in secret echoes, audit extras and log arguments.
+#
+# The key policy is compiled once into a single case-insensitive regex
+# (MASK_KEY_PATTERNS: comma-separated substrings, or "re:<regex>" entries), and
+# match results are memoized per key, since documents repeat the same keys.
+# mask() walks dicts and lists iteratively (no recursion limit on deep
+# documents). Every string below a sensitive key is masked, including strings
+# inside nested lists and objects.
+import os
+import re
 from typing import Any, Dict
 
-def mask_sensitive_values(data: Dict[str, Any]) -> Dict[str, Any]:
-    """Recursively mask sensitive values in dictionaries."""
-    masked = {}
-    sensitive_keys = {
-        'password', 'secret', 'key', 'token', 
-        'api_key', 'apikey', 'auth', 'credential'
-    }
-    
-    for k, v in data.items():
-        if isinstance(v, dict):
-            masked[k] = mask_sensitive_values(v)
-        elif isinstance(v, str) and any(sens in k.lower() for sens in sensitive_keys):
-            if len(v) > 6:
-                masked[k] = f"{v[:2]}{'*' * (len(v)-4)}{v[-2:]}"
-            else:
-                masked[k] = '*' * len(v)
+DEFAULT_PATTERNS = "password,secret,key,token,api_key,apikey,auth,credential"
+MASK_KEY_PATTERNS = os.getenv("MASK_KEY_PATTERNS", DEFAULT_PATTERNS)
+_MEMO_MAX = 4096
+
+
+def compile_patterns(spec: str) -> re.Pattern:
+    parts = []
+    for p in (s.strip() for s in spec.split(",")):
+        if p:
+            parts.append(p[3:] if p.startswith("re:") else re.escape(p))
+    # An empty policy matches nothing
+    return re.compile("|".join(parts) if parts else r"(?!)", re.IGNORECASE)
+
+
+def mask_string(v: str) -> str:
+    if len(v) > 6:
+        return f"{v[:2]}{'*' * (len(v) - 4)}{v[-2:]}"
+    return "*" * len(v)
+
+
+class Masker:
+    def __init__(self, patterns: str = MASK_KEY_PATTERNS):
+        self._search = compile_patterns(patterns).search
+        self._memo: dict[str, bool] = {}
+
+    def sensitive(self, key: str) -> bool:
+        hit = self._memo.get(key)
+        if hit is None:
+            hit = self._search(key) is not None
+            if len(self._memo) < _MEMO_MAX:
+                self._memo[key] = hit
+        return hit
+
+    def mask(self, data: Any) -> Any:
+        """Masked copy of a JSON-like value; the input is never modified."""
+        if isinstance(data, dict):
+            out: Any = {}
+        elif isinstance(data, list):
+            out = []
         else:
-            masked[k] = v
-    return masked
\ No newline at end of file
+            return data
+        # (source container, destination container, inside a sensitive key)
+        stack = [(data, out, False)]
+        sensitive = self.sensitive
+        while stack:
+            src, dst, hidden = stack.pop()
+            if isinstance(src, dict):
+                for k, v in src.items():
+                    h = hidden or (isinstance(k, str) and sensitive(k))
+                    if isinstance(v, dict):
+                        dst[k] = child = {}
+                        stack.append((v, child, h))
+                    elif isinstance(v, list):
+                        dst[k] = child = []
+                        stack.append((v, child, h))
+                    elif h and isinstance(v, str):
+                        dst[k] = mask_string(v)
+                    else:
+                        dst[k] = v
+            else:
+                for v in src:
+                    if isinstance(v, dict):
+                        child = {}
+                        stack.append((v, child, hidden))
+                    elif isinstance(v, list):
+                        child = []
+                        stack.append((v, child, hidden))
+                    elif hidden and isinstance(v, str):
+                        child = mask_string(v)
+                    else:
+                        child = v
+                    dst.append(child)
+        return out
+
+
+masker = Masker()
+
+
+def mask_sensitive_values(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Masked copy of `data` under the process-wide policy."""
+    return masker.mask(data)
@@ -0,0 +1,409 @@
+# app/metrics.py
+# Dependency-free Prometheus metrics (text exposition format 0.0.4).
+#
+# Hot-path cost is one perf_counter pair, a bisect over the buckets and a few
+# integer increments under a per-metric lock. Everything that already keeps
+# its own counters (connection pool, caches, audit sink) is read only when
+# /metrics is scraped, through collectors.
+#
+# Under app.serve the preforked workers share one port, so a scrape reaches
+# whichever worker accepts it. serve.py sets MULTIPROCESS_DIR before forking:
+# every worker then writes its samples to <dir>/<pid>.json (every
+# METRICS_FLUSH_INTERVAL seconds, on each scrape and at shutdown) and /metrics
+# merges all files. Counters and histograms are summed over every worker that
+# ever ran: the supervisor folds exited workers into archive.json, so totals
+# never go backwards when a worker is recycled. Gauges are reported per live
+# worker with a `worker` (pid) label.
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional
+
+import psycopg
+
+from . import timing
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+
+# Seconds; covers sub-millisecond crypto up to slow requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs) -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in pairs]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+# A family is (name, type, help, [(suffix, [(label, value), ...], sample value), ...])
+def _render(families: Iterable) -> Iterable[str]:
+    for name, kind, help, samples in families:
+        yield f"# HELP {name} {help}"
+        yield f"# TYPE {name} {kind}"
+        for suffix, labels, value in samples:
+            yield f"{name}{suffix}{_labels(labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [count per bucket (+Inf last)..., sum]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *labels) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            s[i] += 1
+            s[-1] += value
+
+    def time(self, *labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def collect(self) -> list:
+        with self._lock:
+            series = [(k, list(v)) for k, v in self._series.items()]
+        les = [str(b) for b in self.buckets] + ["+Inf"]
+        samples = []
+        for labels, s in series:
+            pairs = [(n, str(v)) for n, v in zip(self.labelnames, labels)]
+            cum = 0
+            for le, n in zip(les, s):
+                cum += n
+                samples.append(("_bucket", pairs + [("le", le)], cum))
+            samples.append(("_sum", pairs, s[-1]))
+            samples.append(("_count", pairs, cum))
+        return [(self.name, "histogram", self.help, samples)]
+
+
+class _Timer:
+    __slots__ = ("hist", "labels", "t0")
+
+    def __init__(self, hist: Histogram, labels: tuple):
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t0, *self.labels)
+
+
+class Collector:
+    """
+    Metrics computed at scrape time: fn() returns
+    [(name, type, help, [(labels_dict, value), ...]), ...].
+    """
+
+    def __init__(self, fn: Callable[[], list]):
+        self.fn = fn
+        REGISTRY.append(self)
+
+    def collect(self) -> list:
+        return [
+            (name, kind, help, [("", [(k, str(v)) for k, v in labels.items()], value) for labels, value in samples])
+            for name, kind, help, samples in self.fn()
+        ]
+
+
+REGISTRY: list = []
+
+
+def render() -> str:
+    if MULTIPROCESS_DIR:
+        return render_merged()
+    lines = []
+    for m in REGISTRY:
+        try:
+            lines.extend(_render(m.collect()))
+        except Exception as e:  # one broken collector must not hide the rest
+            lines.append(f"# collector error: {_escape(str(e))}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------- Several worker processes (app.serve) ----------
+MULTIPROCESS_DIR: Optional[str] = None
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+ARCHIVE = "archive.json"
+
+
+def _collect_all() -> list:
+    families = []
+    for m in REGISTRY:
+        try:
+            families.extend(m.collect())
+        except Exception as e:
+            logger.warning("Metrics collector failed: %s", e)
+    return families
+
+
+def _write_json(path: str, data) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)  # readers never see a partial file
+
+
+def _read_json(path: str):
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_samples() -> None:
+    """Write this worker's samples to MULTIPROCESS_DIR/<pid>.json."""
+    _write_json(os.path.join(MULTIPROCESS_DIR, f"{os.getpid()}.json"), _collect_all())
+
+
+def _merge(sources: Iterable) -> list:
+    """
+    Families from (worker pid or None, families) sources: counters and
+    histograms summed, gauges kept per worker (None = archived: no gauges).
+    """
+    out: dict[str, list] = {}  # name -> [type, help, {(suffix, labels): value}]
+    for worker, families in sources:
+        for name, kind, help, samples in families:
+            if kind == "gauge" and worker is None:
+                continue
+            fam = out.setdefault(name, [kind, help, {}])
+            for suffix, labels, value in samples:
+                key = (suffix, tuple(map(tuple, labels)) + ((("worker", str(worker)),) if kind == "gauge" else ()))
+                fam[2][key] = fam[2].get(key, 0) + value
+    return [(name, kind, help, [(suffix, labels, v) for (suffix, labels), v in samples.items()])
+            for name, (kind, help, samples) in out.items()]
+
+
+def _load_archive(directory: str) -> dict:
+    try:
+        return _read_json(os.path.join(directory, ARCHIVE))
+    except (OSError, ValueError):
+        return {"pids": [], "families": []}
+
+
+def archive_worker(directory: str, pid: int) -> None:
+    """Supervisor: fold an exited worker's counters and histograms into archive.json."""
+    path = os.path.join(directory, f"{pid}.json")
+    try:
+        families = _read_json(path)
+    except (OSError, ValueError):
+        return  # never wrote its samples
+    archive = _load_archive(directory)
+    # pids already folded in: readers skip their files until they are deleted
+    pids = [p for p in archive["pids"] if os.path.exists(os.path.join(directory, f"{p}.json"))]
+    _write_json(os.path.join(directory, ARCHIVE), {
+        "pids": pids + [pid],
+        "families": _merge([(None, archive["families"]), (None, families)]),
+    })
+    os.unlink(path)
+
+
+def render_merged() -> str:
+    """/metrics across every worker sharing MULTIPROCESS_DIR (this one refreshed first)."""
+    write_samples()
+    archive = _load_archive(MULTIPROCESS_DIR)
+    skip = set(archive["pids"])
+    sources = [(None, archive["families"])]
+    for name in sorted(os.listdir(MULTIPROCESS_DIR)):
+        pid = name[:-len(".json")]
+        if not name.endswith(".json") or not pid.isdigit() or int(pid) in skip:
+            continue
+        try:
+            sources.append((int(pid), _read_json(os.path.join(MULTIPROCESS_DIR, name))))
+        except (OSError, ValueError):
+            continue  # archived and deleted while listing
+    return "\n".join(_render(_merge(sources))) + "\n"
+
+
+class SampleWriter:
+    """Writes this worker's samples every `interval` seconds and once more on stop()."""
+
+    def __init__(self, interval: float = METRICS_FLUSH_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if not MULTIPROCESS_DIR or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._write()
+
+    def _write(self) -> None:
+        try:
+            write_samples()
+        except OSError as e:
+            logger.warning("Cannot write metrics samples: %s", e)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._write()
+
+
+sample_writer = SampleWriter()
+
+
+# ---------- Shared instruments ----------
+HTTP_LATENCY = Histogram(
+    "confmgr_http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+DB_LATENCY = Histogram(
+    "confmgr_db_statement_duration_seconds", "Time spent in cursor.execute by statement",
+    ("statement",),
+)
+CRYPTO_LATENCY = Histogram(
+    "confmgr_crypto_duration_seconds", "AES-GCM seal/open time (including compression)",
+    ("op",),
+)
+JWT_VERIFY_LATENCY = Histogram(
+    "confmgr_jwt_verify_duration_seconds", "JWT signature verification time (cache misses only)",
+)
+
+
+# ---------- Connection pools ----------
+# name -> pool; main.py registers "sync", main_async.py "async"
+POOLS: dict = {}
+
+_POOL_METRICS = (
+    # (metric, type, help, get_stats() key, scale)
+    ("confmgr_db_pool_size", "gauge", "Connections currently open", "pool_size", 1),
+    ("confmgr_db_pool_available", "gauge", "Idle connections", "pool_available", 1),
+    ("confmgr_db_pool_max", "gauge", "Configured max_size", "pool_max", 1),
+    ("confmgr_db_pool_requests_waiting", "gauge", "Requests waiting for a connection now", "requests_waiting", 1),
+    ("confmgr_db_pool_requests_total", "counter", "Connection requests", "requests_num", 1),
+    ("confmgr_db_pool_requests_queued_total", "counter", "Requests that had to wait", "requests_queued", 1),
+    ("confmgr_db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection", "requests_wait_ms", 0.001),
+    ("confmgr_db_pool_errors_total", "counter", "Requests that timed out or failed", "requests_errors", 1),
+    ("confmgr_db_pool_usage_seconds_total", "counter", "Time connections were checked out", "usage_ms", 0.001),
+    ("confmgr_db_pool_connections_lost_total", "counter", "Connections found broken", "connections_lost", 1),
+)
+
+
+def _pool_metrics() -> list:
+    stats = {name: p.get_stats() for name, p in POOLS.items()}
+    return [
+        (metric, kind, help, [({"pool": name}, st.get(key, 0) * scale) for name, st in stats.items()])
+        for metric, kind, help, key, scale in _POOL_METRICS
+    ]
+
+
+Collector(_pool_metrics)
+
+
+# ---------- HTTP middleware ----------
+_TEMPLATES: dict[int, dict] = {}  # id(app) -> {endpoint: route template}
+
+
+def route_template(fastapi_app, scope) -> str:
+    """Template (/config/{path:path}) of the route that handled `scope`; the router stores the endpoint there."""
+    templates = _TEMPLATES.get(id(fastapi_app))
+    if templates is None:
+        templates = _TEMPLATES[id(fastapi_app)] = {
+            r.endpoint: r.path for r in fastapi_app.routes if hasattr(r, "endpoint")
+        }
+    return templates.get(scope.get("endpoint"), "unmatched")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request. Routes are labelled by their
+    template (/config/{path:path}), never the raw path, to bound cardinality.
+    """
+
+    def __init__(self, app, fastapi_app):
+        self.app = app
+        self.fastapi_app = fastapi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched endpoint in the (shared) scope
+            HTTP_LATENCY.observe(time.perf_counter() - t0, scope["method"], route_template(self.fastapi_app, scope), status)
+
+
+# ---------- DB statement timing ----------
+# SQL text -> label. Constants from app/queries.py are labelled by name; any
+# other statement by its leading keyword, so labels stay bounded.
+_STATEMENT_NAMES: dict[str, str] = {}
+
+
+def register_statements(module) -> None:
+    for name, value in vars(module).items():
+        if name.isupper() and isinstance(value, str):
+            _STATEMENT_NAMES[value] = name.lower()
+
+
+def _statement_label(query) -> str:
+    if not isinstance(query, str):
+        return "other"  # psycopg.sql.Composed etc.
+    label = _STATEMENT_NAMES.get(query)
+    if label is None:
+        words = query.split(None, 1)
+        label = "other_" + words[0].lower() if words else "other"
+    return label
+
+
+class TimedCursor(psycopg.Cursor):
+    """cursor_factory for the sync pool. In pipeline mode this times the enqueue only."""
+
+    def execute(self, query, params=None, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, params, **kwargs)
+        finally:
+            dt = time.perf_counter() - t0
+            DB_LATENCY.observe(dt, _statement_label(query))
+            timing.add("db", dt)
+
+
+class TimedAsyncCursor(psycopg.AsyncCursor):
+    """cursor_factory for the async pool."""
+
+    async def execute(self, query, params=None, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            dt = time.perf_counter() - t0
+            DB_LATENCY.observe(dt, _statement_label(query))
+            timing.add("db", dt)
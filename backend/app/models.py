@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import Any, Dict
-from .masking import mask_sensitive_values
+from typing import Any, Dict, List, Optional
+from .masking import masker
 
 class PutConfigIn(BaseModel):
     value: Any
@@ -25,5 +25,32 @@ class SecretOut(BaseModel):
     def masked_value(self) -> Dict[str, Any]:
         """Return masked version of the secret value if masking is enabled"""
         if self.mask_response:
-            return mask_sensitive_values(self.value)
+            return masker.mask(self.value)
         return self.value
+
+
+class BatchGetItem(BaseModel):
+    path: str
+    version: Optional[int] = None
+
+class BatchGetIn(BaseModel):
+    items: List[BatchGetItem] = Field(..., min_length=1, description="Paths to resolve; version=None means current")
+
+class BatchItemOut(BaseModel):
+    found: bool
+    version: Optional[int] = None
+    value: Any = None
+    created_at: Optional[str] = None
+
+class BatchGetOut(BaseModel):
+    # Keyed by "path" for current lookups, "path@version" for explicit versions
+    results: Dict[str, BatchItemOut]
+
+class TokenIn(BaseModel):
+    client_id: str = Field(..., min_length=1, max_length=200)
+    client_secret: str = Field(..., min_length=1, max_length=200)
+
+class TokenOut(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
@@ -0,0 +1,87 @@
+import json
+import logging
+import threading
+from typing import Callable, Optional
+
+from psycopg import sql
+
+from . import db
+
+logger = logging.getLogger(__name__)
+
+# Hardcoded in the triggers (postgres/initdb/70_change_notify.sql and
+# 76_api_clients_notify.sql), so it is not configurable here either
+CHANNEL = "confmgr_changes"
+
+# callback(kind, path, version); version may be None for a full reset
+Subscriber = Callable[[str, Optional[str], Optional[int]], None]
+
+
+class ChangeListener:
+    """
+    One dedicated LISTEN connection per process, fanning NOTIFY payloads out
+    to in-process subscribers. It never borrows from the request pool.
+
+    On every (re)connect subscribers receive a reset (path=None), because any
+    notification sent while we were disconnected is lost.
+    """
+
+    def __init__(self, channel: str = CHANNEL, poll_timeout: float = 1.0):
+        self.channel = channel
+        self.poll_timeout = poll_timeout
+        self._subscribers: list[Subscriber] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.connected = False
+
+    def subscribe(self, callback: Subscriber) -> None:
+        self._subscribers.append(callback)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _dispatch(self, kind: str, path: Optional[str], version: Optional[int]) -> None:
+        for cb in self._subscribers:
+            try:
+                cb(kind, path, version)
+            except Exception:
+                logger.exception("Change subscriber failed")
+
+    def _handle(self, payload: str) -> None:
+        try:
+            msg = json.loads(payload)
+            self._dispatch(msg["kind"], msg["path"], msg.get("version"))
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed change notification: %r", payload)
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                with db.connect(autocommit=True) as conn:
+                    conn.execute(sql.SQL("listen {}").format(sql.Identifier(self.channel)))
+                    self.connected = True
+                    backoff = 1.0
+                    self._dispatch("*", None, None)
+                    logger.info("Listening for changes on '%s'", self.channel)
+                    while not self._stop.is_set():
+                        for n in conn.notifies(timeout=self.poll_timeout):
+                            self._handle(n.payload)
+            except Exception as e:
+                logger.warning("Change listener disconnected: %s (retry in %.0fs)", e, backoff)
+            finally:
+                self.connected = False
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+
+listener = ChangeListener()
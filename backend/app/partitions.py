@@ -0,0 +1,120 @@
+# app/partitions.py
+# Audit partition maintenance (postgres/initdb/74_audit_partition_maint.sql).
+#
+# CLI:
+#   python -m app.partitions                      # ensure partitions + report
+#   python -m app.partitions --ahead 6 --retention-months 12 --drop
+#   python -m app.partitions --report-only
+#
+# Background: AUDIT_PARTITION_MAINT=true runs the same job in every backend
+# worker every AUDIT_PARTITION_INTERVAL seconds (the SQL side serializes them).
+import argparse
+import logging
+import os
+import sys
+import threading
+from typing import Optional
+
+from psycopg.rows import dict_row
+
+from .db import pool
+
+logger = logging.getLogger(__name__)
+
+AUDIT_PARTITION_MAINT = os.getenv("AUDIT_PARTITION_MAINT", "false").strip().lower() in ("1", "true", "yes")
+AUDIT_PARTITION_INTERVAL = float(os.getenv("AUDIT_PARTITION_INTERVAL", "21600"))  # 6h
+AUDIT_PARTITIONS_AHEAD = int(os.getenv("AUDIT_PARTITIONS_AHEAD", "3"))
+# 0 keeps partitions forever
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "0"))
+AUDIT_RETENTION_DROP = os.getenv("AUDIT_RETENTION_DROP", "false").strip().lower() in ("1", "true", "yes")
+
+
+def maintain(ahead: int = AUDIT_PARTITIONS_AHEAD,
+             retention_months: int = AUDIT_RETENTION_MONTHS,
+             drop: bool = AUDIT_RETENTION_DROP) -> dict:
+    """Pre-create future partitions and expire old ones; returns what changed."""
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("select audit.ensure_partitions(%s)", (ahead,))
+        created = [r[0] for r in cur.fetchall()]
+        expired = []
+        if retention_months > 0:
+            cur.execute(
+                "select audit.expire_partitions(make_interval(months => %s), %s)",
+                (retention_months, drop),
+            )
+            expired = [r[0] for r in cur.fetchall()]
+        conn.commit()
+    if created or expired:
+        logger.info("Audit partitions: created=%s %s=%s", created, "dropped" if drop else "detached", expired)
+    return {"created": created, "expired": expired, "dropped": drop}
+
+
+def report() -> list[dict]:
+    with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute("select * from audit.partition_report()")
+        return cur.fetchall()
+
+
+class PartitionMaintainer:
+    """Runs maintain() on start and then every `interval` seconds."""
+
+    def __init__(self, interval: float = AUDIT_PARTITION_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-partitions", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                maintain()
+            except Exception as e:
+                logger.error("Audit partition maintenance failed: %s", e)
+            self._stop.wait(self.interval)
+
+
+maintainer = PartitionMaintainer()
+
+
+def _fmt_bytes(n: int) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024:
+            return f"{n:.0f}{unit}"
+        n /= 1024
+    return f"{n:.1f}TiB"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Maintain audit.audit_logs partitions")
+    ap.add_argument("--ahead", type=int, default=AUDIT_PARTITIONS_AHEAD, help="months to pre-create")
+    ap.add_argument("--retention-months", type=int, default=AUDIT_RETENTION_MONTHS, help="0 = keep forever")
+    ap.add_argument("--drop", action="store_true", default=AUDIT_RETENTION_DROP, help="drop instead of detach")
+    ap.add_argument("--report-only", action="store_true")
+    args = ap.parse_args()
+    pool.open(wait=True)
+
+    if not args.report_only:
+        res = maintain(args.ahead, args.retention_months, args.drop)
+        print(f"created: {', '.join(res['created']) or '-'}")
+        print(f"{'dropped' if res['dropped'] else 'detached'}: {', '.join(res['expired']) or '-'}")
+
+    print(f"{'partition':28s} {'rows~':>10s} {'table':>9s} {'index':>9s} {'total':>9s}  bounds")
+    for r in report():
+        print(f"{r['partition']:28s} {r['row_estimate']:>10d} {_fmt_bytes(r['table_bytes']):>9s} "
+              f"{_fmt_bytes(r['index_bytes']):>9s} {_fmt_bytes(r['total_bytes']):>9s}  {r['bounds']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# app/queries.py
+# Hot-path SQL shared by the sync (main.py) and async (main_async.py) handlers.
+
+# ---------- CONFIG ----------
+CONFIG_CURRENT = """
+    select cv.version, cv.value_json, cv.checksum, cv.created_at
+    from core.config_items ci
+    join core.config_versions cv on cv.item_id = ci.id
+    where ci.path = %s and cv.is_current
+"""
+
+# Revalidation without touching value_json (ix_config_versions_current_etag)
+CONFIG_CURRENT_ETAG = """
+    select cv.checksum
+    from core.config_items ci
+    join core.config_versions cv on cv.item_id = ci.id
+    where ci.path = %s and cv.is_current
+"""
+
+# Whole write path in one statement: upsert item, checksum short-circuit,
+# insert version, audit event (postgres/initdb/73_put_config_fn.sql)
+CONFIG_PUT = """
+    select new_version as version, new_created_at as created_at, changed
+    from core.put_config(%s, %s::jsonb, %s::bytea, %s::uuid, %s::text, %s::boolean)
+"""
+
+# ---------- SECRETS ----------
+# Envelope rows (crypto.ENVELOPE_ALG) also need the item's wrapped DEK
+SECRET_CURRENT = """
+    select sv.version, sv.ciphertext, sv.nonce, sv.alg, sv.created_at,
+           sv.item_id, si.kek_id, si.dek_nonce, si.wrapped_dek
+    from core.secret_items si
+    join core.secret_versions sv on sv.item_id = si.id
+    where si.path = %s and sv.is_current
+"""
+
+SECRET_VERSION = """
+    select sv.version, sv.ciphertext, sv.nonce, sv.alg, sv.created_at,
+           sv.item_id, si.kek_id, si.dek_nonce, si.wrapped_dek
+    from core.secret_items si
+    join core.secret_versions sv on sv.item_id = si.id
+    where si.path = %s and sv.version = %s
+"""
+
+# Revalidation without fetching the ciphertext (ix_secret_versions_current_ver)
+SECRET_CURRENT_VERSION = """
+    select sv.version
+    from core.secret_items si
+    join core.secret_versions sv on sv.item_id = si.id
+    where si.path = %s and sv.is_current
+"""
+
+# Same for an explicit version: it must exist before a 304 (secret_versions pkey)
+SECRET_VERSION_EXISTS = """
+    select sv.version
+    from core.secret_items si
+    join core.secret_versions sv on sv.item_id = si.id
+    where si.path = %s and sv.version = %s
+"""
+
+SECRET_ITEM_ID = "select id from core.secret_items where path = %s"
+
+# Metadata page, newest first; index-only on ix_secret_item_ver_desc_meta
+SECRET_VERSIONS_PAGE = """
+    select version, is_current, alg, created_at, created_by
+    from core.secret_versions
+    where item_id = %s and version < %s
+    order by version desc
+    limit %s
+"""
+
+# Same page with ciphertext and the item's DEK, for bulk decryption
+SECRET_VERSIONS_PAGE_VALUES = """
+    select sv.version, sv.is_current, sv.alg, sv.created_at, sv.created_by,
+           sv.ciphertext, sv.nonce, sv.item_id, si.kek_id, si.dek_nonce, si.wrapped_dek
+    from core.secret_versions sv
+    join core.secret_items si on si.id = sv.item_id
+    where sv.item_id = %s and sv.version < %s
+    order by sv.version desc
+    limit %s
+"""
+
+SECRET_ENSURE_ITEM = """
+    insert into core.secret_items(path, created_by)
+    values (%s, %s)
+    on conflict(path) do nothing
+"""
+
+# Lock the parent row to serialize writers (no FOR UPDATE on aggregates)
+SECRET_LOCK_ITEM = """
+    select id, kek_id, dek_nonce, wrapped_dek
+    from core.secret_items
+    where path = %s
+    for update
+"""
+
+# First envelope write of an item stores its wrapped DEK
+SECRET_SET_DEK = """
+    update core.secret_items
+    set dek_nonce = %s::bytea, wrapped_dek = %s::bytea, kek_id = %s
+    where id = %s
+"""
+
+SECRET_MAX_VERSION = "select coalesce(max(version), 0) as mv from core.secret_versions where item_id = %s"
+
+SECRET_UNSET_CURRENT = "update core.secret_versions set is_current = false where item_id = %s and is_current"
+
+SECRET_INSERT_VERSION = """
+    insert into core.secret_versions(item_id, version, is_current, ciphertext, nonce, alg, created_by)
+    values (%s, %s, true, %s::bytea, %s::bytea, %s, %s)
+    returning version, created_at
+"""
+
+# ---------- BATCH ----------
+# Exactly the requested rows: current rows for the paths asked without a
+# version (%s = text[]), plus the (path, version) pairs (%s, %s = text[], int[])
+CONFIG_BATCH = """
+    select ci.path, null::int as requested, cv.item_id, cv.version, cv.is_current,
+           cv.value_json, cv.checksum, cv.created_at
+    from core.config_items ci
+    join core.config_versions cv on cv.item_id = ci.id and cv.is_current
+    where ci.path = any(%s::text[])
+    union all
+    select ci.path, r.version, cv.item_id, cv.version, cv.is_current,
+           cv.value_json, cv.checksum, cv.created_at
+    from unnest(%s::text[], %s::int[]) as r(path, version)
+    join core.config_items ci on ci.path = r.path
+    join core.config_versions cv on cv.item_id = ci.id and cv.version = r.version
+"""
+
+SECRET_BATCH = """
+    select si.path, null::int as requested, sv.version, sv.is_current, sv.ciphertext, sv.nonce,
+           sv.alg, sv.created_at, sv.item_id, si.kek_id, si.dek_nonce, si.wrapped_dek
+    from core.secret_items si
+    join core.secret_versions sv on sv.item_id = si.id and sv.is_current
+    where si.path = any(%s::text[])
+    union all
+    select si.path, r.version, sv.version, sv.is_current, sv.ciphertext, sv.nonce,
+           sv.alg, sv.created_at, sv.item_id, si.kek_id, si.dek_nonce, si.wrapped_dek
+    from unnest(%s::text[], %s::int[]) as r(path, version)
+    join core.secret_items si on si.path = r.path
+    join core.secret_versions sv on sv.item_id = si.id and sv.version = r.version
+"""
+
+def batch_params(pending: list[tuple[str, str, int | None]]) -> tuple[list, list, list]:
+    """CONFIG_BATCH / SECRET_BATCH parameters for [(key, path, version)]."""
+    explicit = [(p, v) for _, p, v in pending if v is not None]
+    return (
+        [p for _, p, v in pending if v is None],
+        [p for p, _ in explicit],
+        [v for _, v in explicit],
+    )
+
+# ---------- AUDIT ----------
+AUDIT_LOG_EVENT = """
+    select audit.log_event(%s::uuid, %s::text, %s::text, %s::text, %s::jsonb)
+"""
+
+# ---------- PREPARE ----------
+# Read statements prepared on every new pooled connection (db._configure),
+# with sample parameters of the same types the handlers pass
+PREPARE_ON_CONNECT = (
+    (CONFIG_CURRENT, ("",)),
+    (CONFIG_CURRENT_ETAG, ("",)),
+    (SECRET_CURRENT, ("",)),
+    (SECRET_VERSION, ("", 1)),
+    (SECRET_CURRENT_VERSION, ("",)),
+    (SECRET_VERSION_EXISTS, ("", 1)),
+)
@@ -0,0 +1,220 @@
+# app/rekey.py
+# Master key rotation for envelope-encrypted secrets (postgres/initdb/77_envelope_keys.sql).
+#
+# 1) add the new key to MASTER_KEYS and point MASTER_KEY_ID at it on every
+#    backend (new items are wrapped with it; old ones still unwrap)
+# 2) run:
+#   python -m app.rekey                        # re-wrap every DEK not on MASTER_KEY_ID
+#   python -m app.rekey --batch 200 --sleep 0.5
+#   python -m app.rekey --migrate-legacy       # also move AES256-GCM versions onto DEKs
+#   python -m app.rekey --status
+# 3) once --status shows nothing left, drop the old key from MASTER_KEYS
+#
+# Online and resumable: every batch is one short transaction that locks only
+# its own item rows (SKIP LOCKED, so writers are never blocked for long), and
+# progress is the kek_id column itself, so an interrupted run just starts again.
+import argparse
+import logging
+import sys
+import time
+
+from psycopg.rows import dict_row
+
+from .crypto import (
+    ENVELOPE_ALG, LEGACY_ALG, MASTER_KEY_ID,
+    open_sealed, seal_item, unwrap_dek, wrap_dek, writer_dek,
+)
+from .db import pool
+from .logging_config import setup_logging
+from . import queries as Q
+
+logger = logging.getLogger(__name__)
+
+STATUS_SQL = """
+    select coalesce(kek_id, '(none)') as kek_id, count(*) as items
+    from core.secret_items
+    group by 1
+    order by 1
+"""
+
+LEGACY_COUNT_SQL = "select count(*) as n from core.secret_versions where alg = %s"
+
+REWRAP_COUNT_SQL = """
+    select count(*) as n from core.secret_items
+    where kek_id is not null and kek_id <> %s
+"""
+
+REWRAP_BATCH_SQL = """
+    select id, kek_id, dek_nonce, wrapped_dek
+    from core.secret_items
+    where kek_id is not null and kek_id <> %s and id > %s
+    order by id
+    limit %s
+    for update skip locked
+"""
+
+REWRAP_UPDATE_SQL = """
+    update core.secret_items
+    set kek_id = %s, dek_nonce = %s::bytea, wrapped_dek = %s::bytea
+    where id = %s
+"""
+
+LEGACY_ITEMS_SQL = """
+    select si.id, si.path, si.kek_id, si.dek_nonce, si.wrapped_dek
+    from core.secret_items si
+    where si.id > %s
+      and exists (select 1 from core.secret_versions sv where sv.item_id = si.id and sv.alg = %s)
+    order by si.id
+    limit %s
+    for update skip locked
+"""
+
+LEGACY_VERSIONS_SQL = """
+    select item_id, version, nonce, ciphertext
+    from core.secret_versions
+    where item_id = any(%s) and alg = %s
+"""
+
+LEGACY_UPDATE_SQL = """
+    update core.secret_versions
+    set ciphertext = %s::bytea, nonce = %s::bytea, alg = %s
+    where item_id = %s and version = %s
+"""
+
+
+class Throttle:
+    """Sleeps between batches: a fixed pause plus whatever keeps us under max_rate rows/s."""
+
+    def __init__(self, sleep: float, max_rate: float):
+        self.sleep = sleep
+        self.max_rate = max_rate
+        self.started = time.monotonic()
+
+    def wait(self, done: int) -> None:
+        delay = self.sleep
+        if self.max_rate > 0:
+            delay = max(delay, done / self.max_rate - (time.monotonic() - self.started))
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _progress(what: str, done: int, total: int, started: float) -> None:
+    elapsed = time.monotonic() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 and total > done else 0.0
+    logger.info("%s: %d/%d (%.0f/s, eta %.0fs)", what, done, total, rate, eta)
+
+
+def status() -> dict:
+    with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(STATUS_SQL)
+        by_kek = {r["kek_id"]: r["items"] for r in cur.fetchall()}
+        cur.execute(LEGACY_COUNT_SQL, (LEGACY_ALG,))
+        legacy = cur.fetchone()["n"]
+    return {"active_kek": MASTER_KEY_ID, "items_by_kek": by_kek, "legacy_versions": legacy}
+
+
+def rewrap(batch: int = 500, sleep: float = 0.0, max_rate: float = 0.0) -> int:
+    """Re-wrap every item DEK that is not under MASTER_KEY_ID; returns items done."""
+    with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(REWRAP_COUNT_SQL, (MASTER_KEY_ID,))
+        total = cur.fetchone()["n"]
+    done, started, throttle = 0, time.monotonic(), Throttle(sleep, max_rate)
+    # Rows locked by a concurrent writer are skipped; later passes pick them up
+    while True:
+        last_id, done_in_pass = 0, 0
+        while True:
+            with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(REWRAP_BATCH_SQL, (MASTER_KEY_ID, last_id, batch))
+                rows = cur.fetchall()
+                updates = []
+                for r in rows:
+                    dek = unwrap_dek(r["id"], r["kek_id"], r["dek_nonce"], r["wrapped_dek"])
+                    nonce, wrapped = wrap_dek(dek, r["id"], MASTER_KEY_ID)
+                    updates.append((MASTER_KEY_ID, nonce, wrapped, r["id"]))
+                if updates:
+                    cur.executemany(REWRAP_UPDATE_SQL, updates)
+                conn.commit()
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            done += len(rows)
+            done_in_pass += len(rows)
+            _progress("rewrap", done, total, started)
+            throttle.wait(done)
+        if not done_in_pass:
+            return done
+
+
+def migrate_legacy(batch: int = 100, sleep: float = 0.0, max_rate: float = 0.0) -> int:
+    """Re-encrypt AES256-GCM versions under their item's DEK; returns versions done."""
+    with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(LEGACY_COUNT_SQL, (LEGACY_ALG,))
+        total = cur.fetchone()["n"]
+    done, started, throttle = 0, time.monotonic(), Throttle(sleep, max_rate)
+    while True:
+        last_id, done_in_pass = 0, 0
+        while True:
+            with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+                cur.execute(LEGACY_ITEMS_SQL, (last_id, LEGACY_ALG, batch))
+                items = {r["id"]: r for r in cur.fetchall()}
+                n = 0
+                if items:
+                    cur.execute(LEGACY_VERSIONS_SQL, (list(items), LEGACY_ALG))
+                    versions = cur.fetchall()
+                    deks = {}
+                    for item_id, item in items.items():
+                        aead, new_dek = writer_dek(item)
+                        if new_dek:
+                            cur.execute(Q.SECRET_SET_DEK, (*new_dek, item_id))
+                        deks[item_id] = aead
+                    updates = []
+                    for v in versions:
+                        # Same AAD as the write path: the plaintext and version are unchanged
+                        aad = f"{items[v['item_id']]['path']}|{v['version']}".encode()
+                        plaintext = open_sealed(v["nonce"], v["ciphertext"], aad)
+                        nonce, ct = seal_item(deks[v["item_id"]], plaintext, aad)
+                        updates.append((ct, nonce, ENVELOPE_ALG, v["item_id"], v["version"]))
+                    cur.executemany(LEGACY_UPDATE_SQL, updates)
+                    n = len(updates)
+                conn.commit()
+            if not items:
+                break
+            last_id = max(items)
+            done += n
+            done_in_pass += n
+            _progress("migrate-legacy", done, total, started)
+            throttle.wait(done)
+        if not done_in_pass:
+            return done
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Re-wrap secret data keys under MASTER_KEY_ID")
+    ap.add_argument("--batch", type=int, default=500, help="items per transaction")
+    ap.add_argument("--sleep", type=float, default=0.0, help="pause between batches (seconds)")
+    ap.add_argument("--max-rate", type=float, default=0.0, help="rows per second (0 = unlimited)")
+    ap.add_argument("--migrate-legacy", action="store_true",
+                    help="also re-encrypt AES256-GCM versions (sealed with DATA_KEY_HEX) under item DEKs")
+    ap.add_argument("--status", action="store_true", help="only print what is left")
+    args = ap.parse_args()
+    setup_logging()
+    pool.open(wait=True)
+
+    if not args.status:
+        if args.migrate_legacy:
+            n = migrate_legacy(max(1, args.batch // 5), args.sleep, args.max_rate)
+            print(f"legacy versions migrated: {n}")
+        n = rewrap(args.batch, args.sleep, args.max_rate)
+        print(f"items re-wrapped under '{MASTER_KEY_ID}': {n}")
+
+    st = status()
+    print(f"active master key: {st['active_kek']}")
+    for kek_id, items in st["items_by_kek"].items():
+        print(f"  {kek_id:20s} {items:>10d} items")
+    print(f"legacy versions (DATA_KEY_HEX): {st['legacy_versions']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+# app/replica.py
+# Read-replica routing (REPLICA_PGHOST, see db.replica_pool).
+#
+# GET /config/{path}, GET /secret/{path} and the prefix listings read from the
+# replica unless one of these sends them to the primary:
+#   - replay lag (measured every REPLICA_LAG_INTERVAL seconds) is above
+#     REPLICA_MAX_LAG, or the last measurement failed / is too old
+#   - the same principal wrote within READ_YOUR_WRITES_WINDOW seconds
+#   - the replica's row is older than ?min_version= or than the newest version
+#     this worker has seen for the path (its own writes plus NOTIFY from the
+#     primary), so the read caches never store a value already replaced
+# Writes, /watch and everything else always use the primary pool.
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from .cache import LRUCache
+from .db import replica_pool
+
+logger = logging.getLogger(__name__)
+
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "2"))
+REPLICA_LAG_INTERVAL = float(os.getenv("REPLICA_LAG_INTERVAL", "1"))
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+
+# A standby that has replayed everything it received is current even when the
+# primary is idle (pg_last_xact_replay_timestamp() alone would keep growing)
+LAG_SQL = """
+    select case
+        when not pg_is_in_recovery() then 0.0
+        when pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() then 0.0
+        else coalesce(extract(epoch from now() - pg_last_xact_replay_timestamp()), 0.0)
+    end::float8
+"""
+
+
+class ReplicaRouter:
+    """Decides per read whether the replica may answer; see the module docstring."""
+
+    def __init__(self, replica=replica_pool, max_lag: float = REPLICA_MAX_LAG,
+                 interval: float = REPLICA_LAG_INTERVAL, window: float = READ_YOUR_WRITES_WINDOW):
+        self.replica = replica
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self.error: Optional[str] = None
+        # principal id -> True while its writes may not be on the replica yet
+        self._writers = LRUCache("replica_writers", max_size=10000 if window > 0 else 0, ttl=max(window, 0.001))
+        # (kind, path) -> newest version seen; older than that once lag is acceptable
+        self._expected = LRUCache("replica_expected", max_size=10000, ttl=max(30.0, 10 * max_lag))
+        self.reads = {"replica": 0, "primary": 0}
+        self.fallbacks = {"lag": 0, "writer": 0, "stale": 0}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.replica is not None
+
+    def healthy(self) -> bool:
+        return (self.lag is not None and self.lag <= self.max_lag
+                and time.monotonic() - self.checked_at < 3 * self.interval)
+
+    def use_replica(self, principal) -> bool:
+        """Route this read to the replica? Counts the decision."""
+        if not self.enabled:
+            return False
+        if not self.healthy():
+            reason = "lag"
+        elif self._writers.get(principal.id) is not None:
+            reason = "writer"
+        else:
+            self.reads["replica"] += 1
+            return True
+        self.fallbacks[reason] += 1
+        self.reads["primary"] += 1
+        return False
+
+    def floor(self, kind: str, path: str, min_version: Optional[int] = None) -> int:
+        """Oldest version a replica answer for `path` may have (0 = any)."""
+        return max(self._expected.get((kind, path)) or 0, min_version or 0)
+
+    def accept(self, row_version: Optional[int], floor: int) -> bool:
+        """False when a replica row is missing or older than `floor`: re-read on the primary."""
+        if row_version is not None and row_version >= floor:
+            return True
+        self.fallbacks["stale"] += 1
+        self.reads["primary"] += 1
+        return False
+
+    def note_version(self, kind: str, path: Optional[str], version: Optional[int]) -> None:
+        """notify.listener subscriber: remember the newest version of every changed path."""
+        if not self.enabled or kind not in ("config", "secret") or not path or not version:
+            return
+        if version > (self._expected.get((kind, path)) or 0):
+            self._expected.put((kind, path), version)
+
+    def note_write(self, principal, kind: str, path: str, version: int) -> None:
+        """After a write on the primary: read-your-writes for `principal`, and a floor for everyone."""
+        if not self.enabled:
+            return
+        self._writers.put(principal.id, True)
+        self.note_version(kind, path, version)
+
+    def check(self) -> Optional[float]:
+        try:
+            with self.replica.connection(timeout=self.interval) as conn, conn.cursor() as cur:
+                cur.execute(LAG_SQL)
+                lag = cur.fetchone()[0]
+        except Exception as e:
+            if self.error is None:
+                logger.warning("Replica lag check failed, reading from the primary: %s", e)
+            self.lag, self.error = None, str(e) or type(e).__name__
+            return None
+        if self.error is not None:
+            logger.info("Replica lag check recovered (lag %.2fs)", lag)
+        elif self.lag is not None and (self.lag <= self.max_lag) != (lag <= self.max_lag):
+            logger.warning("Replica lag %.2fs (max %.2fs): reads %s", lag, self.max_lag,
+                           "back on the replica" if lag <= self.max_lag else "moved to the primary")
+        self.lag, self.error, self.checked_at = lag, None, time.monotonic()
+        return lag
+
+    def start(self) -> None:
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-lag", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.interval)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "lag_s": self.lag,
+            "healthy": self.enabled and self.healthy(),
+            "error": self.error,
+            "reads": dict(self.reads),
+            "fallbacks": dict(self.fallbacks),
+        }
+
+
+router = ReplicaRouter()
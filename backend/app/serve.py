@@ -0,0 +1,314 @@
+# app/serve.py
+# Production launcher: python -m app.serve [--app app.main:app] [--workers N]
+#
+# The parent imports the app once (preload) and binds the listening socket.
+# Then it forks SERVE_WORKERS uvicorn workers that share both, so workers start
+# without re-importing and share the parent's memory pages copy-on-write. The
+# DB pools are created with open=False (db.py), so no connection or pool thread
+# exists before the fork: each worker opens its own in the app lifespan.
+#
+# Sizing:
+#   - workers: SERVE_WORKERS, else the container CPU quota (cgroup v2/v1), else
+#     the CPUs this process may run on
+#   - connections: DB_CONNECTION_BUDGET (default: the server's max_connections
+#     minus superuser/reserved slots and DB_RESERVED_CONNECTIONS) is divided
+#     across workers. Every primary pool in a worker (the sync pool, plus the
+#     async pool in app.main_async) gets the same max_size, chosen so that
+#     workers x (pools + the LISTEN connection) stays within the budget. DB_POOL_MAX, when set, is an
+#     upper bound. Replica pools get the same size, because a hot standby's
+#     max_connections is at least the primary's.
+#
+# Metrics: workers share the port, so each writes its samples to a shared
+# directory (SERVE_METRICS_DIR, default a fresh temp dir) and /metrics on any
+# worker merges them; exited workers are folded into the archive (metrics.py).
+#
+# Lifecycle:
+#   - a worker exits after SERVE_MAX_REQUESTS requests (plus random jitter)
+#     and is replaced by a fresh fork
+#   - SIGTERM/SIGINT: workers stop accepting, finish in-flight requests for up
+#     to SERVE_GRACEFUL_TIMEOUT seconds, run the lifespan shutdown (audit flush,
+#     pool close) and exit. A second signal kills them immediately.
+import argparse
+import logging
+import math
+import os
+import random
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from typing import Optional
+
+import uvicorn
+from uvicorn.importer import import_from_string
+
+from . import db, metrics
+from .metrics import POOLS
+
+logger = logging.getLogger(__name__)
+
+SERVE_APP = os.getenv("SERVE_APP", "app.main:app")
+SERVE_HOST = os.getenv("SERVE_HOST", "0.0.0.0")
+SERVE_PORT = int(os.getenv("SERVE_PORT", "8080"))
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "0"))  # 0 = from the CPU quota
+SERVE_MAX_REQUESTS = int(os.getenv("SERVE_MAX_REQUESTS", "0"))  # 0 = never recycle
+SERVE_MAX_REQUESTS_JITTER = int(os.getenv("SERVE_MAX_REQUESTS_JITTER", "0"))
+SERVE_GRACEFUL_TIMEOUT = float(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30"))
+SERVE_BACKLOG = int(os.getenv("SERVE_BACKLOG", "2048"))
+SERVE_LOG_LEVEL = os.getenv("SERVE_LOG_LEVEL", "info")
+SERVE_METRICS_DIR = os.getenv("SERVE_METRICS_DIR", "")  # "" = temp dir removed on exit
+
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", "0"))  # 0 = ask the server
+DB_RESERVED_CONNECTIONS = int(os.getenv("DB_RESERVED_CONNECTIONS", "10"))  # migrations, psql, other clients
+
+# Connections ordinary roles may open
+BUDGET_SQL = """
+    select current_setting('max_connections')::int
+         - current_setting('superuser_reserved_connections')::int
+         - coalesce(current_setting('reserved_connections', true)::int, 0)
+"""
+
+# Dedicated (non-pool) connections per worker: notify.listener's LISTEN
+DEDICATED_PER_WORKER = 1
+
+# A worker that dies sooner than this after its fork is respawned with a delay
+MIN_UPTIME = 1.0
+
+
+def cpu_quota() -> Optional[float]:
+    """CPUs granted by the cgroup CPU quota, or None when unlimited/unknown."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:  # cgroup v2: "<quota|max> <period>"
+            quota, period = f.read().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:  # cgroup v1
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def default_workers() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+def connection_budget() -> Optional[int]:
+    """DB_CONNECTION_BUDGET, else what the primary allows minus DB_RESERVED_CONNECTIONS."""
+    if DB_CONNECTION_BUDGET > 0:
+        return DB_CONNECTION_BUDGET
+    try:
+        with db.connect() as conn:
+            allowed = conn.execute(BUDGET_SQL).fetchone()[0]
+    except Exception as e:
+        logger.warning("Cannot read max_connections, keeping configured pool sizes: %s", e)
+        return None
+    return allowed - DB_RESERVED_CONNECTIONS
+
+
+def plan_pools(budget: int, workers: int, pools: int, cap: Optional[int] = None) -> tuple[int, int]:
+    """
+    (workers, max_size per primary pool) so that
+    workers * (pools * max_size + DEDICATED_PER_WORKER) <= budget.
+    Drops workers when the budget cannot give each pool at least one connection.
+    """
+    per_worker = pools + DEDICATED_PER_WORKER
+    if budget < per_worker:
+        raise SystemExit(f"Connection budget {budget} is below the {per_worker} one worker needs")
+    workers = min(workers, budget // per_worker)
+    size = (budget // workers - DEDICATED_PER_WORKER) // pools
+    return workers, min(size, cap) if cap else size
+
+
+def resize_pools(size: int) -> None:
+    """Budget every pool at max_size=`size`; applied as each worker opens them (db.warm_pool)."""
+    db.POOL_MAX_OVERRIDE = size
+    for name in POOLS:
+        logger.info("Pool %s: max_size=%d per worker", name, size)
+
+
+def metrics_dir(path: str = SERVE_METRICS_DIR) -> str:
+    """Directory the workers share their metrics samples through, emptied of a previous run's."""
+    if not path:
+        return tempfile.mkdtemp(prefix="confmgr-metrics-")
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith((".json", ".tmp")):
+            os.unlink(os.path.join(path, name))
+    return path
+
+
+def bind(host: str, port: int, backlog: int = SERVE_BACKLOG) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    """Forks uvicorn workers on a shared socket and keeps `workers` of them running."""
+
+    def __init__(self, app, sock: socket.socket, workers: int,
+                 max_requests: int = SERVE_MAX_REQUESTS, jitter: int = SERVE_MAX_REQUESTS_JITTER,
+                 graceful_timeout: float = SERVE_GRACEFUL_TIMEOUT):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.max_requests = max_requests
+        self.jitter = jitter
+        self.graceful_timeout = graceful_timeout
+        self.children: dict[int, float] = {}  # pid -> fork time
+        self.stopping = False
+        self.killing = False
+        self.respawn_at = 0.0
+
+    def _on_signal(self, signum, frame) -> None:
+        if self.stopping:
+            self.killing = True
+        self.stopping = True
+
+    def spawn(self) -> int:
+        limit = self.max_requests + random.randint(0, self.jitter) if self.max_requests > 0 else None
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return pid
+        # Worker: uvicorn installs its own SIGTERM/SIGINT handlers in serve() and
+        # re-raises the signal when it is done; with these no-op handlers restored
+        # instead, run() returns and the log queue is flushed before exiting
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda signum, frame: None)
+        code = 1
+        try:
+            from . import health
+            health.IMPORTED_AT = time.monotonic()  # startup time of this worker, not of the preload
+            config = uvicorn.Config(
+                self.app,
+                log_config=None,  # keep the app's logging setup
+                log_level=SERVE_LOG_LEVEL,
+                access_log=False,  # logging_config.RequestLogMiddleware writes the access line
+                limit_max_requests=limit,
+                timeout_graceful_shutdown=self.graceful_timeout,
+                lifespan="on",
+            )
+            server = uvicorn.Server(config)
+            server.run(sockets=[self.sock])
+            code = 0 if server.started else 3
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+        finally:
+            from .logging_config import shutdown_logging
+            shutdown_logging()
+            # Never unwind into the parent's stack from a forked child
+            os._exit(code)
+
+    def reap(self) -> None:
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            started = self.children.pop(pid, None)
+            if started is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if metrics.MULTIPROCESS_DIR:
+                # Its counters stay in the merged totals
+                metrics.archive_worker(metrics.MULTIPROCESS_DIR, pid)
+            if self.stopping:
+                logger.info("Worker %d exited (%d)", pid, code)
+            elif code == 0:
+                logger.info("Worker %d recycled after max requests", pid)
+            else:
+                logger.warning("Worker %d died (%d), replacing it", pid, code)
+                if time.monotonic() - started < MIN_UPTIME:
+                    self.respawn_at = time.monotonic() + MIN_UPTIME
+
+    def run(self) -> None:
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._on_signal)
+        logger.info("Serving on %s with %d workers (pid %d)", self.sock.getsockname(), self.workers, os.getpid())
+        while not self.stopping:
+            if len(self.children) < self.workers and time.monotonic() >= self.respawn_at:
+                self.spawn()
+                continue
+            time.sleep(0.2)
+            self.reap()
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        logger.info("Draining %d workers (up to %.0fs)", len(self.children), self.graceful_timeout)
+        self._signal_all(signal.SIGTERM)
+        # uvicorn's own graceful timeout plus time for the lifespan shutdown
+        deadline = time.monotonic() + self.graceful_timeout + 10
+        while self.children and time.monotonic() < deadline and not self.killing:
+            time.sleep(0.1)
+            self.reap()
+        if self.children:
+            logger.warning("Killing %d workers still running", len(self.children))
+            self._signal_all(signal.SIGKILL)
+            while self.children:
+                time.sleep(0.05)
+                self.reap()
+        self.sock.close()
+
+    def _signal_all(self, sig: int) -> None:
+        for pid in list(self.children):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Preforking production server")
+    ap.add_argument("--app", default=SERVE_APP, help="module:attribute of the ASGI app")
+    ap.add_argument("--host", default=SERVE_HOST)
+    ap.add_argument("--port", type=int, default=SERVE_PORT)
+    ap.add_argument("--workers", "-w", type=int, default=SERVE_WORKERS, help="0 = from the CPU quota")
+    args = ap.parse_args()
+
+    # Preload: importing the app registers its pools (unopened) in metrics.POOLS
+    app = import_from_string(args.app)
+    workers = args.workers or default_workers()
+    budget = connection_budget()
+    if budget is not None:
+        primaries = sum(1 for name in POOLS if "replica" not in name)
+        cap = int(os.environ["DB_POOL_MAX"]) if "DB_POOL_MAX" in os.environ else None
+        planned, size = plan_pools(budget, workers, primaries, cap)
+        if planned < workers:
+            logger.warning("Connection budget %d fits only %d of %d workers", budget, planned, workers)
+        workers = planned
+        resize_pools(size)
+        logger.info("Connection budget %d: %d workers x (%d pools x %d + %d)",
+                    budget, workers, primaries, size, DEDICATED_PER_WORKER)
+
+    # Set before the fork: every worker writes its samples there
+    metrics.MULTIPROCESS_DIR = metrics_dir()
+    try:
+        Supervisor(app, bind(args.host, args.port), workers).run()
+    finally:
+        if not SERVE_METRICS_DIR:
+            shutil.rmtree(metrics.MULTIPROCESS_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
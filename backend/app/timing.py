@@ -0,0 +1,182 @@
+# app/timing.py
+# Per-request phase timings: where did the 300 ms go?
+#
+# TimingMiddleware binds a RequestTimings to the request's context. The hot
+# spots add to it next to their histograms: pool checkout (db.py), statements
+# (metrics.TimedCursor), AES-GCM (crypto.py), JWT verification (auth.py) and
+# response encoding (fastjson.py). Outside a request, add() is a contextvar
+# lookup and nothing else. Work handed to the crypto executor is counted once,
+# as the caller's wall time.
+#
+#   SERVER_TIMING=true   Server-Timing header, e.g. "pool;dur=0.1, db;dur=3.2, crypto;dur=0.4, total;dur=4.9"
+#                        (off by default: it reveals internals to clients)
+#   SLOW_REQUEST_MS=500  one "app.slow" WARNING with the breakdown per slower request (0 = off)
+#   PROFILE_SAMPLE=0.01  share of requests stack-sampled every PROFILE_INTERVAL_MS;
+#                        the collapsed stacks are logged as "app.profile" (flamegraph input)
+import contextvars
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+logger = logging.getLogger("app.slow")
+profile_logger = logging.getLogger("app.profile")
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").strip().lower() in ("1", "true", "yes")
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+PROFILE_SAMPLE = float(os.getenv("PROFILE_SAMPLE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_TOP = 20
+
+
+class RequestTimings:
+    __slots__ = ("spans", "threads")
+
+    def __init__(self, threads: Optional[set] = None):
+        self.spans: dict[str, list] = {}  # name -> [seconds, count]
+        # Threads the profiler samples: every thread that records a span joins
+        self.threads = threads
+
+    def add(self, name: str, seconds: float) -> None:
+        s = self.spans.get(name)
+        if s is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            s[0] += seconds
+            s[1] += 1
+        if self.threads is not None:
+            self.threads.add(threading.get_ident())
+
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("timings", default=None)
+
+
+def add(name: str, seconds: float) -> None:
+    """Add `seconds` to phase `name` of the current request (no-op outside one)."""
+    t = _current.get()
+    if t is not None:
+        t.add(name, seconds)
+
+
+class span:
+    """with span("crypto"): ...  times the block into the current request."""
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        add(self.name, time.perf_counter() - self.t0)
+
+
+def server_timing(spans: dict, total: float) -> str:
+    parts = [f"{name};dur={s[0] * 1000:.2f}" for name, s in spans.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+# ---------- Sampling profiler ----------
+def _collapse(frame, limit: int = 40) -> str:
+    names = []
+    while frame is not None and len(names) < limit:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Samples the stacks of `threads` every `interval` seconds until stop()."""
+
+    def __init__(self, threads: set, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.threads = threads
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> list:
+        """Stop sampling; the PROFILE_TOP most frequent collapsed stacks with their counts."""
+        self._stop.set()
+        self._thread.join()
+        return self.samples.most_common(PROFILE_TOP)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for tid in list(self.threads):
+                f = frames.get(tid)
+                if f is not None:
+                    self.samples[_collapse(f)] += 1
+
+
+# ---------- Middleware ----------
+class TimingMiddleware:
+    """
+    ASGI middleware: per-request RequestTimings, the Server-Timing header and
+    the slow-request / profile log lines. Sits inside RequestLogMiddleware so
+    those lines carry request_id and principal.
+    """
+
+    def __init__(self, app, fastapi_app):
+        self.app = app
+        self.fastapi_app = fastapi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (SERVER_TIMING or SLOW_REQUEST_MS > 0 or PROFILE_SAMPLE > 0):
+            return await self.app(scope, receive, send)
+        sampler = None
+        if PROFILE_SAMPLE > 0 and random.random() < PROFILE_SAMPLE:
+            # The event loop thread (async handlers) plus whichever threadpool
+            # thread records a span for this request (sync handlers)
+            timings = RequestTimings(threads={threading.get_ident()})
+            sampler = StackSampler(timings.threads)
+            sampler.start()
+        else:
+            timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SERVER_TIMING:
+                    # Streaming bodies: covers the work done before the headers
+                    value = server_timing(timings.spans, time.perf_counter() - t0)
+                    message["headers"] = [*message.get("headers", ()), (b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            profile = sampler.stop() if sampler is not None else None
+            if SLOW_REQUEST_MS > 0 and elapsed_ms >= SLOW_REQUEST_MS or profile is not None:
+                from .metrics import route_template  # metrics imports this module
+                extra = {
+                    "method": scope["method"],
+                    "route": route_template(self.fastapi_app, scope),
+                    "status": status,
+                    "latency_ms": round(elapsed_ms, 2),
+                    "spans": {k: {"ms": round(s[0] * 1000, 2), "n": s[1]} for k, s in timings.spans.items()},
+                }
+                if SLOW_REQUEST_MS > 0 and elapsed_ms >= SLOW_REQUEST_MS:
+                    logger.warning("Slow request %s %s %d in %.0f ms", scope["method"], scope["path"],
+                                   status, elapsed_ms, extra=extra)
+                if profile is not None:
+                    profile_logger.info("Profile %s %s (%d samples)", scope["method"], scope["path"],
+                                        sum(sampler.samples.values()), extra={**extra, "profile": profile})
@@ -0,0 +1,148 @@
+# app/tokens.py
+# Client-credentials token issuance backed by core.api_clients
+# (postgres/initdb/50_api_clients.sql, secrets hashed with pgcrypto bcrypt).
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+import jwt  # PyJWT
+from fastapi.concurrency import run_in_threadpool
+from psycopg.rows import dict_row
+
+from .auth import ISSUER, JWT_ALGS, JWT_AUDIENCE, JWT_SIGNING_KEY
+from .cache import LRUCache
+from .db import pool
+from .verify_jwt import read_key_material
+
+logger = logging.getLogger(__name__)
+
+TOKEN_TTL = int(os.getenv("TOKEN_TTL", "900"))
+# RS*/ES*: private key (PEM string or path) and the kid published in the JWKS
+TOKEN_SIGNING_KEY = os.getenv("TOKEN_SIGNING_KEY", "")
+TOKEN_KID = os.getenv("TOKEN_KID", "")
+
+# bcrypt runs on its own small executor; requests beyond BCRYPT_MAX_PENDING get 503
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "32"))
+
+CLIENT_CACHE_MAX = int(os.getenv("CLIENT_CACHE_MAX", "1000"))
+CLIENT_CACHE_TTL = float(os.getenv("CLIENT_CACHE_TTL", "60"))
+CLIENT_VERIFY_CACHE_MAX = int(os.getenv("CLIENT_VERIFY_CACHE_MAX", "1000"))
+CLIENT_VERIFY_CACHE_TTL = float(os.getenv("CLIENT_VERIFY_CACHE_TTL", "300"))
+
+CLIENT_BY_ID = """
+    select id, client_id, client_secret_hash
+    from core.api_clients
+    where client_id = %s and is_active
+"""
+
+# client_id -> (row,) ; (None,) caches "unknown or inactive"
+CLIENT_CACHE = LRUCache("api_clients", CLIENT_CACHE_MAX, CLIENT_CACHE_TTL)
+# hmac(client_id, secret) -> client_secret_hash that the secret was checked against
+VERIFY_CACHE = LRUCache("client_verify", CLIENT_VERIFY_CACHE_MAX, CLIENT_VERIFY_CACHE_TTL)
+
+# Per-process key: cached digests are useless outside this worker
+_DIGEST_KEY = os.urandom(32)
+_EXECUTOR = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_pending = threading.BoundedSemaphore(BCRYPT_MAX_PENDING)
+
+
+class TokenError(Exception):
+    """Raised with an HTTP status for the /token handler to map."""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def on_change(kind: str, path: Optional[str], version: Optional[int]) -> None:
+    """ChangeListener subscriber: api_clients rows changed (76_api_clients_notify.sql)."""
+    if kind == "*":
+        CLIENT_CACHE.clear()
+        VERIFY_CACHE.clear()
+    elif kind == "client" and path:
+        CLIENT_CACHE.invalidate(path)
+
+
+def _load_client(client_id: str) -> Optional[dict]:
+    hit = CLIENT_CACHE.get(client_id)
+    if hit is not None:
+        return hit[0]
+    gen = CLIENT_CACHE.generation
+    with pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(CLIENT_BY_ID, (client_id,))
+        row = cur.fetchone()
+    CLIENT_CACHE.put(client_id, (row,), generation=gen)
+    return row
+
+
+def _digest(client_id: str, secret: str) -> bytes:
+    return hmac.new(_DIGEST_KEY, f"{client_id}\0{secret}".encode(), hashlib.sha256).digest()
+
+
+def _checkpw(secret: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(secret.encode(), hashed.encode())
+    except ValueError:
+        logger.error("Unsupported client_secret_hash format")
+        return False
+
+
+async def verify_client(client_id: str, secret: str) -> dict:
+    """Return the api_clients row for valid credentials; raises TokenError."""
+    row = await run_in_threadpool(_load_client, client_id)
+    if row is None:
+        logger.warning("Token request for unknown or inactive client %r", client_id)
+        raise TokenError(401, "invalid client")
+
+    digest = _digest(client_id, secret)
+    hashed = row["client_secret_hash"]
+    # A rotated hash no longer matches the cached one, so old secrets miss
+    if VERIFY_CACHE.get(digest) == hashed:
+        return row
+
+    if not _pending.acquire(blocking=False):
+        raise TokenError(503, "too many concurrent token requests")
+    try:
+        ok = await asyncio.wrap_future(_EXECUTOR.submit(_checkpw, secret, hashed))
+    finally:
+        _pending.release()
+    if not ok:
+        logger.warning("Token request with bad secret for client %r", client_id)
+        raise TokenError(401, "invalid client")
+    VERIFY_CACHE.put(digest, hashed)
+    return row
+
+
+def _signing_key() -> str:
+    alg = JWT_ALGS[0]
+    key = JWT_SIGNING_KEY if alg.startswith("HS") else read_key_material(TOKEN_SIGNING_KEY)
+    if not key:
+        raise TokenError(503, "token signing key not configured")
+    return key
+
+
+def issue_token(client: dict) -> tuple[str, int]:
+    """Sign a short-lived JWT for `client`; returns (token, expires_in)."""
+    now = int(time.time())
+    claims = {
+        "sub": str(client["id"]),
+        "cid": client["client_id"],
+        "iss": ISSUER,
+        "aud": JWT_AUDIENCE,
+        "iat": now,
+        "exp": now + TOKEN_TTL,
+        "jti": uuid.uuid4().hex,
+    }
+    headers = {"kid": TOKEN_KID} if TOKEN_KID else None
+    token = jwt.encode(claims, _signing_key(), algorithm=JWT_ALGS[0], headers=headers)
+    return token, TOKEN_TTL
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Upper bound on parked long-poll requests per worker
+WATCH_MAX_WAITERS = int(os.getenv("WATCH_MAX_WAITERS", "10000"))
+
+
+@dataclass(eq=False)
+class Waiter:
+    """One parked /watch request. Lives only in memory; holds no DB connection."""
+    kind: str
+    prefix: str
+    since_version: Optional[int]
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future
+    changes: list[dict] = field(default_factory=list)
+    reset: bool = False
+
+    def matches(self, kind: str, path: str, version: Optional[int]) -> bool:
+        if kind != self.kind or not path.startswith(self.prefix):
+            return False
+        return self.since_version is None or version is None or version > self.since_version
+
+
+class WatchHub:
+    """
+    In-memory fan-out of change notifications to parked /watch requests.
+
+    publish() is called from the ChangeListener thread and hands results to
+    each waiter's event loop with call_soon_threadsafe.
+    """
+
+    def __init__(self, max_waiters: int = WATCH_MAX_WAITERS):
+        self.max_waiters = max_waiters
+        self._waiters: set[Waiter] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._waiters)
+
+    def register(self, kind: str, prefix: str, since_version: Optional[int]) -> Optional[Waiter]:
+        loop = asyncio.get_running_loop()
+        w = Waiter(kind, prefix, since_version, loop, loop.create_future())
+        with self._lock:
+            if len(self._waiters) >= self.max_waiters:
+                return None
+            self._waiters.add(w)
+        return w
+
+    def unregister(self, w: Waiter) -> None:
+        with self._lock:
+            self._waiters.discard(w)
+
+    def publish(self, kind: str, path: Optional[str], version: Optional[int]) -> None:
+        with self._lock:
+            if kind == "*":
+                # Listener (re)connected: notifications may have been missed
+                hit = list(self._waiters)
+                for w in hit:
+                    w.reset = True
+            else:
+                hit = [w for w in self._waiters if path and w.matches(kind, path, version)]
+                for w in hit:
+                    w.changes.append({"kind": kind, "path": path, "version": version})
+        for w in hit:
+            w.loop.call_soon_threadsafe(_wake, w)
+
+
+def _wake(w: Waiter) -> None:
+    if not w.future.done():
+        w.future.set_result(None)
+
+
+hub = WatchHub()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# backend/bench/bench_compression.py
+#
+# Secret payload compression (app/crypto.py pack_plaintext) at several sizes:
+# stored ciphertext bytes and seal/open latency for none, zlib and lzma.
+# With --db it also stores the same documents as jsonb in temp tables with
+# pglz and lz4 column compression and reports pg_column_size (bytes on disk)
+# using the PG* env vars.
+#
+# Usage (from backend/):
+#   python -m bench.bench_compression
+#   python -m bench.bench_compression --sizes 4096,262144 --iterations 50 --db
+import argparse
+import base64
+import json
+import os
+import statistics
+import time
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from app.crypto import pack_plaintext, unpack_plaintext, seal_item
+
+ALGS = ("none", "zlib", "lzma")
+
+def make_payload(size: int) -> bytes:
+    """Canonical JSON roughly `size` bytes: a PEM-ish bundle plus a config blob."""
+    certs = []
+    while sum(len(c) for c in certs) < size // 2:
+        body = base64.encodebytes(os.urandom(384)).decode()
+        certs.append(f"-----BEGIN CERTIFICATE-----\n{body}-----END CERTIFICATE-----\n")
+    settings, i = {}, 0
+    while len(json.dumps(settings)) < size // 2:
+        settings[f"service_{i}"] = {"enabled": i % 3 == 0, "timeout_ms": 250 + i, "region": "eu-west-1"}
+        i += 1
+    value = {"bundle": "".join(certs), "settings": settings}
+    return json.dumps(value, separators=(",", ":"), sort_keys=True).encode()
+
+def timed(fn, n: int) -> float:
+    """Median microseconds per call."""
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(samples)
+
+def bench_local(sizes: list[int], n: int) -> None:
+    aead = AESGCM(AESGCM.generate_key(bit_length=256))
+    aad = b"bench/path|1"
+    print(f"{'size':>9s} {'alg':>5s} {'stored':>9s} {'ratio':>6s} {'seal_us':>9s} {'open_us':>9s}")
+    for size in sizes:
+        plaintext = make_payload(size)
+        for alg in ALGS:
+            packed = pack_plaintext(plaintext, alg)
+            nonce = os.urandom(12)
+            ct = aead.encrypt(nonce, packed, aad)
+            seal_us = timed(lambda: aead.encrypt(os.urandom(12), pack_plaintext(plaintext, alg), aad), n)
+            open_us = timed(lambda: unpack_plaintext(aead.decrypt(nonce, ct, aad)), n)
+            print(f"{len(plaintext):>9d} {alg:>5s} {len(ct):>9d} {len(ct) / len(plaintext):>6.2f} "
+                  f"{seal_us:>9.0f} {open_us:>9.0f}")
+    # Sanity: the production path round-trips
+    assert unpack_plaintext(aead.decrypt(*seal_item(aead, plaintext, aad), aad)) == plaintext
+
+def bench_db(sizes: list[int]) -> None:
+    from psycopg.types.json import Json
+    from app.db import connect
+
+    print(f"\n{'size':>9s} {'pglz':>9s} {'lz4':>9s}   (jsonb pg_column_size)")
+    with connect(autocommit=False) as conn, conn.cursor() as cur:
+        cur.execute("create temp table bench_pglz(v jsonb compression pglz)")
+        cur.execute("create temp table bench_lz4(v jsonb compression lz4)")
+        for size in sizes:
+            value = json.loads(make_payload(size))
+            row = []
+            for table in ("bench_pglz", "bench_lz4"):
+                cur.execute(f"truncate {table}")
+                cur.execute(f"insert into {table} values (%s)", (Json(value),))
+                cur.execute(f"select pg_column_size(v) from {table}")
+                row.append(cur.fetchone()[0])
+            print(f"{size:>9d} {row[0]:>9d} {row[1]:>9d}")
+        conn.rollback()
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Secret/config compression benchmark")
+    ap.add_argument("--sizes", default="1024,16384,131072,1048576", help="comma-separated payload sizes")
+    ap.add_argument("--iterations", "-n", type=int, default=20)
+    ap.add_argument("--db", action="store_true", help="also measure jsonb pglz vs lz4 on the database")
+    args = ap.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+    bench_local(sizes, args.iterations)
+    if args.db:
+        bench_db(sizes)
+
+if __name__ == "__main__":
+    main()
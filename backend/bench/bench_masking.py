@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# backend/bench/bench_masking.py
+#
+# app/masking.py against the previous recursive implementation on deep
+# documents of ~10k keys: nested objects only, and the same keys held in lists
+# of records. The previous version did not descend into lists, so it is only
+# fast there because it skips them; "leaked" counts sensitive strings left
+# unmasked.
+#
+# Usage (from backend/):
+#   python -m bench.bench_masking
+#   python -m bench.bench_masking --keys 10000 --depth 50 --iterations 20
+import argparse
+import statistics
+import time
+
+from app.masking import Masker
+
+SECRET = "s3cr3t-value-123"
+
+def legacy_mask(data):
+    """Pre-engine implementation, kept for comparison."""
+    masked = {}
+    sensitive_keys = {
+        'password', 'secret', 'key', 'token',
+        'api_key', 'apikey', 'auth', 'credential'
+    }
+    for k, v in data.items():
+        if isinstance(v, dict):
+            masked[k] = legacy_mask(v)
+        elif isinstance(v, str) and any(sens in k.lower() for sens in sensitive_keys):
+            if len(v) > 6:
+                masked[k] = f"{v[:2]}{'*' * (len(v)-4)}{v[-2:]}"
+            else:
+                masked[k] = '*' * len(v)
+        else:
+            masked[k] = v
+    return masked
+
+def make_doc(keys: int, depth: int, lists: bool) -> dict:
+    """About `keys` keys in a `depth`-deep object chain; records in lists or keyed objects."""
+    root = cur = {}
+    per_level = max(1, keys // depth // 5)
+    for level in range(depth):
+        records = [
+            {"name": f"svc{level}_{i}", "url": "https://example.test", "api_key": SECRET,
+             "replicas": i % 5, "tokens": [SECRET, SECRET] if lists else {"primary": SECRET}}
+            for i in range(per_level)
+        ]
+        cur["services"] = records if lists else {r["name"]: r for r in records}
+        cur["db_password"] = SECRET
+        cur["child"] = cur = {}
+    return root
+
+def count(doc, needle: str = SECRET) -> int:
+    n, stack = 0, [doc]
+    while stack:
+        v = stack.pop()
+        if isinstance(v, dict):
+            stack.extend(v.values())
+        elif isinstance(v, list):
+            stack.extend(v)
+        elif v == needle:
+            n += 1
+    return n
+
+def timed(fn, n: int) -> float:
+    """Median milliseconds per call."""
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e3)
+    return statistics.median(samples)
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Secret masking benchmark")
+    ap.add_argument("--keys", type=int, default=10000)
+    ap.add_argument("--depth", type=int, default=50)
+    ap.add_argument("--iterations", "-n", type=int, default=20)
+    args = ap.parse_args()
+
+    masker = Masker()
+    print(f"{'document':9s} {'impl':8s} {'ms':>8s} {'sensitive':>10s} {'leaked':>7s}")
+    for kind in ("objects", "lists"):
+        doc = make_doc(args.keys, args.depth, kind == "lists")
+        for name, fn in (("legacy", legacy_mask), ("engine", masker.mask)):
+            ms = timed(lambda: fn(doc), args.iterations)
+            print(f"{kind:9s} {name:8s} {ms:>8.2f} {count(doc):>10d} {count(fn(doc)):>7d}")
+
+if __name__ == "__main__":
+    main()
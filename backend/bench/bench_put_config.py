@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# backend/bench/bench_put_config.py
+#
+# Write-latency benchmark for PUT /config: the legacy multi-statement path vs
+# core.put_config() (postgres/initdb/73_put_config_fn.sql), with and without
+# pipeline mode. Runs against the database from the usual PG* env vars and
+# writes real rows under bench/put_config/<run-id>.
+#
+# Usage (from backend/):
+#   python -m bench.bench_put_config --iterations 200
+import argparse
+import hashlib
+import json
+import statistics
+import time
+import uuid
+
+from psycopg.rows import dict_row
+from psycopg.types.json import Json
+
+from app.db import connect
+from app import queries as Q
+
+ACTOR = "11111111-1111-1111-1111-111111111111"
+
+# The pre-73 write path, kept here only for comparison
+LEGACY = [
+    "insert into core.config_items(path, created_by) values (%s, %s) on conflict(path) do nothing",
+    """select cv.version, cv.checksum, cv.created_at
+       from core.config_items ci join core.config_versions cv on cv.item_id = ci.id
+       where ci.path = %s and cv.is_current""",
+    """insert into core.config_versions(item_id, version, is_current, value_json, checksum, created_by)
+       select id, null, true, %s::jsonb, %s::bytea, %s from core.config_items where path = %s
+       returning version, created_at""",
+    "select audit.log_event(%s::uuid, %s::text, %s::text, %s::text, %s::jsonb)",
+]
+
+def put_legacy(conn, path, value, checksum):
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(LEGACY[0], (path, ACTOR))
+        cur.execute(LEGACY[1], (path,))
+        cur.fetchone()
+        cur.execute(LEGACY[2], (Json(value), checksum, ACTOR, path))
+        row = cur.fetchone()
+        cur.execute(LEGACY[3], (ACTOR, "bench", "config.put", path, Json({"version": row["version"]})))
+        conn.commit()
+
+def put_function(conn, path, value, checksum):
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(Q.CONFIG_PUT, (path, Json(value), checksum, ACTOR, "bench", True))
+        conn.commit()
+        cur.fetchone()
+
+def put_pipelined(conn, path, value, checksum):
+    with conn.cursor(row_factory=dict_row) as cur:
+        with conn.pipeline():
+            cur.execute(Q.CONFIG_PUT, (path, Json(value), checksum, ACTOR, "bench", True))
+            conn.commit()
+        cur.fetchone()
+
+def run(name, fn, conn, iterations, run_id):
+    path = f"bench/put_config/{run_id}/{name}"
+    samples = []
+    for i in range(iterations):
+        value = {"i": i, "flag": i % 2 == 0}
+        checksum = hashlib.sha256(json.dumps(value, separators=(",", ":"), sort_keys=True).encode()).digest()
+        t0 = time.perf_counter()
+        fn(conn, path, value, checksum)
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    print(f"{name:10s} n={iterations:<5d} mean={statistics.mean(samples):7.2f}ms "
+          f"p50={samples[len(samples) // 2]:7.2f}ms p95={samples[int(len(samples) * 0.95) - 1]:7.2f}ms")
+
+def main():
+    ap = argparse.ArgumentParser(description="PUT /config write-latency benchmark")
+    ap.add_argument("--iterations", "-n", type=int, default=200)
+    args = ap.parse_args()
+    run_id = uuid.uuid4().hex[:8]
+    with connect(autocommit=False) as conn:
+        for name, fn in (("legacy", put_legacy), ("function", put_function), ("pipelined", put_pipelined)):
+            run(name, fn, conn, args.iterations, run_id)
+
+if __name__ == "__main__":
+    main()
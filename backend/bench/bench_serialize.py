@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# backend/bench/bench_serialize.py
+#
+# Response encoding on the hot paths, before and after app/fastjson.py:
+#   config get  : model validation + FastAPI JSON render  vs  one dumps() (or a cached body)
+#   config put  : Json(value) re-encode + response render   vs  canonical bytes reused
+#   secret get  : json.loads(plaintext) + SecretOut render  vs  plaintext spliced in
+# dumps() is timed with orjson (unless JSON_ENCODER=json) and with the stdlib.
+#
+# Usage (from backend/):
+#   python -m bench.bench_serialize
+#   python -m bench.bench_serialize --sizes 1024,524288 --iterations 50
+import argparse
+import json
+import statistics
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app import fastjson
+from app.models import ConfigOut, SecretOut
+
+CREATED_AT = "2026-01-01T00:00:00+00:00"
+
+def make_value(size: int) -> dict:
+    """Nested config object whose compact JSON is roughly `size` bytes."""
+    value, i = {}, 0
+    while len(json.dumps(value)) < size:
+        value[f"service_{i}"] = {
+            "enabled": i % 3 == 0, "timeout_ms": 250 + i, "weight": i / 7,
+            "hosts": [f"10.0.{i % 256}.{j}" for j in range(4)], "region": "eu-west-1",
+        }
+        i += 1
+    return value
+
+def timed(fn, n: int) -> float:
+    """Median microseconds per call."""
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(samples)
+
+def render_model(model_cls, content: dict) -> bytes:
+    """What FastAPI does for a dict returned under response_model: validate, serialize, render."""
+    return JSONResponse(jsonable_encoder(model_cls.model_validate(content))).body
+
+def bench(sizes: list[int], n: int) -> None:
+    orjson = fastjson.orjson
+    print(f"orjson: {'yes' if orjson else 'off (JSON_ENCODER=json)'}")
+    print(f"{'size':>9s} {'case':26s} {'before_us':>10s} {'after_us':>10s} {'speedup':>8s}")
+    for size in sizes:
+        value = make_value(size)
+        canon = fastjson.canonical(value)
+        out = {"path": "app/prod/bench", "version": 7, "value": value, "created_at": CREATED_AT}
+        cached = fastjson.config_body(out["path"], 7, fastjson.dumps(value), CREATED_AT)
+        # Sanity: same document either way
+        assert json.loads(render_model(ConfigOut, out)) == json.loads(cached)
+
+        cases = [
+            ("config get (miss)", lambda: render_model(ConfigOut, out),
+             lambda: fastjson.config_body(out["path"], 7, fastjson.dumps(value), CREATED_AT)),
+            ("config get (cache hit)", lambda: render_model(ConfigOut, out),
+             lambda: fastjson.response(cached, '"etag"')),
+            # Json(value) is encoded again by psycopg's dumper (json.dumps)
+            ("config put", lambda: (json.dumps(value), render_model(ConfigOut, out)),
+             lambda: (canon.decode(), fastjson.config_body(out["path"], 7, canon, CREATED_AT))),
+            ("secret get", lambda: render_model(SecretOut, {
+                "path": "s", "version": 7, "value": json.loads(canon), "created_at": CREATED_AT}),
+             lambda: fastjson.secret_body("s", 7, canon, CREATED_AT)),
+        ]
+        for name, before, after in cases:
+            b, a = timed(before, n), timed(after, n)
+            print(f"{len(canon):>9d} {name:26s} {b:>10.0f} {a:>10.0f} {b / a:>7.1f}x")
+        if orjson:
+            fastjson.orjson = None
+            stdlib = timed(lambda: fastjson.dumps(value), n)
+            fastjson.orjson = orjson
+            fast = timed(lambda: fastjson.dumps(value), n)
+            print(f"{len(canon):>9d} {'dumps stdlib vs orjson':26s} {stdlib:>10.0f} {fast:>10.0f} {stdlib / fast:>7.1f}x")
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Response serialization benchmark")
+    ap.add_argument("--sizes", default="1024,16384,262144,1048576", help="comma-separated value sizes")
+    ap.add_argument("--iterations", "-n", type=int, default=20)
+    args = ap.parse_args()
+    bench([int(s) for s in args.sizes.split(",")], args.iterations)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# python
+# Unit tests run without Postgres: the app modules only need their settings at
+# import, and pools are created closed (db.py). Tests that need a database use
+# the `pg` fixture and are skipped when none is reachable (PGHOST etc.).
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+os.environ.setdefault("DATA_KEY_HEX", "00" * 32)
+os.environ.setdefault("API_KEY", "test-key")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+API_HEADERS = {"X-API-Key": os.environ["API_KEY"]}
+
+
+@pytest.fixture
+def headers():
+    return dict(API_HEADERS)
+
+
+@pytest.fixture
+def mock_pool():
+    """Factory: (pool, cursor) mocks; `fetchone` rows are returned in order."""
+    def make(fetchone=(), fetchall=None):
+        pool, conn, cur = MagicMock(), MagicMock(), MagicMock()
+        pool.connection.return_value.__enter__.return_value = conn
+        conn.cursor.return_value.__enter__.return_value = cur
+        cur.fetchone.side_effect = list(fetchone)
+        cur.fetchall.return_value = fetchall or []
+        return pool, cur
+    return make
+
+
+@pytest.fixture
+def pg():
+    """A live connection to the configured database, or skip."""
+    from app import db
+    try:
+        conn = db.connect(autocommit=True)
+    except Exception as e:
+        pytest.skip(f"no database: {e}")
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def mock_async_pool():
+    """mock_pool for AsyncConnectionPool: awaitable execute/fetch*/commit."""
+    def make(fetchone=(), fetchall=None):
+        pool, conn, cur = MagicMock(), MagicMock(), MagicMock()
+        pool.connection.return_value.__aenter__.return_value = conn
+        conn.cursor.return_value.__aenter__.return_value = cur
+        conn.commit = AsyncMock()
+        cur.execute = AsyncMock()
+        cur.fetchone = AsyncMock(side_effect=list(fetchone))
+        cur.fetchall = AsyncMock(return_value=fetchall or [])
+        return pool, cur
+    return make
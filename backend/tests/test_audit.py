@@ -0,0 +1,117 @@
+# python
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as m
+from app import queries as Q
+from app.audit import AuditSink
+from app.auth import AuthPrincipal
+
+ACTOR = "11111111-1111-1111-1111-111111111111"
+
+
+def test_flush_copies_masked_batch(mock_pool):
+    pool, cur = mock_pool()
+    cp = cur.copy.return_value.__enter__.return_value
+    with patch("app.audit.pool", pool):
+        s = AuditSink(max_queue=10, batch_size=3, flush_interval=0.1)
+        s.start()
+        for i in range(5):
+            assert s.emit(ACTOR, "s", "a", f"p{i}", {"password": "x"})
+        s.stop()
+    assert cp.write_row.call_count == 5 and s.flushed == 5 and s.dropped == 0
+    assert cp.write_row.call_args[0][0][4].obj["password"] != "x"
+
+
+def test_copy_failure_falls_back_to_row_inserts(mock_pool):
+    pool, cur = mock_pool()
+    cur.copy.side_effect = RuntimeError("permission denied for sequence audit_logs_id_seq")
+    conn = pool.connection.return_value.__enter__.return_value
+    # The second event is rejected on its own; the others still land
+    conn.execute.side_effect = [None, ValueError("bad row"), None]
+    s = AuditSink(batch_size=3)
+    with patch("app.audit.pool", pool):
+        s._flush([(ACTOR, "s", "a", f"p{i}", {}) for i in range(3)])
+    assert [c[0][0] for c in conn.execute.call_args_list] == [Q.AUDIT_LOG_EVENT] * 3
+    assert [c[0][1][3] for c in conn.execute.call_args_list] == ["p0", "p1", "p2"]
+    assert (s.flushed, s.dropped, s.flush_errors) == (2, 1, 1)
+
+
+def test_overflow_drop():
+    s = AuditSink(max_queue=1, overflow="drop")
+    assert s.emit(ACTOR, "s", "a", "p", {}) and not s.emit(ACTOR, "s", "a", "p", {})
+    assert s.stats()["dropped"] == 1
+
+
+def test_flushed_event_lands_in_audit_logs(pg):
+    """As confmgr_db: needs USAGE on audit_logs_id_seq (81_audit_sink_grants.sql)."""
+    @contextmanager
+    def connection():
+        yield pg
+
+    path = f"test/audit/{uuid.uuid4().hex}"
+    with patch("app.audit.pool", MagicMock(connection=connection)):
+        s = AuditSink()
+        s._flush([(ACTOR, "test", "test.flush", path, {"n": 1})])
+    assert s.flushed == 1 and s.flush_errors == 0
+    row = pg.execute(
+        "select actor_id::text, action, extra from audit.audit_logs where path = %s", (path,)
+    ).fetchone()
+    assert row == (ACTOR, "test.flush", {"n": 1})
+
+
+# ---------- GET /audit ----------
+RANGE = "since=2025-12-31T00:00:00Z&until=2026-01-02T00:00:00Z"
+
+
+def audit_row(i):
+    return {"id": i, "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc), "actor_id": ACTOR,
+            "actor_subject": "s", "action": "config.put", "path": "a/b", "client_ip": None,
+            "mfa": None, "extra": {"x": 1}}
+
+
+@pytest.fixture
+def as_principal():
+    def use(principal):
+        m.app.dependency_overrides[m.AUTH_DEP] = lambda: principal
+    yield use
+    m.app.dependency_overrides.clear()
+
+
+def test_page_and_cursor(mock_pool, headers):
+    pool, cur = mock_pool()
+    cur.fetchall.side_effect = [[audit_row(1), audit_row(2)], [audit_row(3)]]
+    with patch("app.main.pool", pool):
+        c = TestClient(m.app)
+        page = c.get(f"/audit?limit=2&path_prefix=a/&{RANGE}", headers=headers).json()
+        assert [i["id"] for i in page["items"]] == [1, 2] and page["next_cursor"]
+        r = c.get(f"/audit?limit=2&cursor={page['next_cursor']}&{RANGE}", headers=headers)
+    assert r.json()["next_cursor"] is None
+    assert cur.execute.call_args[0][1][-3:-1] == (audit_row(2)["created_at"], 2)
+
+
+@pytest.mark.parametrize("principal", [
+    AuthPrincipal(id="svc", scopes=None),           # no scope claim, e.g. /token tokens
+    AuthPrincipal(id="svc", scopes=["config:read"]),
+    AuthPrincipal(id="api-key", scopes=None),       # a bearer sub cannot pass for the API key
+])
+def test_bearer_without_audit_read_is_forbidden(as_principal, principal):
+    as_principal(principal)
+    assert TestClient(m.app).get(f"/audit?{RANGE}").status_code == 403
+
+
+@pytest.mark.parametrize("principal", [
+    AuthPrincipal(id="svc", scopes=["audit:read"]),
+    AuthPrincipal(id="api-key", api_key=True),
+])
+def test_audit_read_allowed(as_principal, mock_pool, principal):
+    as_principal(principal)
+    pool, cur = mock_pool()
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get(f"/audit?{RANGE}")
+    assert r.status_code == 200 and r.json()["items"] == []
@@ -0,0 +1,111 @@
+# python
+import base64
+import json
+import os
+import time
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+import app.auth as a
+
+SECRETS = {"a": b"a" * 32, "b": b"b" * 32}
+
+
+def jwks(*kids):
+    return json.dumps({"keys": [
+        {"kty": "oct", "kid": kid, "alg": "HS256", "k": base64.urlsafe_b64encode(SECRETS[kid]).rstrip(b"=").decode()}
+        for kid in kids
+    ]})
+
+
+def token(kid, exp_in=60, **claims):
+    now = int(time.time())
+    claims = {"sub": "u", "iss": "iss", "aud": a.JWT_AUDIENCE, "iat": now, "exp": now + exp_in, **claims}
+    return jwt.encode(claims, SECRETS[kid], algorithm="HS256", headers={"kid": kid})
+
+
+def rejected(tok) -> bool:
+    try:
+        a.require_bearer(f"Bearer {tok}")
+    except HTTPException as e:
+        return e.status_code == 401
+    return False
+
+
+@pytest.fixture
+def provider(tmp_path, monkeypatch):
+    """Install a JWKS-file KeyProvider for jwks.json in tmp_path (written by the test)."""
+    f = tmp_path / "jwks.json"
+    monkeypatch.setattr(a, "JWT_ALGS", ["HS256"])
+    monkeypatch.setattr(a, "ISSUER", "iss")
+    a._VERIFIED.clear()
+
+    def install(content=None):
+        if content is not None:
+            f.write_text(content)
+        kp = a.KeyProvider(str(f), check_interval=0)
+        monkeypatch.setattr(a, "key_provider", kp)
+        return kp, f
+    yield install
+    a._VERIFIED.clear()
+
+
+def touch(f, content):
+    f.write_text(content)
+    t = time.time() + 5
+    os.utime(f, (t, t))
+
+
+def test_missing_jwks_at_startup_is_retried(provider):
+    kp, f = provider()
+    assert kp.stats()["keys"] == 0 and rejected(token("a"))
+    f.write_text(jwks("a"))
+    assert a.require_bearer(f"Bearer {token('a')}").id == "u"
+    assert kp.stats()["keys"] == 1
+
+
+def test_malformed_jwks_at_startup_is_retried(provider):
+    kp, f = provider("{not json")
+    assert rejected(token("a")) and kp.reload_errors >= 1
+    touch(f, jwks("a"))
+    assert a.require_bearer(f"Bearer {token('a')}").id == "u"
+
+
+def test_failed_reload_keeps_previous_keys(provider):
+    kp, f = provider(jwks("a"))
+    touch(f, "{not json")
+    assert a.require_bearer(f"Bearer {token('a')}").id == "u"
+    assert kp.stats()["keys"] == 1 and kp.reload_errors == 1
+
+
+def test_cache_hit_skips_verification(provider):
+    provider(jwks("a"))
+    tok = token("a", scope="config:read")
+    before = a.auth_stats()["verify"]["count"]
+    for _ in range(3):
+        assert a.require_bearer(f"Bearer {tok}").scopes == ["config:read"]
+    assert a.auth_stats()["verify"]["count"] == before + 1
+
+
+def test_cache_hit_checks_exp(provider):
+    provider(jwks("a"))
+    # Past exp but inside the decode leeway: verified each time, never served from the cache
+    tok = token("a", exp_in=-5)
+    before = a.auth_stats()["verify"]["count"]
+    a.require_bearer(f"Bearer {tok}")
+    a.require_bearer(f"Bearer {tok}")
+    assert a.auth_stats()["verify"]["count"] == before + 2
+    assert rejected(token("a", exp_in=-60))
+
+
+def test_jwks_reload_clears_cache(provider):
+    kp, f = provider(jwks("a"))
+    old = token("a")
+    a.require_bearer(f"Bearer {old}")
+    assert rejected(token("b"))
+    touch(f, jwks("b"))
+    assert a.require_bearer(f"Bearer {token('b')}").id == "u"
+    # Key "a" was removed: its cached token must not keep validating
+    assert rejected(old)
@@ -0,0 +1,55 @@
+# python
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import app.main as m
+from app import queries as Q
+from app.crypto import seal, LEGACY_ALG
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def test_batch_params_pairs_not_cross_product():
+    pending = [("a", "a", None), ("b@3", "b", 3), ("c@7", "c", 7), ("b", "b", None)]
+    assert Q.batch_params(pending) == (["a", "b"], ["b", "c"], [3, 7])
+
+def test_config_batch_found_missing_explicit(mock_pool, headers):
+    m.CONFIG_CACHE.clear()
+    pool, cur = mock_pool(fetchall=[
+        {"path": "a/x", "requested": None, "item_id": 1, "version": 2, "is_current": True,
+         "value_json": {"v": 2}, "checksum": b"x", "created_at": NOW},
+        {"path": "a/x", "requested": 1, "item_id": 1, "version": 1, "is_current": False,
+         "value_json": {"v": 1}, "checksum": b"y", "created_at": NOW},
+    ])
+    with patch("app.main.pool", pool), patch("app.main.audit_sink") as sink:
+        r = TestClient(m.app).post("/config:batchGet", headers=headers, json={"items": [
+            {"path": "a/x"}, {"path": "a/x", "version": 1}, {"path": "a/y"}, {"path": "a/x", "version": 9}]})
+    assert r.status_code == 200, r.text
+    res = r.json()["results"]
+    assert res["a/x"]["value"] == {"v": 2} and res["a/x@1"]["value"] == {"v": 1}
+    assert res["a/y"]["found"] is False and res["a/x@9"]["found"] is False
+    sql, params = cur.execute.call_args[0]
+    assert sql == Q.CONFIG_BATCH and params == (["a/x", "a/y"], ["a/x", "a/x"], [1, 9])
+    # One audit event for the whole batch, scoped to the common prefix
+    assert sink.emit.call_count == 1
+    assert sink.emit.call_args[0][2:4] == ("config.batch_get", "a")
+    assert sink.emit.call_args[0][4] == {"items": ["a/x", "a/x@1", "a/y", "a/x@9"], "found": 2}
+
+def test_secret_batch_decrypts_requested_pairs(mock_pool, headers, monkeypatch):
+    monkeypatch.setattr(m.SECRET_CACHE, "max_size", 0)
+    rows = []
+    for v, requested in ((3, 3), (5, None)):
+        n, ct = seal(b'{"v":%d}' % v, aad=b"s/p|%d" % v)
+        rows.append({"path": "s/p", "requested": requested, "version": v, "is_current": v == 5,
+                     "ciphertext": ct, "nonce": n, "alg": LEGACY_ALG, "created_at": NOW})
+    pool, cur = mock_pool(fetchall=rows)
+    with patch("app.main.pool", pool), patch("app.main.audit_sink") as sink:
+        r = TestClient(m.app).post("/secret:batchGet", headers=headers, json={"items": [
+            {"path": "s/p"}, {"path": "s/p", "version": 3}, {"path": "s/q"}]})
+    assert r.status_code == 200, r.text
+    res = r.json()["results"]
+    assert res["s/p"]["value"] == {"v": 5} and res["s/p@3"]["value"] == {"v": 3}
+    assert res["s/q"]["found"] is False
+    assert cur.execute.call_args[0] == (Q.SECRET_BATCH, (["s/p", "s/q"], ["s/p"], [3]))
+    assert sink.emit.call_count == 1 and sink.emit.call_args[0][4]["found"] == 2
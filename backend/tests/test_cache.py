@@ -0,0 +1,128 @@
+# python
+import time
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as m
+from app.cache import CacheSweeper, LRUCache, sweeper
+from app.crypto import seal, LEGACY_ALG
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def test_lru_evicts_oldest():
+    c = LRUCache("t-lru", max_size=2, ttl=60)
+    c.put("a", 1)
+    c.put("b", 2)
+    c.get("a")        # a becomes most recently used
+    c.put("c", 3)     # evicts b
+    assert c.get("b") is None
+    assert c.get("a") == 1
+    assert c.stats()["evictions"] == 1
+
+def test_ttl_expiry():
+    c = LRUCache("t-ttl", max_size=10, ttl=5)
+    with patch("app.cache.time.monotonic", return_value=100.0):
+        c.put("a", 1)
+    with patch("app.cache.time.monotonic", return_value=106.0):
+        assert c.get("a") is None
+
+def test_stale_generation_is_not_stored():
+    c = LRUCache("t-gen", max_size=10, ttl=60)
+    gen = c.generation
+    c.invalidate("a")  # concurrent write while loading
+    c.put("a", "stale", generation=gen)
+    assert c.get("a") is None
+
+def test_disabled_cache():
+    c = LRUCache("t-off", max_size=0, ttl=60)
+    c.put("a", 1)
+    assert c.get("a") is None
+
+def test_weighted_cache_is_bounded_in_bytes():
+    c = LRUCache("t-bytes", max_size=10, ttl=60, weigher=len)
+    c.put("a", b"12345")
+    c.put("b", b"123456")  # 11 bytes total -> evicts a
+    assert c.get("a") is None
+    assert c.stats()["weight"] == 6
+    c.put("big", b"x" * 11)  # larger than the whole cache: not stored
+    assert c.get("big") is None
+
+def test_sweep_drops_expired_without_reads():
+    with patch("app.cache.time.monotonic", return_value=100.0):
+        c = LRUCache("t-sweep", max_size=10, ttl=5)
+        c.put("a", b"plaintext")
+    with patch("app.cache.time.monotonic", return_value=101.0):
+        c.sweep()  # not due yet (every ttl/2)
+    assert c.stats()["size"] == 1
+    with patch("app.cache.time.monotonic", return_value=106.0):
+        sweeper.sweep()
+    assert c.stats()["size"] == 0 and c.stats()["weight"] == 0
+
+def test_sweeper_thread_runs_until_stopped():
+    c = LRUCache("t-sweep-thread", max_size=10, ttl=0.02)
+    c.put("a", 1)
+    s = CacheSweeper(interval=0.01)
+    s.start()
+    try:
+        deadline = time.monotonic() + 2
+        while c.stats()["size"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        s.stop()
+    assert c.stats()["size"] == 0 and not s._thread.is_alive()
+
+
+# ---------- SECRET_CACHE in the handlers ----------
+@pytest.fixture
+def secret_cache(monkeypatch):
+    monkeypatch.setattr(m.SECRET_CACHE, "max_size", 1 << 20)
+    m.SECRET_CACHE.clear()
+    yield m.SECRET_CACHE
+    m.SECRET_CACHE.clear()
+
+def secret_row(path, v):
+    nonce, ct = seal(b'{"v":%d}' % v, aad=f"{path}|{v}".encode())
+    return {"version": v, "ciphertext": ct, "nonce": nonce, "alg": LEGACY_ALG, "created_at": NOW}
+
+def test_explicit_version_served_from_cache(mock_pool, headers, secret_cache):
+    pool, cur = mock_pool(fetchone=[secret_row("s/c", 2)])
+    c = TestClient(m.app)
+    with patch("app.main.pool", pool):
+        first = c.get("/secret/s/c?version=2", headers=headers)
+        second = c.get("/secret/s/c?version=2", headers=headers)
+    assert first.json()["value"] == second.json()["value"] == {"v": 2}
+    assert cur.execute.call_count == 1 and second.headers["etag"] == first.headers["etag"]
+
+def test_current_read_also_caches_its_version(mock_pool, headers, secret_cache):
+    pool, cur = mock_pool(fetchone=[secret_row("s/c", 3)])
+    with patch("app.main.pool", pool):
+        TestClient(m.app).get("/secret/s/c", headers=headers)
+    assert secret_cache.get(("s/c", None))[0] == 3 and secret_cache.get(("s/c", 3)) is not None
+
+def test_write_invalidates_current_not_explicit(mock_pool, headers, secret_cache):
+    secret_cache.put(("s/c", None), (1, NOW.isoformat(), b'{"v":1}'))
+    secret_cache.put(("s/c", 1), (1, NOW.isoformat(), b'{"v":1}'))
+    pool, cur = mock_pool(fetchone=[
+        {"id": 7, "kek_id": None, "dek_nonce": None, "wrapped_dek": None},
+        {"mv": 1},
+        {"version": 2, "created_at": NOW},
+    ])
+    with patch("app.main.pool", pool), patch("app.main.seal_item", return_value=(b"n", b"ct")), \
+            patch("app.main.audit_sink"):
+        r = TestClient(m.app).post("/secret/s/c", json={"value": {"v": 2}}, headers=headers)
+    assert r.status_code == 201, r.text
+    assert secret_cache.get(("s/c", None)) is None and secret_cache.get(("s/c", 1)) is not None
+
+def test_load_racing_a_write_is_not_cached(mock_pool, headers, secret_cache):
+    pool, cur = mock_pool(fetchone=[secret_row("s/c", 1)])
+
+    def write_during_load(*a, **kw):
+        secret_cache.invalidate(("s/c", None))  # NOTIFY while the row was in flight
+        return pool.connection.return_value
+    with patch("app.main.pool", pool):
+        pool.connection.side_effect = write_during_load
+        TestClient(m.app).get("/secret/s/c", headers=headers)
+    assert secret_cache.get(("s/c", None)) is None
@@ -0,0 +1,66 @@
+# python
+import os
+from unittest.mock import patch
+
+import pytest
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from fastapi.testclient import TestClient
+
+from app import crypto as c
+
+BIG = b'{"a":"' + b"x" * 5000 + b'"}'
+
+
+@pytest.mark.parametrize("alg, tag", [("zlib", b"z"), ("lzma", b"x")])
+def test_pack_frames_and_roundtrips(alg, tag):
+    packed = c.pack_plaintext(BIG, alg)
+    assert packed[:2] == b"\x00" + tag and len(packed) < len(BIG)
+    assert c.unpack_plaintext(packed) == BIG
+
+
+def test_none_and_small_payloads_stay_unframed():
+    assert c.pack_plaintext(BIG, "none") == BIG
+    small = b'{"a":1}'
+    assert len(small) < c.SECRET_COMPRESS_MIN and c.pack_plaintext(small, "zlib") == small
+
+
+def test_incompressible_payload_stays_unframed():
+    noise = os.urandom(4096)
+    assert c.pack_plaintext(noise, "zlib") == noise
+
+
+def test_legacy_unframed_rows_read_unchanged():
+    # Rows written before compression: canonical JSON, never starting with NUL
+    assert c.unpack_plaintext(b'{"a":1}') == b'{"a":1}'
+    assert c.unpack_plaintext(BIG) == BIG
+
+
+def test_unknown_tag_is_an_error():
+    with pytest.raises(ValueError):
+        c.unpack_plaintext(b"\x00?" + b"data")
+
+
+@pytest.mark.skipif("SECRET_COMPRESS" in os.environ, reason="SECRET_COMPRESS set")
+def test_compression_is_opt_in():
+    assert c.SECRET_COMPRESS == "none"
+    aead = AESGCM(AESGCM.generate_key(bit_length=256))
+    nonce, ct = c.seal_item(aead, BIG, b"p|1")
+    assert aead.decrypt(nonce, ct, b"p|1") == BIG
+
+
+def test_sealed_rows_decompress_transparently(monkeypatch):
+    monkeypatch.setattr(c, "SECRET_COMPRESS", "zlib")
+    aead = AESGCM(AESGCM.generate_key(bit_length=256))
+    nonce, ct = c.seal_item(aead, BIG, b"p|1")
+    assert len(ct) < len(BIG)
+    assert c.unpack_plaintext(aead.decrypt(nonce, ct, b"p|1")) == BIG
+    # Legacy-alg rows that predate compression
+    nonce, ct = c.seal(BIG, aad=b"p|1")
+    assert c.open_row({"alg": c.LEGACY_ALG, "nonce": nonce, "ciphertext": ct}, b"p|1") == BIG
+
+
+def test_large_responses_are_gzipped(headers):
+    import app.main as m
+    with patch.object(m, "auth_stats", return_value={"pad": "y" * 4000}):
+        r = TestClient(m.app).get("/__stats", headers={**headers, "Accept-Encoding": "gzip"})
+    assert r.headers.get("content-encoding") == "gzip" and r.json()["auth"]["pad"] == "y" * 4000
@@ -0,0 +1,155 @@
+# python
+from contextlib import contextmanager
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+import app.crypto as c
+import app.rekey as rekey
+
+
+@pytest.fixture
+def keks(monkeypatch):
+    """Two master keys, "old" and "new"; new DEKs are wrapped with "old" until a test switches."""
+    monkeypatch.setattr(c, "_KEKS", {"old": AESGCM(b"\x11" * 32), "new": AESGCM(b"\x22" * 32)})
+    monkeypatch.setattr(c.wrap_dek, "__defaults__", ("old",))
+    monkeypatch.setattr(c, "MASTER_KEY_ID", "old")
+    c.DEK_CACHE.clear()
+    yield
+    c.DEK_CACHE.clear()
+
+
+def envelope_row(item_id, plaintext, aad):
+    """A stored version plus its item's DEK columns, as SECRET_VERSION returns them."""
+    item = {"id": item_id, "kek_id": None, "dek_nonce": None, "wrapped_dek": None}
+    aead, (dek_nonce, wrapped, kek_id) = c.writer_dek(item)
+    nonce, ct = c.seal_item(aead, plaintext, aad)
+    return {"alg": c.ENVELOPE_ALG, "item_id": item_id, "kek_id": kek_id,
+            "dek_nonce": dek_nonce, "wrapped_dek": wrapped, "nonce": nonce, "ciphertext": ct}
+
+
+def test_envelope_roundtrip(keks):
+    row = envelope_row(7, b'{"a":1}', b"p|1")
+    assert row["kek_id"] == "old"
+    c.DEK_CACHE.clear()
+    assert c.open_row(row, b"p|1") == b'{"a":1}'
+    # The AAD binds the ciphertext to its path and version
+    with pytest.raises(InvalidTag):
+        c.open_row(row, b"p|2")
+
+
+def test_existing_item_reuses_its_dek(keks):
+    row = envelope_row(7, b"v1", b"p|1")
+    item = {"id": 7, "kek_id": row["kek_id"], "dek_nonce": row["dek_nonce"], "wrapped_dek": row["wrapped_dek"]}
+    aead, new_dek = c.writer_dek(item)
+    assert new_dek is None
+    nonce, ct = c.seal_item(aead, b"v2", b"p|2")
+    assert c.open_row({**row, "nonce": nonce, "ciphertext": ct}, b"p|2") == b"v2"
+
+
+def test_legacy_rows_still_open():
+    nonce, ct = c.seal(b'{"old":true}', aad=b"p|1")
+    row = {"alg": c.LEGACY_ALG, "nonce": nonce, "ciphertext": ct}
+    assert c.open_row(row, b"p|1") == b'{"old":true}'
+    assert c.open_many([(row, b"p|1"), (row, b"p|9")])[0] == b'{"old":true}'
+    with pytest.raises(ValueError):
+        c.open_row({**row, "alg": "ROT13"}, b"p|1")
+
+
+def test_dek_cache_keyed_by_item_and_wrap_nonce(keks):
+    row = envelope_row(7, b"x", b"p|1")
+    c.DEK_CACHE.clear()
+    misses, hits = c.DEK_CACHE.misses, c.DEK_CACHE.hits
+    c.open_row(row, b"p|1")
+    c.open_row(row, b"p|1")
+    assert (c.DEK_CACHE.misses - misses, c.DEK_CACHE.hits - hits) == (1, 1)
+    assert c.DEK_CACHE.get((7, bytes(row["dek_nonce"]))) is not None
+    # A re-wrap under another KEK changes dek_nonce: a new cache key, same DEK
+    dek = c.unwrap_dek(7, "old", row["dek_nonce"], row["wrapped_dek"])
+    nonce, wrapped = c.wrap_dek(dek, 7, "new")
+    assert c.open_row({**row, "kek_id": "new", "dek_nonce": nonce, "wrapped_dek": wrapped}, b"p|1") == b"x"
+    assert c.DEK_CACHE.misses - misses == 2
+
+
+def test_wrapped_dek_bound_to_its_item(keks):
+    row = envelope_row(7, b"x", b"p|1")
+    with pytest.raises(InvalidTag):
+        c.unwrap_dek(8, row["kek_id"], row["dek_nonce"], row["wrapped_dek"])
+    with pytest.raises(KeyError):
+        c.unwrap_dek(7, "retired", row["dek_nonce"], row["wrapped_dek"])
+
+
+# ---------- rekey.rewrap ----------
+class FakeItems:
+    """core.secret_items for rewrap(): one transaction per pool.connection() block."""
+
+    def __init__(self, items, locked=(), fail_on_commit=None):
+        self.items = {i["id"]: dict(i) for i in items}
+        self.locked = set(locked)  # rows a concurrent writer holds (SKIP LOCKED)
+        self.commits = 0
+        self.fail_on_commit = fail_on_commit
+
+    @contextmanager
+    def connection(self):
+        db, staged, result = self, [], []
+
+        class Cur:
+            def execute(self, sql, params):
+                if sql == rekey.REWRAP_COUNT_SQL:
+                    result[:] = [{"n": sum(i["kek_id"] != params[0] for i in db.items.values())}]
+                elif sql == rekey.REWRAP_BATCH_SQL:
+                    kek, last_id, limit = params
+                    result[:] = [dict(i) for _, i in sorted(db.items.items())
+                                 if i["kek_id"] != kek and i["id"] > last_id and i["id"] not in db.locked][:limit]
+                else:
+                    raise AssertionError(sql)
+
+            def executemany(self, sql, rows):
+                assert sql == rekey.REWRAP_UPDATE_SQL
+                staged.extend(rows)
+
+            def fetchone(self):
+                return result[0]
+
+            def fetchall(self):
+                return list(result)
+
+        class Conn:
+            @contextmanager
+            def cursor(self, row_factory=None):
+                yield Cur()
+
+            def commit(self):
+                db.commits += 1
+                if db.commits == db.fail_on_commit:
+                    raise ConnectionError("server closed the connection")
+                for kek_id, nonce, wrapped, item_id in staged:
+                    db.items[item_id].update(kek_id=kek_id, dek_nonce=nonce, wrapped_dek=wrapped)
+                db.locked.clear()  # the concurrent writer is done by the next batch
+                staged.clear()
+
+        yield Conn()
+
+
+def test_rewrap_is_resumable(keks, monkeypatch):
+    deks, items = {}, []
+    for item_id in range(1, 8):
+        deks[item_id] = AESGCM.generate_key(bit_length=256)
+        nonce, wrapped = c.wrap_dek(deks[item_id], item_id, "old")
+        items.append({"id": item_id, "kek_id": "old", "dek_nonce": nonce, "wrapped_dek": wrapped})
+    # Item 2 is locked during the first batch; batch 2 fails to commit, so the
+    # run stops with 1, 3 and 4 re-wrapped and 5-7 untouched
+    db = FakeItems(items, locked={2}, fail_on_commit=2)
+    monkeypatch.setattr(rekey, "pool", db)
+    monkeypatch.setattr(rekey, "MASTER_KEY_ID", "new")
+    with pytest.raises(ConnectionError):
+        rekey.rewrap(batch=3)
+    assert [i["kek_id"] for _, i in sorted(db.items.items())] == ["new", "old", "new", "new"] + ["old"] * 3
+
+    # Progress is the kek_id column: a second run picks up the rest, incl. the skipped row
+    assert rekey.rewrap(batch=3) == 4
+    for item_id, i in db.items.items():
+        assert i["kek_id"] == "new"
+        assert c.unwrap_dek(item_id, "new", i["dek_nonce"], i["wrapped_dek"]) == deks[item_id]
+    assert rekey.rewrap(batch=3) == 0
@@ -1,17 +1,20 @@
 # python
+from datetime import datetime
+
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
-from .main import app, put_secret
+from app.main import app
+from app import queries as Q
+from app.crypto import ENVELOPE_ALG
 
 @pytest.fixture
 def client():
     return TestClient(app)
 
-@patch("app.main.require_api_key", lambda: None)
-@patch("app.main.seal")
+@patch("app.main.seal_item")
 @patch("app.main.pool")
-def test_put_secret_success(mock_pool, mock_seal, client):
+def test_put_secret_success(mock_pool, mock_seal, client, headers):
     # Arrange
     path = "service/api"
     payload = {"value": {"foo": "bar"}}
@@ -28,18 +31,18 @@ def test_put_secret_success(mock_pool, mock_seal, client):
 
     # Simulate DB steps
     # 1. Insert parent item (no return)
-    # 2. Lock parent row, return item id
+    # 2. Lock parent row, return item id (no data key yet)
     mock_cur.fetchone.side_effect = [
-        {"id": 42},  # select id from core.secret_items
+        {"id": 42, "kek_id": None, "dek_nonce": None, "wrapped_dek": None},  # lock core.secret_items
         {"mv": 1},   # select coalesce(max(version), 0)
-        {"version": 2, "created_at": "2024-06-01T12:00:00"}  # returning version, created_at
+        {"version": 2, "created_at": datetime(2024, 6, 1, 12, 0)}  # returning version, created_at
     ]
 
     # Act
     response = client.post(
         f"/secret/{path}",
         json=payload,
-        headers={"X-Actor-Id": actor_id, "X-API-Key": "dummy"}
+        headers={**headers, "X-Actor-Id": actor_id}
     )
 
     # Assert
@@ -50,10 +53,14 @@ def test_put_secret_success(mock_pool, mock_seal, client):
     assert data["value"] == payload["value"]
     assert data["created_at"] == "2024-06-01T12:00:00"
 
-@patch("app.main.require_api_key", lambda: None)
-@patch("app.main.seal")
+    # Sealed with the item's new data key, bound to path|version
+    assert mock_seal.call_args[0][2] == b"service/api|2"
+    executed = {c[0][0]: c[0][1] for c in mock_cur.execute.call_args_list}
+    assert executed[Q.SECRET_SET_DEK][3] == 42
+    assert executed[Q.SECRET_INSERT_VERSION] == (42, 2, ciphertext, nonce, ENVELOPE_ALG, actor_id)
+
 @patch("app.main.pool")
-def test_put_secret_parent_item_missing(mock_pool, mock_seal, client):
+def test_put_secret_parent_item_missing(mock_pool, client, headers):
     path = "service/api"
     payload = {"value": {"foo": "bar"}}
     mock_conn = MagicMock()
@@ -67,7 +74,7 @@ def test_put_secret_parent_item_missing(mock_pool, mock_seal, client):
     response = client.post(
         f"/secret/{path}",
         json=payload,
-        headers={"X-API-Key": "dummy"}
+        headers=headers
     )
     assert response.status_code == 500
-    assert response.json()["detail"] == "Secret item not created"
\ No newline at end of file
+    assert response.json()["detail"] == "Secret item not created"
@@ -0,0 +1,97 @@
+# python
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as m
+from app import queries as Q
+from app.crypto import seal, LEGACY_ALG
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    m.CONFIG_CACHE.clear()
+    m.SECRET_CACHE.clear()
+    yield
+    m.CONFIG_CACHE.clear()
+    m.SECRET_CACHE.clear()
+
+
+def secret_row(path, version):
+    nonce, ct = seal(b'{"p":"x"}', aad=f"{path}|{version}".encode())
+    return {"version": version, "ciphertext": ct, "nonce": nonce, "alg": LEGACY_ALG, "created_at": NOW}
+
+
+def test_etag_matches():
+    assert m.etag_matches('W/"ab", "cd"', '"cd"')
+    assert m.etag_matches("*", '"cd"')
+    assert not m.etag_matches('"ab"', '"cd"') and not m.etag_matches(None, '"cd"')
+
+
+def test_config_revalidates_checksum_only(mock_pool, headers):
+    pool, cur = mock_pool(fetchone=[{"checksum": b"\x01\x02"}])
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/config/e/t", headers={**headers, "If-None-Match": '"0102"'})
+    assert r.status_code == 304 and r.headers["etag"] == '"0102"' and not r.content
+    assert cur.execute.call_args_list[0][0] == (Q.CONFIG_CURRENT_ETAG, ("e/t",))
+    assert cur.execute.call_count == 1
+
+
+def test_config_changed_returns_body(mock_pool, headers):
+    pool, cur = mock_pool(fetchone=[
+        {"checksum": b"\x03"},
+        {"version": 2, "value_json": {"a": 1}, "checksum": b"\x03", "created_at": NOW},
+    ])
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/config/e/t", headers={**headers, "If-None-Match": '"0102"'})
+    assert r.status_code == 200 and r.json()["value"] == {"a": 1} and r.headers["etag"] == '"03"'
+
+
+def test_config_cached_304_without_db(mock_pool, headers):
+    pool, cur = mock_pool(fetchone=[{"version": 1, "value_json": {}, "checksum": b"\x01", "created_at": NOW}])
+    with patch("app.main.pool", pool):
+        c = TestClient(m.app)
+        assert c.get("/config/e/t", headers=headers).status_code == 200
+        r = c.get("/config/e/t", headers={**headers, "If-None-Match": 'W/"01"'})
+    assert r.status_code == 304 and cur.execute.call_count == 1
+
+
+def test_secret_current_revalidates_version_only(mock_pool, headers):
+    pool, cur = mock_pool(fetchone=[{"version": 4}])
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/secret/s/p", headers={**headers, "If-None-Match": m.secret_etag("s/p", 4)})
+    assert r.status_code == 304 and r.headers["etag"] == m.secret_etag("s/p", 4)
+    assert cur.execute.call_args[0] == (Q.SECRET_CURRENT_VERSION, ("s/p",))
+
+
+def test_secret_explicit_version_checks_it_exists(mock_pool, headers):
+    pool, cur = mock_pool(fetchone=[{"version": 3}])
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/secret/s/p?version=3",
+                                  headers={**headers, "If-None-Match": m.secret_etag("s/p", 3)})
+    assert r.status_code == 304
+    assert cur.execute.call_args[0] == (Q.SECRET_VERSION_EXISTS, ("s/p", 3))
+    assert "ciphertext" not in Q.SECRET_VERSION_EXISTS
+
+
+@pytest.mark.parametrize("inm", [m.secret_etag("s/p", 9), "*"])
+def test_secret_missing_version_is_404_despite_etag(mock_pool, headers, inm):
+    pool, cur = mock_pool(fetchone=[None, None])
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/secret/s/p?version=9", headers={**headers, "If-None-Match": inm})
+    assert r.status_code == 404
+    assert cur.execute.call_args_list[0][0] == (Q.SECRET_VERSION_EXISTS, ("s/p", 9))
+
+
+def test_secret_cached_version_304_without_db(mock_pool, headers, monkeypatch):
+    monkeypatch.setattr(m.SECRET_CACHE, "max_size", 1 << 20)
+    pool, cur = mock_pool(fetchone=[secret_row("s/p", 3)])
+    with patch("app.main.pool", pool), patch("app.main.audit_sink"):
+        c = TestClient(m.app)
+        assert c.get("/secret/s/p?version=3", headers=headers).json()["value"] == {"p": "x"}
+        r = c.get("/secret/s/p?version=3", headers={**headers, "If-None-Match": m.secret_etag("s/p", 3)})
+    assert r.status_code == 304 and cur.execute.call_count == 1
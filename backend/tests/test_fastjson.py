@@ -0,0 +1,69 @@
+# python
+import json
+
+import orjson
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app import fastjson
+from app.models import ConfigOut, SecretOut
+
+VALUES = [
+    {"a": 1, "b": [True, None, 1.5, -0.0], "nested": {"k": "v"}},
+    {"unicode": "héllo   日本", "ctl": "\x00\t\"\\"},
+    {"big": 2**63 - 1, "neg": -2**63, "small": 5e-324},
+    [], "plain string", 42, None,
+]
+EXPONENT_FLOATS = [1e16, 1e-7, 1e300]
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request, monkeypatch):
+    monkeypatch.setattr(fastjson, "orjson", orjson if request.param == "orjson" else None)
+    return request.param
+
+
+def rendered(model) -> bytes:
+    """What FastAPI returns for `model` through response_model."""
+    return JSONResponse(jsonable_encoder(model)).body
+
+
+@pytest.mark.parametrize("value", VALUES)
+def test_config_body_matches_model(encoder, value):
+    body = fastjson.config_body("app/é", 3, fastjson.dumps(value), "2026-01-01T00:00:00+00:00")
+    assert body == rendered(ConfigOut(path="app/é", version=3, value=value, created_at="2026-01-01T00:00:00+00:00"))
+
+
+@pytest.mark.parametrize("mask_response", [False, True])
+@pytest.mark.parametrize("value", [v for v in VALUES if isinstance(v, dict)])
+def test_secret_body_matches_model(encoder, value, mask_response):
+    body = fastjson.secret_body("s/p", 7, fastjson.dumps(value), "2026-01-01T00:00:00+00:00", mask_response)
+    assert body == rendered(SecretOut(path="s/p", version=7, value=value, created_at="2026-01-01T00:00:00+00:00",
+                                      mask_response=mask_response))
+
+
+@pytest.mark.parametrize("value", VALUES)
+def test_stdlib_and_orjson_bytes_identical(value, monkeypatch):
+    fast = fastjson.dumps(value)
+    monkeypatch.setattr(fastjson, "orjson", None)
+    assert fastjson.dumps(value) == fast
+
+
+@pytest.mark.parametrize("value", EXPONENT_FLOATS)
+def test_exponent_floats_same_value(value, monkeypatch):
+    fast = fastjson.dumps({"f": value})
+    monkeypatch.setattr(fastjson, "orjson", None)
+    assert json.loads(fastjson.dumps({"f": value})) == json.loads(fast) == {"f": value}
+
+
+def test_integers_beyond_64_bits_fall_back_to_stdlib():
+    with pytest.raises(TypeError):
+        orjson.dumps(2**64)
+    assert fastjson.orjson is not None
+    assert fastjson.dumps({"n": 2**64, "m": -2**70}) == b'{"n":18446744073709551616,"m":-1180591620717411303424}'
+
+
+def test_canonical_is_stdlib_sorted(encoder):
+    assert fastjson.canonical({"b": 1, "a": "é"}) == b'{"a":"\\u00e9","b":1}'
+
@@ -0,0 +1,110 @@
+# python
+import time
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as m
+from app import health
+from app.health import Readiness
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def fake_pool(waiting=0):
+    p = MagicMock()
+    p.get_stats.return_value = {"requests_waiting": waiting}
+    return p
+
+
+@pytest.fixture
+def probe(mock_pool, monkeypatch):
+    """A fresh Readiness behind the app, a checked pool and one probed pool."""
+    pool, cur = mock_pool(fetchone=[(NOW,)] * 1000)
+    pools = {"primary": fake_pool()}
+    monkeypatch.setattr(health, "pool", pool)
+    monkeypatch.setattr(health, "POOLS", pools)
+    monkeypatch.setattr(health, "HEALTH_STALE_AFTER", 15.0)
+    monkeypatch.setattr(health, "READY_MAX_WAITING", 10)
+    r = Readiness()
+    with patch("app.main.readiness", r):
+        yield r, pool, pools
+
+
+def get(url):
+    return TestClient(m.app).get(url)
+
+
+def test_livez_needs_nothing(probe):
+    r, pool, _ = probe
+    assert get("/livez").json() == {"status": "ok"} and not pool.connection.called
+
+
+def test_unready_until_started(probe):
+    r, pool, _ = probe
+    assert r.check()
+    resp = get("/readyz")
+    assert resp.status_code == 503 and resp.json()["reasons"] == ["starting"]
+    r.mark_started(0.1, 2)
+    resp = get("/readyz")
+    assert resp.status_code == 200 and resp.json()["status"] == "ok"
+    assert resp.json()["db_time_utc"] == NOW.isoformat()
+
+
+def test_no_check_yet(probe):
+    r, pool, _ = probe
+    r.mark_started(0.1, 2)
+    resp = get("/readyz")
+    assert resp.status_code == 503 and resp.json()["reasons"] == ["database: no successful check yet"]
+
+
+def test_stale_check(probe):
+    r, pool, _ = probe
+    r.mark_started(0.1, 2)
+    r.last_ok, r.error = time.monotonic() - 60, "timeout"
+    resp = get("/readyz")
+    assert resp.status_code == 503 and resp.json()["reasons"] == ["database: timeout"]
+    assert resp.json()["checked_age_s"] >= 60
+
+
+def test_failed_check_records_error(probe):
+    r, pool, _ = probe
+    pool.connection.side_effect = OSError("connection refused")
+    assert not r.check() and r.error == "connection refused" and r.last_ok is None
+
+
+def test_saturated_pool(probe, monkeypatch):
+    r, pool, pools = probe
+    r.check()
+    r.mark_started(0.1, 2)
+    pools["async"] = fake_pool(waiting=11)
+    resp = get("/healthz")
+    assert resp.status_code == 503 and resp.json()["reasons"] == ["pool saturated: async"]
+    assert resp.json()["pool_waiting"] == {"primary": 0, "async": 11}
+    monkeypatch.setattr(health, "READY_MAX_WAITING", -1)  # saturation ignored
+    assert get("/health").status_code == 200
+
+
+def test_probes_never_touch_the_pool(probe):
+    r, pool, _ = probe
+    r.check()
+    r.mark_started(0.1, 2)
+    assert pool.connection.call_count == 1
+    for url in ("/readyz", "/health", "/healthz", "/livez") * 5:
+        assert get(url).status_code == 200
+    assert pool.connection.call_count == 1
+
+
+def test_background_thread_checks_periodically(probe):
+    r, pool, _ = probe
+    r.interval = 0.01
+    r.start()
+    try:
+        deadline = time.monotonic() + 2
+        while pool.connection.call_count < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        r.stop()
+    assert pool.connection.call_count >= 3 and r.last_ok is not None
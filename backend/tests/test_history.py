@@ -0,0 +1,65 @@
+# python
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as m
+from app import history
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+ACTOR = "11111111-1111-1111-1111-111111111111"
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    m.CONFIG_CACHE.clear()
+    yield
+    m.CONFIG_CACHE.clear()
+
+
+@pytest.mark.parametrize("path", ["app/versions", "app/diff"])
+def test_configs_named_versions_or_diff_are_readable(mock_pool, headers, path):
+    pool, cur = mock_pool(fetchone=[{"version": 1, "value_json": {"ok": True}, "checksum": b"\x01", "created_at": NOW}])
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get(f"/config/{path}", headers=headers)
+    assert r.status_code == 200 and r.json()["path"] == path and r.json()["value"] == {"ok": True}
+
+
+def test_versions_page(mock_pool, headers):
+    pool, cur = mock_pool(fetchone=[{"id": 9}], fetchall=[
+        {"version": v, "is_current": v == 3, "checksum": b"\xab", "created_at": NOW, "created_by": ACTOR}
+        for v in (3, 2)
+    ])
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/config/app/versions:versions?limit=2", headers=headers)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["path"] == "app/versions" and [v["version"] for v in body["versions"]] == [3, 2]
+    assert body["versions"][0]["checksum"] == "ab" and body["next_before"] == 2
+    assert cur.execute.call_args[0] == (history.VERSIONS_PAGE, (9, 2**31 - 1, 2))
+
+
+def test_versions_unknown_path(mock_pool, headers):
+    pool, cur = mock_pool(fetchone=[None])
+    with patch("app.main.pool", pool):
+        assert TestClient(m.app).get("/config/nope:versions", headers=headers).status_code == 404
+
+
+def test_diff_defaults_to_previous_version(mock_pool, headers, monkeypatch):
+    values = {2: {"a": 1, "b": 2}, 3: {"a": 1, "b": 3}}
+    monkeypatch.setattr(history, "value_at", lambda cur, item_id, v: values.get(v))
+    pool, cur = mock_pool(fetchone=[{"id": 9}, {"version": 3}])
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/config/app/flags:diff", headers=headers)
+    assert r.json() == {"path": "app/flags", "from": 2, "to": 3,
+                        "patch": [{"op": "replace", "path": "/b", "value": 3}]}
+
+
+def test_diff_missing_version(mock_pool, headers, monkeypatch):
+    monkeypatch.setattr(history, "value_at", lambda cur, item_id, v: None)
+    pool, cur = mock_pool(fetchone=[{"id": 9}])
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/config/app/flags:diff?from=1&to=7", headers=headers)
+    assert r.status_code == 404
@@ -0,0 +1,22 @@
+# python
+import copy
+from app import jsonpatch
+
+def roundtrip(a, b):
+    ops = jsonpatch.diff(a, b)
+    assert jsonpatch.apply(copy.deepcopy(a), ops) == b
+    return ops
+
+def test_single_key_change_is_one_op():
+    a = {"flags": {f"f{i}": False for i in range(100)}}
+    b = copy.deepcopy(a)
+    b["flags"]["f7"] = True
+    assert roundtrip(a, b) == [{"op": "replace", "path": "/flags/f7", "value": True}]
+
+def test_lists_and_escaped_keys():
+    roundtrip({"a/b": [1, 2, 3], "~": 1}, {"a/b": [1, 5], "~": 1, "n": None})
+    roundtrip([1, 2], [1, 2, {"x": [3]}])
+
+def test_type_changes_are_replaced():
+    assert roundtrip({"x": 1}, {"x": True}) == [{"op": "replace", "path": "/x", "value": True}]
+    assert roundtrip({"x": 1}, [1]) == [{"op": "replace", "path": "", "value": [1]}]
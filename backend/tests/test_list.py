@@ -0,0 +1,99 @@
+# python
+import json
+import time
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as m
+from app.replica import ReplicaRouter
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def config_rows(*paths):
+    return [{"path": p, "version": 1, "value_text": '{"p": "%s"}' % p, "created_at": NOW} for p in paths]
+
+
+def pages(mock_pool, *page_rows):
+    pool, cur = mock_pool()
+    cur.fetchall.side_effect = list(page_rows)
+    return pool, cur
+
+
+@pytest.fixture(autouse=True)
+def page_size(monkeypatch):
+    monkeypatch.setattr(m, "LIST_PAGE_SIZE", 2)
+
+
+def lines(r):
+    return [json.loads(x) for x in r.text.splitlines()]
+
+
+def test_pages_advance_the_cursor(mock_pool, headers):
+    pool, cur = pages(mock_pool, config_rows("app/a", "app/b"), config_rows("app/c"))
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/config?prefix=app/", headers=headers)
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    assert [x["path"] for x in lines(r)] == ["app/a", "app/b", "app/c"]
+    assert lines(r)[0]["value"] == {"p": "app/a"}
+    # [prefix, prefix + 0x7f) with the keyset cursor after the last path seen
+    assert [c[0][1] for c in cur.execute.call_args_list] == [
+        ("app/", "app/\x7f", "", 2),
+        ("app/", "app/\x7f", "app/b", 2),
+    ]
+
+
+def test_full_last_page_needs_one_more_query(mock_pool, headers):
+    pool, cur = pages(mock_pool, config_rows("app/a", "app/b"), [])
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/config?prefix=app/", headers=headers)
+    assert [x["path"] for x in lines(r)] == ["app/a", "app/b"]
+    assert cur.execute.call_count == 2 and cur.execute.call_args[0][1][2] == "app/b"
+
+
+def test_empty_prefix_streams_nothing(mock_pool, headers):
+    pool, cur = pages(mock_pool, [])
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/config?prefix=none/", headers=headers)
+    assert r.status_code == 200 and r.text == "" and cur.execute.call_count == 1
+
+
+def test_each_page_borrows_its_own_connection(mock_pool):
+    pool, cur = pages(mock_pool, config_rows("a/1", "a/2"), config_rows("a/3"))
+    it = m._iter_prefix("sql", "a/", lambda r: r["path"].encode(), pool)
+    assert next(it) == b"a/1\na/2\n" and pool.connection.call_count == 1
+    assert next(it) == b"a/3\n" and pool.connection.call_count == 2
+    assert next(it, None) is None
+
+
+def test_secret_listing_has_no_values(mock_pool, headers):
+    rows = [{"path": "s/a", "version": 4, "created_at": NOW}]
+    pool, cur = pages(mock_pool, rows)
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/secret?prefix=s/", headers=headers)
+    assert lines(r) == [{"path": "s/a", "version": 4, "created_at": NOW.isoformat()}]
+
+
+def test_invalid_prefix(headers):
+    assert TestClient(m.app).get("/config?prefix=app//x", headers=headers).status_code == 400
+
+
+@pytest.mark.parametrize("url, rows", [
+    ("/config?prefix=app/", config_rows("app/r")),
+    ("/secret?prefix=app/", [{"path": "app/r", "version": 1, "created_at": NOW}]),
+])
+def test_replica_serves_listing_when_healthy(mock_pool, headers, url, rows):
+    rp, rcur = pages(mock_pool, rows, rows)
+    pp, pcur = pages(mock_pool, rows)
+    router = ReplicaRouter(replica=MagicMock(), max_lag=2, interval=1)
+    router.lag, router.checked_at = 0.1, time.monotonic()
+    c = TestClient(m.app)
+    with patch("app.main.pool", pp), patch("app.main.replica_pool", rp), patch("app.main.replicas", router):
+        assert lines(c.get(url, headers=headers))[0]["path"] == "app/r"
+        assert rcur.execute.call_count == 1 and pcur.execute.call_count == 0
+        router.lag = 10  # lagging: the primary answers
+        assert lines(c.get(url, headers=headers))[0]["path"] == "app/r"
+    assert pcur.execute.call_count == 1 and rcur.execute.call_count == 1
@@ -0,0 +1,36 @@
+# python
+import json
+import logging
+
+from app import logging_config as lc
+
+def _record(msg="Auth failed: %s", args=("x",), name="app.auth"):
+    return logging.LogRecord(name, logging.WARNING, __file__, 1, msg, args, None)
+
+def test_rate_limit_reports_suppressed():
+    f = lc.RateLimitFilter(rate=0, burst=2)
+    passed = [f.filter(_record()) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    f.rate = 1e9  # refill immediately
+    r = _record()
+    assert f.filter(r) and r.suppressed == 3
+    assert f.filter(_record(msg="other %s"))  # separate bucket per template
+
+def test_json_line_carries_request_context():
+    token = lc._request.set({"request_id": "r1"})
+    try:
+        lc.bind_principal("svc")
+        r = _record(args=({"password": "hunter2hunter2"},))
+        lc.MaskingFilter().filter(r)
+        lc.ContextFilter().filter(r)
+    finally:
+        lc._request.reset(token)
+    out = json.loads(lc.JsonFormatter().format(r))
+    assert out["request_id"] == "r1" and out["principal"] == "svc"
+    assert "hunter2hunter2" not in out["msg"] and out["level"] == "WARNING"
+
+def test_setup_is_idempotent():
+    lc.setup_logging()
+    lc.setup_logging()
+    assert sum(isinstance(h, lc.QueueHandler) for h in logging.getLogger().handlers) == 1
+    lc.flush_logging()
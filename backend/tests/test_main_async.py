@@ -0,0 +1,172 @@
+# python
+# The async hot handlers against mocked AsyncConnectionPools. Responses are
+# compared with the sync app's for the same rows, so the two cannot drift.
+import time
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as m
+import app.main_async as ma
+from app import queries as Q
+from app.crypto import seal, LEGACY_ALG
+from app.replica import ReplicaRouter
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+ACTOR = "11111111-1111-1111-1111-111111111111"
+
+
+def config_row(v):
+    return {"version": v, "value_json": {"v": v}, "checksum": bytes([v]) * 32, "created_at": NOW}
+
+
+def secret_row(path, v):
+    nonce, ct = seal(b'{"v":%d}' % v, aad=f"{path}|{v}".encode())
+    return {"version": v, "ciphertext": ct, "nonce": nonce, "alg": LEGACY_ALG, "created_at": NOW}
+
+
+def healthy_router(replica):
+    r = ReplicaRouter(replica=replica, max_lag=2, interval=1)
+    r.lag, r.checked_at = 0.1, time.monotonic()
+    return r
+
+
+@pytest.fixture(autouse=True)
+def caches(monkeypatch):
+    monkeypatch.setattr(m.SECRET_CACHE, "max_size", 1 << 20)
+    m.CONFIG_CACHE.clear()
+    m.SECRET_CACHE.clear()
+    yield
+    m.CONFIG_CACHE.clear()
+    m.SECRET_CACHE.clear()
+
+
+@pytest.fixture
+def client():
+    return TestClient(ma.app)
+
+
+def test_hot_routes_are_async_and_order_kept():
+    paths = [r.path for r in ma.app.router.routes if hasattr(r, "endpoint")]
+    assert paths == [r.path for r in m.app.router.routes if hasattr(r, "endpoint")]
+    handlers = {(r.path, tuple(sorted(r.methods))): r.endpoint for r in ma.app.router.routes if hasattr(r, "methods")}
+    assert handlers[("/config/{path:path}", ("GET",))] is ma.get_config
+    assert handlers[("/secret/{path:path}", ("POST",))] is ma.put_secret
+    assert handlers[("/config/{path:path}:versions", ("GET",))] is m.config_versions
+
+
+@pytest.mark.parametrize("url, row", [
+    ("/config/a/p", config_row(2)),
+    ("/secret/s/p", secret_row("s/p", 2)),
+])
+def test_get_matches_sync_app(mock_pool, mock_async_pool, headers, client, url, row):
+    pool, cur = mock_pool(fetchone=[row])
+    apool, acur = mock_async_pool(fetchone=[row])
+    with patch("app.main.pool", pool), patch("app.main_async.apool", apool):
+        sync_r = TestClient(m.app).get(url, headers=headers)
+        m.CONFIG_CACHE.clear()
+        m.SECRET_CACHE.clear()
+        async_r = client.get(url, headers=headers)
+    assert async_r.status_code == sync_r.status_code == 200
+    assert async_r.content == sync_r.content and async_r.headers["etag"] == sync_r.headers["etag"]
+    assert acur.execute.call_args[0] == cur.execute.call_args[0]
+
+
+def test_config_cache_hit_and_304(mock_async_pool, headers, client):
+    apool, acur = mock_async_pool(fetchone=[config_row(3)])
+    with patch("app.main_async.apool", apool):
+        first = client.get("/config/a/c", headers=headers)
+        second = client.get("/config/a/c", headers=headers)
+        etag = first.headers["etag"]
+        cached_304 = client.get("/config/a/c", headers={**headers, "If-None-Match": etag})
+    assert second.content == first.content and acur.execute.await_count == 1
+    assert cached_304.status_code == 304 and cached_304.headers["etag"] == etag
+
+
+def test_config_304_revalidates_without_value(mock_async_pool, headers, client):
+    etag = m.config_etag(bytes([3]) * 32)
+    apool, acur = mock_async_pool(fetchone=[{"checksum": bytes([3]) * 32}])
+    with patch("app.main_async.apool", apool):
+        r = client.get("/config/a/c", headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 304
+    assert [c[0][0] for c in acur.execute.await_args_list] == [Q.CONFIG_CURRENT_ETAG]
+
+
+def test_secret_304_for_explicit_version_checks_existence(mock_async_pool, headers, client):
+    apool, acur = mock_async_pool(fetchone=[{"version": 2}])
+    etag = m.secret_etag("s/p", 2)
+    with patch("app.main_async.apool", apool):
+        r = client.get("/secret/s/p?version=2", headers={**headers, "If-None-Match": etag})
+    assert r.status_code == 304
+    assert acur.execute.await_args[0] == (Q.SECRET_VERSION_EXISTS, ("s/p", 2))
+
+
+def test_secret_cache_hit(mock_async_pool, headers, client):
+    apool, acur = mock_async_pool(fetchone=[secret_row("s/c", 4)])
+    with patch("app.main_async.apool", apool):
+        client.get("/secret/s/c", headers=headers)
+        r = client.get("/secret/s/c?version=4", headers=headers)
+    assert r.json()["value"] == {"v": 4} and acur.execute.await_count == 1
+
+
+def test_stale_replica_falls_back_to_primary(mock_async_pool, headers, client):
+    rp, rcur = mock_async_pool(fetchone=[config_row(1), secret_row("s/r", 1)])
+    pp, pcur = mock_async_pool(fetchone=[config_row(2), secret_row("s/r", 2)])
+    r = healthy_router(MagicMock())
+    r.note_version("config", "a/r", 2)
+    r.note_version("secret", "s/r", 2)
+    with patch("app.main_async.apool", pp), patch("app.main_async.areplica", rp), \
+            patch("app.main_async.replicas", r):
+        assert client.get("/config/a/r", headers=headers).json()["version"] == 2
+        assert client.get("/secret/s/r", headers=headers).json()["version"] == 2
+    assert rcur.execute.await_count == 2 and pcur.execute.await_count == 2
+    assert r.fallbacks["stale"] == 2
+
+
+def test_lagging_replica_not_used(mock_async_pool, headers, client):
+    rp, rcur = mock_async_pool()
+    pp, pcur = mock_async_pool(fetchone=[config_row(2)])
+    r = healthy_router(MagicMock())
+    r.lag = 10
+    with patch("app.main_async.apool", pp), patch("app.main_async.areplica", rp), \
+            patch("app.main_async.replicas", r):
+        assert client.get("/config/a/r", headers=headers).json()["version"] == 2
+    assert rcur.execute.await_count == 0 and r.fallbacks["lag"] == 1
+
+
+@pytest.mark.parametrize("durable", [True, False])
+def test_put_config_echo_and_invalidation(mock_async_pool, headers, client, monkeypatch, durable):
+    monkeypatch.setattr(ma, "AUDIT_DURABLE", durable)
+    m.CONFIG_CACHE.put("a/w", ("old", {"version": 1}, b"{}"))
+    apool, acur = mock_async_pool(fetchone=[{"version": 5, "created_at": NOW, "changed": True}])
+    with patch("app.main_async.apool", apool), patch("app.main_async.audit_sink") as sink:
+        r = client.post("/config/a/w", json={"value": {"b": 1, "a": 2}}, headers={**headers, "X-Actor-Id": ACTOR})
+    assert r.status_code == 201, r.text
+    assert r.json() == {"path": "a/w", "version": 5, "value": {"a": 2, "b": 1}, "created_at": NOW.isoformat()}
+    sql, params = acur.execute.await_args[0]
+    assert sql == Q.CONFIG_PUT and params[1] == '{"a":2,"b":1}' and r.headers["etag"] == m.config_etag(params[2])
+    assert m.CONFIG_CACHE.get("a/w") is None
+    # Durable: audited in the same statement; otherwise queued without blocking the loop
+    assert params[-1] is durable
+    if durable:
+        assert not sink.emit.called
+    else:
+        assert sink.emit.call_args.kwargs == {"block": False}
+
+
+def test_put_secret_echo_is_masked(mock_async_pool, headers, client):
+    m.SECRET_CACHE.put(("s/w", None), (1, NOW.isoformat(), b'{"v":1}'))
+    apool, acur = mock_async_pool(fetchone=[
+        {"id": 7, "kek_id": None, "dek_nonce": None, "wrapped_dek": None},
+        {"mv": 1},
+        {"version": 2, "created_at": NOW},
+    ])
+    with patch("app.main_async.apool", apool), patch("app.main_async.audit_sink"):
+        r = client.post("/secret/s/w", json={"value": {"password": "hunter2"}}, headers=headers)
+    assert r.status_code == 201, r.text
+    assert r.json()["version"] == 2 and r.json()["value"]["password"] != "hunter2"
+    assert m.SECRET_CACHE.get(("s/w", None)) is None
+    sql, params = [c for c in acur.execute.await_args_list if c[0][0] == Q.SECRET_INSERT_VERSION][0][0]
+    assert params[:2] == (7, 2)
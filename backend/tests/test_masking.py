@@ -0,0 +1,36 @@
+# python
+from app.masking import Masker, mask_string
+
+def test_nested_lists_and_inherited_keys():
+    m = Masker("password,token")
+    doc = {
+        "user": "bob",
+        "password": "hunter2hunter2",
+        "clients": [{"name": "a", "Token": "abcdefgh"}, {"name": "b"}],
+        "tokens": ["short", ["abcdefghij"]],
+        "nested": {"deep": [[{"db_password": "pw"}]]},
+    }
+    out = m.mask(doc)
+    assert out["user"] == "bob" and out["clients"][1] == {"name": "b"}
+    assert out["password"] == "hu**********r2"
+    assert out["clients"][0] == {"name": "a", "Token": "ab****gh"}
+    assert out["tokens"] == ["*****", ["ab******ij"]]
+    assert out["nested"]["deep"][0][0]["db_password"] == "**"
+    assert doc["password"] == "hunter2hunter2"  # input untouched
+
+def test_non_strings_and_policy():
+    m = Masker("re:^pin$, secret")
+    assert m.mask({"pin": 1234, "PIN": "1234", "spin": "x", "my_secret": None}) == \
+        {"pin": 1234, "PIN": "****", "spin": "x", "my_secret": None}
+    assert Masker("").mask({"password": "x"}) == {"password": "x"}
+    assert m.mask("scalar") == "scalar" and mask_string("") == ""
+
+def test_deep_document_does_not_recurse():
+    doc = cur = {}
+    for _ in range(5000):
+        cur["k"] = cur = {}
+    cur["secret"] = "abcdefgh"
+    out = Masker("secret").mask(doc)
+    for _ in range(5000):
+        out = out["k"]
+    assert out == {"secret": "ab****gh"}
@@ -0,0 +1,119 @@
+# python
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as m
+from app import metrics
+
+
+def family(name, kind, *samples):
+    return [name, kind, "help", [list(s) for s in samples]]
+
+
+def worker_file(directory, pid, *families):
+    (directory / f"{pid}.json").write_text(json.dumps(list(families)))
+
+
+def sample(text, line_start):
+    values = [float(l.rsplit(" ", 1)[1]) for l in text.splitlines() if l.startswith(line_start + " ")]
+    assert len(values) == 1, (line_start, text)
+    return values[0]
+
+
+@pytest.fixture
+def shared(tmp_path, monkeypatch):
+    """MULTIPROCESS_DIR in tmp_path; this process contributes one counter."""
+    monkeypatch.setattr(metrics, "MULTIPROCESS_DIR", str(tmp_path))
+    monkeypatch.setattr(metrics, "REGISTRY", [])
+    metrics.Collector(lambda: [("t_self_total", "counter", "help", [({}, 1)])])
+    return tmp_path
+
+
+def test_single_process_format():
+    h = metrics.Histogram("t_single_seconds", "help", ("op",), buckets=(0.1, 1.0))
+    metrics.REGISTRY.remove(h)
+    h.observe(0.05, 'a"b')
+    h.observe(5.0, 'a"b')
+    assert list(metrics._render(h.collect())) == [
+        "# HELP t_single_seconds help",
+        "# TYPE t_single_seconds histogram",
+        't_single_seconds_bucket{op="a\\"b",le="0.1"} 1',
+        't_single_seconds_bucket{op="a\\"b",le="1.0"} 1',
+        't_single_seconds_bucket{op="a\\"b",le="+Inf"} 2',
+        't_single_seconds_sum{op="a\\"b"} 5.05',
+        't_single_seconds_count{op="a\\"b"} 2',
+    ]
+
+
+def test_counters_summed_gauges_per_worker(shared):
+    for pid, n in ((101, 3), (102, 4)):
+        worker_file(shared, pid,
+                    family("t_req_total", "counter", ["", [["route", "/a"]], n]),
+                    family("t_lat", "histogram", ["_bucket", [["le", "+Inf"]], n], ["_sum", [], n / 10],
+                           ["_count", [], n]),
+                    family("t_pool_size", "gauge", ["", [["pool", "sync"]], n * 2]))
+    text = metrics.render()
+    assert sample(text, 't_req_total{route="/a"}') == 7
+    assert sample(text, 't_lat_bucket{le="+Inf"}') == 7 and sample(text, "t_lat_count") == 7
+    assert sample(text, 't_pool_size{pool="sync",worker="101"}') == 6
+    assert sample(text, 't_pool_size{pool="sync",worker="102"}') == 8
+    assert text.count("# TYPE t_req_total counter") == 1
+    # the scraped worker wrote its own samples first
+    assert sample(text, "t_self_total") == 1
+
+
+def test_recycled_worker_keeps_counters_not_gauges(shared):
+    worker_file(shared, 101, family("t_req_total", "counter", ["", [], 5]), family("t_up", "gauge", ["", [], 1]))
+    worker_file(shared, 102, family("t_req_total", "counter", ["", [], 2]), family("t_up", "gauge", ["", [], 1]))
+    before = metrics.render()
+    metrics.archive_worker(str(shared), 101)
+    after = metrics.render()
+    assert not (shared / "101.json").exists()
+    assert sample(before, "t_req_total") == sample(after, "t_req_total") == 7
+    assert 'worker="101"' in before and 'worker="101"' not in after
+    # a second recycle adds to the archive
+    metrics.archive_worker(str(shared), 102)
+    assert sample(metrics.render(), "t_req_total") == 7
+    assert json.loads((shared / metrics.ARCHIVE).read_text())["pids"] == [102]
+
+
+def test_archived_file_not_counted_twice(shared):
+    worker_file(shared, 101, family("t_req_total", "counter", ["", [], 5]))
+    metrics.archive_worker(str(shared), 101)
+    # a reader that listed the directory between the archive write and the unlink
+    worker_file(shared, 101, family("t_req_total", "counter", ["", [], 5]))
+    assert sample(metrics.render(), "t_req_total") == 5
+
+
+def test_worker_without_samples_is_ignored(shared):
+    metrics.archive_worker(str(shared), 999)
+    (shared / "998.json").write_text("{truncated")
+    assert sample(metrics.render(), "t_self_total") == 1
+
+
+def test_sample_writer_final_write(shared):
+    w = metrics.SampleWriter(interval=60)
+    w.start()
+    w.stop()
+    files = [p.name for p in shared.iterdir()]
+    assert len(files) == 1 and json.loads((shared / files[0]).read_text())[0][0] == "t_self_total"
+
+
+def test_writer_off_without_shared_dir(monkeypatch):
+    monkeypatch.setattr(metrics, "MULTIPROCESS_DIR", None)
+    w = metrics.SampleWriter()
+    w.start()
+    assert w._thread is None
+
+
+def test_endpoint_merges_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "MULTIPROCESS_DIR", str(tmp_path))
+    worker_file(tmp_path, 1, family("confmgr_cache_hits_total", "counter", ["", [["cache", "config"]], 1000]))
+    client = TestClient(m.app)
+    client.get("/livez")
+    text = client.get("/metrics").text
+    assert sample(text, 'confmgr_cache_hits_total{cache="config"}') >= 1000
+    assert 'confmgr_http_request_duration_seconds_count{method="GET",route="/livez",status="200"}' in text
+    assert 'confmgr_ready{worker="' in text
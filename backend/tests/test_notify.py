@@ -0,0 +1,87 @@
+# python
+import json
+import re
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import app.main as m
+from app.notify import CHANNEL, ChangeListener
+
+
+@pytest.fixture(autouse=True)
+def caches(monkeypatch):
+    monkeypatch.setattr(m.SECRET_CACHE, "max_size", 1 << 20)
+    m.CONFIG_CACHE.clear()
+    m.SECRET_CACHE.clear()
+    yield
+    m.CONFIG_CACHE.clear()
+    m.SECRET_CACHE.clear()
+
+
+def payload(kind, path, version):
+    return json.dumps({"kind": kind, "path": path, "version": version})
+
+
+def test_listen_quotes_channel_and_dispatches():
+    listener, seen = ChangeListener(), []
+    listener.subscribe(lambda *a: seen.append(a))
+    conn = MagicMock()
+
+    def notifies(timeout):
+        listener._stop.set()
+        return [SimpleNamespace(payload=payload("config", "app/a", 3))]
+    conn.__enter__.return_value.notifies.side_effect = notifies
+    with patch("app.notify.db.connect", return_value=conn):
+        listener._run()
+    stmt = conn.__enter__.return_value.execute.call_args[0][0]
+    assert stmt.as_string(None) == f'listen "{CHANNEL}"'
+    # reset on connect, then the notification
+    assert seen == [("*", None, None), ("config", "app/a", 3)]
+
+
+def test_channel_matches_triggers():
+    initdb = Path(__file__).resolve().parents[2] / "postgres" / "initdb"
+    for name in ("70_change_notify.sql", "76_api_clients_notify.sql"):
+        channels = re.findall(r"pg_notify\(\s*'([^']+)'", (initdb / name).read_text())
+        assert channels and set(channels) == {CHANNEL}
+
+
+def test_malformed_payload_ignored():
+    listener, seen = ChangeListener(), []
+    listener.subscribe(lambda *a: seen.append(a))
+    listener._handle("not json")
+    listener._handle('{"kind": "config"}')
+    assert seen == []
+
+
+def test_failing_subscriber_does_not_stop_fanout():
+    listener, seen = ChangeListener(), []
+    listener.subscribe(lambda *a: 1 / 0)
+    listener.subscribe(lambda *a: seen.append(a))
+    listener._handle(payload("secret", "s/a", 2))
+    assert seen == [("secret", "s/a", 2)]
+
+
+def test_config_change_invalidates_path():
+    m.CONFIG_CACHE.put("app/a", "a")
+    m.CONFIG_CACHE.put("app/b", "b")
+    m._on_change("config", "app/a", 4)
+    assert m.CONFIG_CACHE.get("app/a") is None and m.CONFIG_CACHE.get("app/b") == "b"
+
+
+def test_secret_change_invalidates_current_version_only():
+    m.SECRET_CACHE.put(("s/a", None), (2, "t", b"{}"))
+    m.SECRET_CACHE.put(("s/a", 1), (1, "t", b"{}"))
+    m._on_change("secret", "s/a", 3)
+    # explicit versions are immutable and stay cached
+    assert m.SECRET_CACHE.get(("s/a", None)) is None and m.SECRET_CACHE.get(("s/a", 1)) is not None
+
+
+def test_reset_clears_everything():
+    m.CONFIG_CACHE.put("app/a", "a")
+    m.SECRET_CACHE.put(("s/a", 1), (1, "t", b"{}"))
+    m._on_change("*", None, None)
+    assert m.CONFIG_CACHE.get("app/a") is None and m.SECRET_CACHE.get(("s/a", 1)) is None
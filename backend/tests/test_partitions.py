@@ -0,0 +1,84 @@
+# python
+import sys
+
+import psycopg
+import pytest
+
+from app import partitions as p
+
+
+@pytest.fixture
+def db(mock_pool, monkeypatch):
+    def make(*results):
+        pool, cur = mock_pool()
+        cur.fetchall.side_effect = list(results)
+        monkeypatch.setattr(p, "pool", pool)
+        return pool, cur
+    return make
+
+
+def test_maintain_without_retention_only_ensures(db):
+    pool, cur = db([("audit_logs_2026_02",)])
+    assert p.maintain(ahead=6, retention_months=0, drop=True) == {
+        "created": ["audit_logs_2026_02"], "expired": [], "dropped": True,
+    }
+    assert [c[0] for c in cur.execute.call_args_list] == [("select audit.ensure_partitions(%s)", (6,))]
+    pool.connection.return_value.__enter__.return_value.commit.assert_called_once()
+
+
+@pytest.mark.parametrize("drop", [False, True])
+def test_maintain_expires_with_retention(db, drop):
+    pool, cur = db([], [("audit_logs_2024_01",), ("audit_logs_2024_02",)])
+    res = p.maintain(ahead=3, retention_months=12, drop=drop)
+    assert res == {"created": [], "expired": ["audit_logs_2024_01", "audit_logs_2024_02"], "dropped": drop}
+    assert cur.execute.call_args[0] == (
+        "select audit.expire_partitions(make_interval(months => %s), %s)", (12, drop),
+    )
+
+
+def test_report(mock_pool, monkeypatch):
+    rows = [{"partition": "audit_logs_2026_01", "bounds": "FOR VALUES FROM ('2026-01-01') TO ('2026-02-01')",
+             "row_estimate": 10, "table_bytes": 8192, "index_bytes": 16384, "total_bytes": 24576}]
+    pool, cur = mock_pool(fetchall=rows)
+    monkeypatch.setattr(p, "pool", pool)
+    assert p.report() == rows
+    assert cur.execute.call_args[0] == ("select * from audit.partition_report()",)
+
+
+def test_cli_report_only(mock_pool, monkeypatch, capsys):
+    pool, cur = mock_pool(fetchall=[{"partition": "audit_logs_2026_01", "bounds": "b", "row_estimate": 3,
+                                     "table_bytes": 2048, "index_bytes": 0, "total_bytes": 5 * 1024 ** 3}])
+    monkeypatch.setattr(p, "pool", pool)
+    monkeypatch.setattr(sys, "argv", ["app.partitions", "--report-only"])
+    assert p.main() == 0
+    out = capsys.readouterr().out
+    assert "audit_logs_2026_01" in out and "2KiB" in out and "5GiB" in out
+    assert cur.execute.call_count == 1  # no ensure/expire
+
+
+def test_maintainer_survives_failures(monkeypatch):
+    calls = []
+    m = p.PartitionMaintainer(interval=0.01)
+
+    def failing():
+        calls.append(1)
+        if len(calls) >= 2:
+            m._stop.set()
+        raise RuntimeError("db down")
+    monkeypatch.setattr(p, "maintain", failing)
+    m._run()
+    assert len(calls) == 2
+
+
+def test_expire_keeps_partitions_without_upper_bound(pg):
+    """74_audit_partition_maint.sql: a MAXVALUE partition is never expired."""
+    try:
+        with pg.transaction():
+            pg.execute("create table audit.audit_logs_test_tail partition of audit.audit_logs "
+                       "for values from ('2999-01-01') to (maxvalue)")
+            expired = [r[0] for r in pg.execute(
+                "select audit.expire_partitions(interval '0 days', false)").fetchall()]
+            assert "audit_logs_test_tail" not in expired
+            raise psycopg.Rollback()
+    except psycopg.errors.InsufficientPrivilege as e:
+        pytest.skip(f"needs the audit schema owner: {e}")
@@ -0,0 +1,82 @@
+# python
+import hashlib
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as m
+from app import queries as Q
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+ACTOR = "11111111-1111-1111-1111-111111111111"
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    m.CONFIG_CACHE.clear()
+    yield
+    m.CONFIG_CACHE.clear()
+
+
+def put(pool, value, headers, durable=True):
+    with patch("app.main.pool", pool), patch("app.main.AUDIT_DURABLE", durable), \
+            patch("app.main.audit_sink") as sink:
+        r = TestClient(m.app).post("/config/a/p", json={"value": value}, headers={**headers, "X-Actor-Id": ACTOR})
+    return r, sink
+
+
+def test_one_statement_pipelined_with_commit(mock_pool, headers):
+    pool, cur = mock_pool(fetchone=[{"version": 2, "created_at": NOW, "changed": True}])
+    conn = pool.connection.return_value.__enter__.return_value
+    calls = MagicMock()
+    calls.attach_mock(conn.pipeline.return_value.__enter__, "pipeline_enter")
+    calls.attach_mock(cur.execute, "execute")
+    calls.attach_mock(conn.commit, "commit")
+    calls.attach_mock(conn.pipeline.return_value.__exit__, "pipeline_exit")
+    calls.attach_mock(cur.fetchone, "fetchone")
+    r, _ = put(pool, {"b": [1, 2], "a": "x"}, headers)
+    assert r.status_code == 201, r.text
+    # BEGIN + put_config + COMMIT go out together; the row is read after the sync
+    assert [c[0] for c in calls.mock_calls] == ["pipeline_enter", "execute", "commit", "pipeline_exit", "fetchone"]
+    canon = b'{"a":"x","b":[1,2]}'
+    assert cur.execute.call_args[0] == (Q.CONFIG_PUT, ("a/p", canon.decode(), hashlib.sha256(canon).digest(),
+                                                       ACTOR, "api_key", True))
+    assert r.json() == {"path": "a/p", "version": 2, "value": {"a": "x", "b": [1, 2]}, "created_at": NOW.isoformat()}
+    assert r.headers["etag"] == m.config_etag(hashlib.sha256(canon).digest())
+
+
+@pytest.mark.parametrize("durable", [True, False])
+def test_changed_invalidates_and_audits_once(mock_pool, headers, durable):
+    m.CONFIG_CACHE.put("a/p", ("old", {"version": 1}, b"{}"))
+    pool, cur = mock_pool(fetchone=[{"version": 2, "created_at": NOW, "changed": True}])
+    r, sink = put(pool, {"a": 1}, headers, durable)
+    # Durable: the function writes the audit row in the same transaction
+    assert cur.execute.call_args[0][1][-1] is durable
+    assert sink.emit.called is not durable
+    if not durable:
+        assert sink.emit.call_args[0][2:] == ("config.put", "a/p", {"version": 2})
+    assert m.CONFIG_CACHE.get("a/p") is None
+
+
+@pytest.mark.parametrize("durable", [True, False])
+def test_unchanged_value_keeps_cache_and_skips_audit(mock_pool, headers, durable):
+    m.CONFIG_CACHE.put("a/p", ("etag", {"version": 2}, b"{}"))
+    pool, cur = mock_pool(fetchone=[{"version": 2, "created_at": NOW, "changed": False}])
+    r, sink = put(pool, {"a": 1}, headers, durable)
+    assert r.status_code == 201 and r.json()["version"] == 2
+    assert not sink.emit.called and m.CONFIG_CACHE.get("a/p") is not None
+
+
+def test_put_config_function_is_idempotent(pg):
+    """core.put_config (73_put_config_fn.sql): same checksum -> same version, changed=false."""
+    path = f"test/put/{uuid.uuid4().hex}"
+    canon = b'{"a":1}'
+    params = (path, canon.decode(), hashlib.sha256(canon).digest(), ACTOR, "test", False)
+    first = pg.execute(Q.CONFIG_PUT, params).fetchone()
+    again = pg.execute(Q.CONFIG_PUT, params).fetchone()
+    assert first[2] is True and again[2] is False and again[0] == first[0]
+    audited = pg.execute("select count(*) from audit.audit_logs where path = %s", (path,)).fetchone()[0]
+    assert audited == 0  # p_audit=false: the async sink writes it instead
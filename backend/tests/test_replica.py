@@ -0,0 +1,138 @@
+# python
+import time
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as m
+from app.auth import AuthPrincipal
+from app.crypto import seal, LEGACY_ALG
+from app.replica import ReplicaRouter
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def healthy_router(replica, window=5):
+    r = ReplicaRouter(replica=replica, max_lag=2, interval=1, window=window)
+    r.lag, r.checked_at = 0.1, time.monotonic()
+    return r
+
+
+def config_row(v):
+    return {"version": v, "value_json": {"v": v}, "checksum": bytes([v]), "created_at": NOW}
+
+
+def secret_row(path, v):
+    nonce, ct = seal(b'{"v":%d}' % v, aad=f"{path}|{v}".encode())
+    return {"version": v, "ciphertext": ct, "nonce": nonce, "alg": LEGACY_ALG, "created_at": NOW}
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    m.CONFIG_CACHE.clear()
+    m.SECRET_CACHE.clear()
+    yield
+    m.CONFIG_CACHE.clear()
+    m.SECRET_CACHE.clear()
+
+
+# ---------- ReplicaRouter ----------
+def test_disabled_without_replica():
+    r = ReplicaRouter(replica=None)
+    assert not r.enabled and not r.use_replica(AuthPrincipal(id="u"))
+    r.note_write(AuthPrincipal(id="u"), "config", "x", 3)
+    assert r.floor("config", "x") == 0
+
+
+def test_lag_and_stale_measurement_fall_back():
+    r = healthy_router(MagicMock())
+    p = AuthPrincipal(id="u")
+    assert r.use_replica(p)
+    r.lag = 10
+    assert not r.use_replica(p)
+    r.lag, r.checked_at = 0.1, time.monotonic() - 10  # no measurement for 3 intervals
+    assert not r.use_replica(p)
+    r.lag = None  # last check failed
+    assert not r.use_replica(p)
+    assert r.fallbacks["lag"] == 3 and r.reads == {"replica": 1, "primary": 3}
+
+
+def test_check_records_lag_and_errors(mock_pool):
+    pool, cur = mock_pool(fetchone=[(0.5,)])
+    r = ReplicaRouter(replica=pool, max_lag=2, interval=1)
+    assert r.check() == 0.5 and r.healthy()
+    pool.connection.side_effect = OSError("connection refused")
+    assert r.check() is None and not r.healthy() and "refused" in r.stats()["error"]
+
+
+def test_read_your_writes_floors():
+    r = healthy_router(MagicMock())
+    writer, other = AuthPrincipal(id="u1"), AuthPrincipal(id="u2")
+    r.note_write(writer, "config", "x", 3)
+    assert not r.use_replica(writer) and r.use_replica(other)
+    assert r.fallbacks["writer"] == 1
+    # Everyone gets the floor: a replica row older than v3 is re-read on the primary
+    assert r.floor("config", "x") == 3 and r.floor("config", "x", 5) == 5 and r.floor("secret", "x") == 0
+    assert not r.accept(2, 3) and not r.accept(None, 0) and r.accept(3, 3)
+    assert r.fallbacks["stale"] == 2
+
+
+def test_read_your_writes_window_off():
+    r = healthy_router(MagicMock(), window=0)
+    p = AuthPrincipal(id="u1")
+    r.note_write(p, "config", "x", 3)
+    assert r.use_replica(p) and r.floor("config", "x") == 3
+
+
+def test_notify_raises_floor_only_forward():
+    r = healthy_router(MagicMock())
+    r.note_version("config", "x", 4)
+    r.note_version("config", "x", 2)
+    r.note_version("*", None, None)
+    assert r.floor("config", "x") == 4
+
+
+# ---------- Handlers ----------
+def test_config_reads_route_to_replica_then_primary(mock_pool, headers):
+    rp, rcur = mock_pool(fetchone=[config_row(1), config_row(1), config_row(1)])
+    pp, pcur = mock_pool(fetchone=[config_row(2), config_row(2), config_row(2)])
+    r = healthy_router(rp)
+    c = TestClient(m.app)
+    with patch("app.main.pool", pp), patch("app.main.replica_pool", rp), patch("app.main.replicas", r):
+        assert c.get("/config/a/r", headers=headers).json()["version"] == 1
+        assert pcur.execute.call_count == 0
+        m.CONFIG_CACHE.clear()
+        # ?min_version the replica has not reached: re-read on the primary
+        assert c.get("/config/a/r?min_version=2", headers=headers).json()["version"] == 2
+        m.CONFIG_CACHE.clear()
+        # NOTIFY of v2: the replica's v1 is stale
+        r.note_version("config", "a/r", 2)
+        assert c.get("/config/a/r", headers=headers).json()["version"] == 2
+        assert r.fallbacks["stale"] == 2
+        m.CONFIG_CACHE.clear()
+        r.lag = 10
+        assert c.get("/config/a/r", headers=headers).json()["version"] == 2
+    assert r.fallbacks["lag"] == 1 and rcur.execute.call_count == 3
+
+
+def test_secret_explicit_version_missing_on_replica(mock_pool, headers):
+    rp, rcur = mock_pool(fetchone=[None])
+    pp, pcur = mock_pool(fetchone=[secret_row("s/p", 4)])
+    r = healthy_router(rp)
+    with patch("app.main.pool", pp), patch("app.main.replica_pool", rp), patch("app.main.replicas", r):
+        resp = TestClient(m.app).get("/secret/s/p?version=4", headers=headers)
+    assert resp.status_code == 200 and resp.json()["value"] == {"v": 4}
+    assert r.fallbacks["stale"] == 1 and pcur.execute.call_count == 1
+
+
+def test_writer_reads_own_write_from_primary(mock_pool, headers):
+    rp, rcur = mock_pool()
+    pp, pcur = mock_pool(fetchone=[{"version": 5, "created_at": NOW, "changed": True}, config_row(5)])
+    r = healthy_router(rp)
+    c = TestClient(m.app)
+    with patch("app.main.pool", pp), patch("app.main.replica_pool", rp), patch("app.main.replicas", r):
+        assert c.post("/config/a/w", json={"value": {"v": 5}}, headers=headers).status_code == 201
+        assert c.get("/config/a/w", headers=headers).json()["version"] == 5
+    assert rcur.execute.call_count == 0 and r.fallbacks["writer"] == 1
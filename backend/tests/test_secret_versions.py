@@ -0,0 +1,91 @@
+# python
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as m
+from app import queries as Q
+from app.crypto import seal, LEGACY_ALG
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+ACTOR = "11111111-1111-1111-1111-111111111111"
+
+
+def version_rows(path="s/v", versions=(3, 2, 1), aad_for=None):
+    """SECRET_VERSIONS_PAGE_VALUES rows; `aad_for` overrides the AAD of one version."""
+    out = []
+    for v in versions:
+        aad = f"{path}|{aad_for[1] if aad_for and aad_for[0] == v else v}".encode()
+        nonce, ct = seal(b'{"v":%d}' % v, aad=aad)
+        out.append({"version": v, "is_current": v == versions[0], "alg": LEGACY_ALG, "created_at": NOW,
+                    "created_by": ACTOR, "ciphertext": ct, "nonce": nonce})
+    return out
+
+
+@pytest.fixture(autouse=True)
+def secret_cache(monkeypatch):
+    monkeypatch.setattr(m.SECRET_CACHE, "max_size", 1 << 20)
+    m.SECRET_CACHE.clear()
+    yield
+    m.SECRET_CACHE.clear()
+
+
+def test_metadata_page(mock_pool, headers):
+    pool, cur = mock_pool(fetchone=[{"id": 7}], fetchall=version_rows())
+    with patch("app.main.pool", pool), patch("app.main.audit_sink") as sink:
+        r = TestClient(m.app).get("/secret/s/v:versions?limit=3", headers=headers)
+    body = r.json()
+    assert [x["version"] for x in body["versions"]] == [3, 2, 1] and body["next_before"] == 1
+    assert "value" not in body["versions"][0]
+    assert cur.execute.call_args[0] == (Q.SECRET_VERSIONS_PAGE, (7, 2**31 - 1, 3))
+    assert not sink.emit.called
+
+
+def test_secret_named_versions_is_readable(mock_pool, headers):
+    nonce, ct = seal(b'{"ok":1}', aad=b"s/versions|1")
+    pool, cur = mock_pool(fetchone=[{"version": 1, "ciphertext": ct, "nonce": nonce, "alg": LEGACY_ALG,
+                                     "created_at": NOW}])
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/secret/s/versions", headers=headers)
+    assert r.status_code == 200 and r.json()["value"] == {"ok": 1}
+
+
+def test_values_bulk_decrypt_cache_and_audit(mock_pool, headers, monkeypatch):
+    monkeypatch.setattr("app.crypto.CRYPTO_PARALLEL_MIN", 2)  # exercise the executor path
+    m.SECRET_CACHE.put(("s/v", 2), (2, NOW.isoformat(), b'{"v":2}'))
+    rows = version_rows()
+    rows[1]["ciphertext"] = b"not decrypted: answered from the cache"
+    pool, cur = mock_pool(fetchone=[{"id": 7}], fetchall=rows)
+    with patch("app.main.pool", pool), patch("app.main.audit_sink") as sink:
+        r = TestClient(m.app).get("/secret/s/v:versions?values=true&before=4", headers={**headers, "X-Actor-Id": ACTOR})
+    assert r.status_code == 200, r.text
+    assert [x["value"] for x in r.json()["versions"]] == [{"v": 3}, {"v": 2}, {"v": 1}]
+    assert cur.execute.call_args[0] == (Q.SECRET_VERSIONS_PAGE_VALUES, (7, 4, 50))
+    assert m.SECRET_CACHE.get(("s/v", 1))[2] == b'{"v":1}'
+    assert sink.emit.call_count == 1
+    assert sink.emit.call_args[0][2:] == ("secret.versions_get", "s/v", {"versions": [3, 2, 1]})
+
+
+def test_values_page_capped(mock_pool, headers, monkeypatch):
+    monkeypatch.setattr(m, "SECRET_BULK_MAX", 2)
+    pool, cur = mock_pool(fetchone=[{"id": 7}], fetchall=version_rows(versions=(3, 2)))
+    with patch("app.main.pool", pool), patch("app.main.audit_sink"):
+        r = TestClient(m.app).get("/secret/s/v:versions?values=true&limit=50", headers=headers)
+    assert cur.execute.call_args[0][1][2] == 2 and r.json()["next_before"] == 2
+
+
+def test_ciphertext_moved_to_another_version_fails_aad(mock_pool, headers):
+    # Version 1 holds a ciphertext sealed for s/v|9: rejected, not served
+    pool, cur = mock_pool(fetchone=[{"id": 7}], fetchall=version_rows(aad_for=(1, 9)))
+    with patch("app.main.pool", pool), patch("app.main.audit_sink") as sink:
+        r = TestClient(m.app).get("/secret/s/v:versions?values=true", headers=headers)
+    assert r.status_code == 500 and r.json()["detail"] == "Secret decryption failed"
+    assert m.SECRET_CACHE.get(("s/v", 1)) is None and not sink.emit.called
+
+
+def test_unknown_secret(mock_pool, headers):
+    pool, cur = mock_pool(fetchone=[None])
+    with patch("app.main.pool", pool):
+        assert TestClient(m.app).get("/secret/nope:versions", headers=headers).status_code == 404
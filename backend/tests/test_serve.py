@@ -0,0 +1,108 @@
+# python
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+from app import db, metrics, serve
+
+
+@pytest.mark.parametrize("budget, workers, pools, cap, expected", [
+    (25, 3, 1, None, (3, 7)),    # 3 x (7 + LISTEN) = 24
+    (25, 3, 2, None, (3, 3)),    # async app: sync + async pool, 3 x (2 x 3 + 1) = 21
+    (100, 2, 1, 10, (2, 10)),    # DB_POOL_MAX caps what the budget would allow
+    (4, 8, 1, None, (2, 1)),     # too many workers: drop to what fits
+    (2, 1, 1, None, (1, 1)),     # exactly one worker's needs
+])
+def test_plan_pools(budget, workers, pools, cap, expected):
+    assert serve.plan_pools(budget, workers, pools, cap) == expected
+
+
+def test_plan_pools_never_exceeds_budget():
+    for budget in range(2, 120):
+        for workers in range(1, 17):
+            for pools in (1, 2):
+                if budget < pools + serve.DEDICATED_PER_WORKER:
+                    continue
+                w, size = serve.plan_pools(budget, workers, pools)
+                assert 1 <= w <= workers and size >= 1
+                assert w * (pools * size + serve.DEDICATED_PER_WORKER) <= budget
+
+
+def test_plan_pools_budget_below_one_worker():
+    with pytest.raises(SystemExit):
+        serve.plan_pools(1, 1, 1)
+    with pytest.raises(SystemExit):
+        serve.plan_pools(2, 4, 2)
+
+
+def test_default_workers_follows_cpu_quota(monkeypatch):
+    monkeypatch.setattr(serve.os, "sched_getaffinity", lambda pid: set(range(8)))
+    monkeypatch.setattr(serve, "cpu_quota", lambda: 1.5)
+    assert serve.default_workers() == 2
+    monkeypatch.setattr(serve, "cpu_quota", lambda: None)
+    assert serve.default_workers() == 8
+
+
+def test_connection_budget(monkeypatch):
+    monkeypatch.setattr(serve, "DB_CONNECTION_BUDGET", 40)
+    assert serve.connection_budget() == 40
+    monkeypatch.setattr(serve, "DB_CONNECTION_BUDGET", 0)
+    conn = MagicMock()
+    conn.__enter__.return_value.execute.return_value.fetchone.return_value = (97,)
+    monkeypatch.setattr(serve.db, "connect", lambda: conn)
+    assert serve.connection_budget() == 97 - serve.DB_RESERVED_CONNECTIONS
+
+    def refuse():
+        raise OSError("connection refused")
+    monkeypatch.setattr(serve.db, "connect", refuse)
+    assert serve.connection_budget() is None
+
+
+def test_main_sizes_workers_and_pools(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["app.serve", "--workers", "8"])
+    monkeypatch.setattr(serve, "import_from_string", lambda s: "asgi-app")
+    monkeypatch.setattr(serve, "POOLS", {"primary": None, "primary_async": None, "replica": None})
+    monkeypatch.setattr(serve, "connection_budget", lambda: 20)
+    monkeypatch.setattr(serve, "bind", lambda host, port: "sock")
+    monkeypatch.setattr(serve, "Supervisor", MagicMock())
+    monkeypatch.setattr(db, "POOL_MAX_OVERRIDE", None)
+    monkeypatch.delenv("DB_POOL_MAX", raising=False)
+    monkeypatch.setattr(metrics, "MULTIPROCESS_DIR", None)
+    serve.main()
+    # 2 primary pools + LISTEN = 3 per worker: only 6 of 8 workers fit in 20
+    serve.Supervisor.assert_called_once_with("asgi-app", "sock", 6)
+    assert db.POOL_MAX_OVERRIDE == 1
+    # Workers got a shared metrics directory, removed once they are gone
+    assert metrics.MULTIPROCESS_DIR and not os.path.exists(metrics.MULTIPROCESS_DIR)
+
+
+def test_metrics_dir_drops_previous_samples(tmp_path):
+    (tmp_path / "123.json").write_text("[]")
+    (tmp_path / "archive.json").write_text("{}")
+    (tmp_path / "keep.txt").write_text("")
+    assert serve.metrics_dir(str(tmp_path)) == str(tmp_path)
+    assert [p.name for p in tmp_path.iterdir()] == ["keep.txt"]
+
+
+def test_reaped_worker_is_archived(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "MULTIPROCESS_DIR", str(tmp_path))
+    archived = []
+    monkeypatch.setattr(metrics, "archive_worker", lambda d, pid: archived.append((d, pid)))
+    monkeypatch.setattr(serve.os, "waitpid", MagicMock(side_effect=[(42, 0), (0, 0)]))
+    sup = serve.Supervisor("app", MagicMock(), 1)
+    sup.children[42] = 0.0
+    sup.reap()
+    assert archived == [(str(tmp_path), 42)] and not sup.children
+
+
+def test_override_applied_when_pool_opens(monkeypatch):
+    from psycopg_pool import ConnectionPool
+    p = ConnectionPool("host=127.0.0.1 port=1 connect_timeout=1", min_size=2, max_size=10, open=False)
+    monkeypatch.setattr(db, "POOL_MAX_OVERRIDE", 1)
+    try:
+        db.warm_pool(p, timeout=0.1)
+        assert (p.min_size, p.max_size) == (1, 1)
+    finally:
+        p.close()
@@ -0,0 +1,101 @@
+# python
+import logging
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as m
+from app import timing
+from app.crypto import seal, LEGACY_ALG
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def secret_pool(mock_pool):
+    nonce, ct = seal(b'{"p":"x"}', aad=b"s/t|3")
+    return mock_pool(fetchone=[{"version": 3, "ciphertext": ct, "nonce": nonce, "alg": LEGACY_ALG,
+                                "created_at": NOW}])
+
+
+@pytest.fixture(autouse=True)
+def quiet(monkeypatch):
+    monkeypatch.setattr(timing, "SERVER_TIMING", False)
+    monkeypatch.setattr(timing, "SLOW_REQUEST_MS", 0.0)
+    monkeypatch.setattr(timing, "PROFILE_SAMPLE", 0.0)
+    monkeypatch.setattr(m.SECRET_CACHE, "max_size", 0)
+
+
+def test_spans_accumulate():
+    t = timing.RequestTimings()
+    token = timing._current.set(t)
+    try:
+        timing.add("db", 0.002)
+        timing.add("db", 0.001)
+        with timing.span("crypto"):
+            pass
+    finally:
+        timing._current.reset(token)
+    assert t.spans["db"] == [pytest.approx(0.003), 2] and t.spans["crypto"][1] == 1
+
+
+def test_noop_outside_request():
+    timing.add("db", 1.0)
+    with timing.span("x"):
+        pass
+    assert timing._current.get() is None
+
+
+def test_server_timing_format():
+    value = timing.server_timing({"pool": [0.0001, 1], "db": [0.0032, 2]}, 0.0049)
+    assert value == "pool;dur=0.10, db;dur=3.20, total;dur=4.90"
+
+
+def test_header_off_by_default(secret_pool, headers):
+    pool, cur = secret_pool
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/secret/s/t", headers=headers)
+    assert r.status_code == 200 and "server-timing" not in r.headers
+
+
+def test_header_breaks_down_request(secret_pool, headers, monkeypatch):
+    monkeypatch.setattr(timing, "SERVER_TIMING", True)
+    pool, cur = secret_pool
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/secret/s/t", headers=headers)
+    assert r.status_code == 200, r.text
+    names = [p.split(";")[0] for p in r.headers["server-timing"].split(", ")]
+    assert "crypto" in names and "encode" in names and names[-1] == "total"
+
+
+def test_slow_request_logged_with_spans(secret_pool, headers, monkeypatch, caplog):
+    monkeypatch.setattr(timing, "SLOW_REQUEST_MS", 0.0001)
+    pool, cur = secret_pool
+    caplog.set_level(logging.WARNING, logger="app.slow")
+    with patch("app.main.pool", pool):
+        assert TestClient(m.app).get("/secret/s/t", headers=headers).status_code == 200
+    slow = [x for x in caplog.records if x.name == "app.slow"]
+    assert len(slow) == 1 and slow[0].levelno == logging.WARNING
+    assert slow[0].route == "/secret/{path:path}" and slow[0].status == 200
+    assert "crypto" in slow[0].spans and slow[0].spans["crypto"]["n"] >= 1
+
+
+def test_fast_request_not_logged(secret_pool, headers, monkeypatch, caplog):
+    monkeypatch.setattr(timing, "SLOW_REQUEST_MS", 60_000.0)
+    pool, cur = secret_pool
+    caplog.set_level(logging.WARNING, logger="app.slow")
+    with patch("app.main.pool", pool):
+        TestClient(m.app).get("/secret/s/t", headers=headers)
+    assert not [x for x in caplog.records if x.name == "app.slow"]
+
+
+def test_sampled_request_logs_profile(secret_pool, headers, monkeypatch, caplog):
+    monkeypatch.setattr(timing, "PROFILE_SAMPLE", 1.0)
+    pool, cur = secret_pool
+    caplog.set_level(logging.INFO, logger="app.profile")
+    with patch("app.main.pool", pool):
+        TestClient(m.app).get("/secret/s/t", headers=headers)
+    prof = [x for x in caplog.records if x.name == "app.profile"]
+    assert len(prof) == 1 and isinstance(prof[0].profile, list)
@@ -0,0 +1,107 @@
+# python
+import threading
+import time
+import uuid
+
+import bcrypt
+import pytest
+from fastapi.testclient import TestClient
+
+import app.auth as auth
+import app.main as m
+import app.tokens as tokens
+from app.audit import AuditSink
+
+SIGNING_KEY = "s" * 32
+CLIENT_UUID = uuid.uuid4()
+
+
+@pytest.fixture
+def bearer(monkeypatch, mock_pool):
+    """AUTH_TYPE=BEARER with an HS256 key; api_clients has one client "c1" with secret "pw"."""
+    monkeypatch.setattr(m, "AUTH_TYPE", "BEARER")
+    for mod in (auth, tokens):
+        monkeypatch.setattr(mod, "JWT_ALGS", ["HS256"])
+        monkeypatch.setattr(mod, "ISSUER", "iss")
+    monkeypatch.setattr(tokens, "JWT_SIGNING_KEY", SIGNING_KEY)
+    monkeypatch.setattr(auth, "key_provider", auth.KeyProvider(static_key=SIGNING_KEY))
+    row = {"id": CLIENT_UUID, "client_id": "c1",
+           "client_secret_hash": bcrypt.hashpw(b"pw", bcrypt.gensalt(4)).decode()}
+    pool, cur = mock_pool()
+    cur.fetchone.side_effect = None
+    cur.fetchone.return_value = row
+    monkeypatch.setattr(tokens, "pool", pool)
+    sink = AuditSink()
+    monkeypatch.setattr(m, "audit_sink", sink)
+    tokens.CLIENT_CACHE.clear()
+    tokens.VERIFY_CACHE.clear()
+    yield cur, sink
+    tokens.CLIENT_CACHE.clear()
+    tokens.VERIFY_CACHE.clear()
+
+
+def post_token(c, secret="pw"):
+    return c.post("/token", json={"client_id": "c1", "client_secret": secret})
+
+
+def test_issued_token_is_accepted(bearer):
+    cur, sink = bearer
+    r = post_token(TestClient(m.app))
+    assert r.status_code == 200, r.text
+    assert r.json()["expires_in"] == tokens.TOKEN_TTL
+    principal = auth.require_bearer(f"Bearer {r.json()['access_token']}")
+    assert principal.id == str(CLIENT_UUID) and not principal.api_key
+    assert sink.enqueued == 1
+
+
+def test_bad_secret_and_unknown_client(bearer):
+    cur, _ = bearer
+    c = TestClient(m.app)
+    assert post_token(c, "bad").status_code == 401
+    cur.fetchone.return_value = None
+    assert c.post("/token", json={"client_id": "nobody", "client_secret": "pw"}).status_code == 401
+
+
+def test_verified_secret_and_client_row_are_cached(bearer):
+    cur, _ = bearer
+    c = TestClient(m.app)
+    hits = tokens.VERIFY_CACHE.hits
+    assert post_token(c).status_code == 200 and post_token(c).status_code == 200
+    assert cur.execute.call_count == 1 and tokens.VERIFY_CACHE.hits == hits + 1
+
+
+def test_client_change_invalidates_cache(bearer):
+    cur, _ = bearer
+    c = TestClient(m.app)
+    post_token(c)
+    tokens.on_change("client", "c1", None)
+    post_token(c)
+    assert cur.execute.call_count == 2
+    # Rotated secret: the cached verification no longer matches the new hash
+    cur.fetchone.return_value = {**cur.fetchone.return_value,
+                                 "client_secret_hash": bcrypt.hashpw(b"new", bcrypt.gensalt(4)).decode()}
+    tokens.on_change("*", None, None)
+    assert post_token(c).status_code == 401 and post_token(c, "new").status_code == 200
+
+
+def test_bcrypt_backpressure_is_503(bearer, monkeypatch):
+    monkeypatch.setattr(tokens, "_pending", threading.BoundedSemaphore(1))
+    tokens._pending.acquire()
+    assert post_token(TestClient(m.app)).status_code == 503
+
+
+def test_full_audit_queue_does_not_block_the_loop(bearer, monkeypatch):
+    sink = AuditSink(max_queue=1, overflow="block", block_timeout=5)
+    sink.emit("a", "s", "x", "p", {})
+    monkeypatch.setattr(m, "audit_sink", sink)
+    t0 = time.monotonic()
+    assert post_token(TestClient(m.app)).status_code == 200
+    assert time.monotonic() - t0 < 2 and sink.dropped == 1
+
+
+def test_emit_block_false_never_waits():
+    sink = AuditSink(max_queue=1, overflow="block", block_timeout=5)
+    assert sink.emit("a", "s", "x", "p", {})
+    t0 = time.monotonic()
+    assert not sink.emit("a", "s", "x", "p", {}, block=False)
+    assert time.monotonic() - t0 < 1
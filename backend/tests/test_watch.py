@@ -0,0 +1,73 @@
+# python
+import threading
+import time
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import app.main as m
+from app.watch import WatchHub
+
+
+def publish_when_parked(*events):
+    """Publish `events` from another thread (like the ChangeListener) once a waiter is parked."""
+    def run():
+        deadline = time.monotonic() + 5
+        while not len(m.hub) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for e in events:
+            m.hub.publish(*e)
+    t = threading.Thread(target=run)
+    t.start()
+    return t
+
+
+def test_wakes_on_matching_change_only(headers):
+    t = publish_when_parked(
+        ("config", "app/other", 5),
+        ("secret", "app/prod/x", 5),
+        ("config", "app/prod/x", 5),
+    )
+    r = TestClient(m.app).get("/watch?prefix=app/prod/&timeout=5", headers=headers)
+    t.join()
+    assert r.json() == {"changes": [{"kind": "config", "path": "app/prod/x", "version": 5}], "reset": False}
+    assert len(m.hub) == 0
+
+
+def test_timeout_returns_empty(headers):
+    t0 = time.monotonic()
+    r = TestClient(m.app).get("/watch?prefix=app/&timeout=0.2", headers=headers)
+    assert r.json() == {"changes": [], "reset": False}
+    assert 0.2 <= time.monotonic() - t0 < 2
+    assert len(m.hub) == 0
+
+
+def test_listener_reconnect_resets(headers):
+    t = publish_when_parked(("*", None, None))
+    r = TestClient(m.app).get("/watch?prefix=app/&timeout=5", headers=headers)
+    t.join()
+    assert r.json() == {"changes": [], "reset": True}
+
+
+def test_catch_up_returns_without_parking(mock_pool, headers):
+    pool, cur = mock_pool(fetchall=[{"path": "app/a", "version": 3}])
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/watch?prefix=app/&since_version=2&timeout=5", headers=headers)
+    assert r.json() == {"changes": [{"kind": "config", "path": "app/a", "version": 3}], "reset": False}
+    assert cur.execute.call_args[0][1] == ("app/", "app/\x7f", 2, m.WATCH_MAX_EVENTS)
+    assert len(m.hub) == 0
+
+
+def test_catch_up_empty_then_waits_for_newer_version(mock_pool, headers):
+    pool, cur = mock_pool(fetchall=[])
+    t = publish_when_parked(("secret", "app/a", 2), ("secret", "app/a", 3))
+    with patch("app.main.pool", pool):
+        r = TestClient(m.app).get("/watch?kind=secret&prefix=app/&since_version=2&timeout=5", headers=headers)
+    t.join()
+    assert r.json()["changes"] == [{"kind": "secret", "path": "app/a", "version": 3}]
+
+
+def test_too_many_watchers(headers, monkeypatch):
+    monkeypatch.setattr(m, "hub", WatchHub(max_waiters=0))
+    r = TestClient(m.app).get("/watch?timeout=0", headers=headers)
+    assert r.status_code == 503
@@ -0,0 +1,35 @@
+-- 70_change_notify.sql
+-- Purpose: publish committed CONFIG and SECRET changes on channel 'confmgr_changes'
+-- so every backend replica can invalidate its in-process read caches.
+-- Payload: {"kind": "config"|"secret", "path": "<path>", "version": <int>}
+-- NOTIFY is transactional: listeners only see it after the writer commits.
+
+create or replace function core.fn_notify_change()
+returns trigger language plpgsql as $$
+declare
+  v_kind text := tg_argv[0];
+  v_path text;
+begin
+  if v_kind = 'config' then
+    select path into v_path from core.config_items where id = new.item_id;
+  elsif v_kind = 'secret' then
+    select path into v_path from core.secret_items where id = new.item_id;
+  end if;
+
+  perform pg_notify(
+    'confmgr_changes',
+    json_build_object('kind', v_kind, 'path', v_path, 'version', new.version)::text
+  );
+  return null;
+end
+$$;
+
+drop trigger if exists trg_config_versions_notify on core.config_versions;
+create trigger trg_config_versions_notify
+after insert on core.config_versions
+for each row execute function core.fn_notify_change('config');
+
+drop trigger if exists trg_secret_versions_notify on core.secret_versions;
+create trigger trg_secret_versions_notify
+after insert on core.secret_versions
+for each row execute function core.fn_notify_change('secret');
@@ -0,0 +1,12 @@
+-- 71_prefix_indexes.sql
+-- Purpose: make subtree listing (GET /config?prefix=..., GET /secret?prefix=...)
+-- an index range scan. The existing path indexes use the database collation,
+-- which cannot serve prefix ranges; a "C"-collated index is the equivalent of
+-- text_pattern_ops but also works for plain >=/< range predicates and
+-- ORDER BY, so generic (prepared) plans keep using it.
+
+create index if not exists ix_config_items_path_c
+  on core.config_items (path collate "C");
+
+create index if not exists ix_secret_items_path_c
+  on core.secret_items (path collate "C");
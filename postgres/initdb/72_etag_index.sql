@@ -0,0 +1,13 @@
+-- 72_etag_index.sql
+-- Purpose: answer If-None-Match revalidation of GET /config/{path} with an
+-- index-only scan. The current-version checksum is covered by the index, so
+-- the heap (and the TOASTed value_json) is never read for a 304.
+
+create index if not exists ix_config_versions_current_etag
+  on core.config_versions (item_id) include (checksum)
+  where is_current;
+
+-- Same for GET /secret/{path}: the current version number is all a 304 needs.
+create index if not exists ix_secret_versions_current_ver
+  on core.secret_versions (item_id) include (version)
+  where is_current;
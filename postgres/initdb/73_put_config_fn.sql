@@ -0,0 +1,60 @@
+-- 73_put_config_fn.sql
+-- Purpose: fold the PUT /config write path into one statement.
+-- Previously: upsert item, select current checksum, insert version, log_event,
+-- commit = 4-5 round trips. The backend now sends BEGIN + this call + COMMIT in
+-- a single pipelined round trip. Checksum idempotency and the audit event stay
+-- in the caller's transaction. p_audit=false skips the inline audit row when
+-- the backend runs with AUDIT_MODE=async (the event goes through the COPY sink).
+
+create or replace function core.put_config(
+  p_path          text,
+  p_value         jsonb,
+  p_checksum      bytea,
+  p_created_by    uuid,
+  p_actor_subject text,
+  p_audit         boolean default true
+) returns table(new_version int, new_created_at timestamptz, changed boolean)
+language plpgsql
+as $$
+declare
+  v_item_id bigint;
+  v_cur     record;
+begin
+  insert into core.config_items(path, created_by)
+  values (p_path, p_created_by)
+  on conflict (path) do nothing;
+
+  -- Lock the parent row: serializes concurrent writers of the same path
+  select id into v_item_id
+    from core.config_items
+   where path = p_path
+     for update;
+
+  -- Idempotency: same checksum as current -> no new version, no audit event
+  select cv.version, cv.checksum, cv.created_at into v_cur
+    from core.config_versions cv
+   where cv.item_id = v_item_id and cv.is_current;
+  if found and v_cur.checksum = p_checksum then
+    return query select v_cur.version, v_cur.created_at, false;
+    return;
+  end if;
+
+  -- version=null: fn_config_versions_bi assigns max+1 and flips is_current
+  insert into core.config_versions(item_id, version, is_current, value_json, checksum, created_by)
+  values (v_item_id, null, true, p_value, p_checksum, p_created_by)
+  returning version, created_at into new_version, new_created_at;
+
+  if p_audit then
+    perform audit.log_event(
+      p_created_by, p_actor_subject, 'config.put', p_path,
+      jsonb_build_object('version', new_version)
+    );
+  end if;
+
+  changed := true;
+  return next;
+end
+$$;
+
+revoke all on function core.put_config(text, jsonb, bytea, uuid, text, boolean) from public;
+grant execute on function core.put_config(text, jsonb, bytea, uuid, text, boolean) to confmgr_db;
@@ -0,0 +1,129 @@
+-- 74_audit_partition_maint.sql
+-- Purpose: keep audit.audit_logs partitions ahead of time and bounded in age.
+-- 20_audit_partitioning.sql only creates the current month at init; without
+-- maintenance every audit.log_event insert fails after month end.
+--
+-- Called by the backend (python -m app.partitions, or the background
+-- maintainer when AUDIT_PARTITION_MAINT=true). Functions are SECURITY DEFINER
+-- so the app role can run the DDL without owning the table.
+
+-- Indexes on the partitioned parent: new partitions inherit them, and the
+-- existing per-partition indexes from 20_audit_partitioning.sql are attached.
+create index if not exists idx_audit_logs_created_at on audit.audit_logs (created_at);
+create index if not exists idx_audit_logs_actor_created on audit.audit_logs (actor_id, created_at);
+create index if not exists idx_audit_logs_path_created on audit.audit_logs (path, created_at);
+
+-- Pre-create the default partition and monthly partitions for the current
+-- month plus p_months_ahead. Rows that landed in the default partition for a
+-- month being created are moved into it. Returns the partitions created.
+create or replace function audit.ensure_partitions(p_months_ahead int default 3)
+returns setof text
+language plpgsql
+security definer
+set search_path = audit, pg_catalog, pg_temp
+as $$
+declare
+  v_start date;
+  v_end   date;
+  v_name  text;
+begin
+  -- Serialize concurrent maintainers (one per backend replica)
+  perform pg_advisory_xact_lock(hashtext('audit.ensure_partitions'));
+
+  if to_regclass('audit.audit_logs_default') is null then
+    create table audit.audit_logs_default partition of audit.audit_logs default;
+    return next 'audit_logs_default';
+  end if;
+
+  for i in 0..p_months_ahead loop
+    v_start := (date_trunc('month', now()) + make_interval(months => i))::date;
+    v_end   := (v_start + interval '1 month')::date;
+    v_name  := 'audit_logs_' || to_char(v_start, 'YYYY_MM');
+    continue when to_regclass(format('audit.%I', v_name)) is not null;
+
+    -- A new range may not overlap rows already in the default partition
+    create temp table _audit_moved on commit drop as
+      select * from audit.audit_logs_default
+       where created_at >= v_start and created_at < v_end;
+    delete from audit.audit_logs_default
+     where created_at >= v_start and created_at < v_end;
+
+    execute format(
+      'create table audit.%I partition of audit.audit_logs for values from (%L) to (%L)',
+      v_name, v_start, v_end
+    );
+    insert into audit.audit_logs select * from _audit_moved;
+    drop table _audit_moved;
+
+    return next v_name;
+  end loop;
+end
+$$;
+
+-- Detach (and optionally drop) monthly partitions whose whole range is older
+-- than now() - p_retention. Returns the partitions affected.
+create or replace function audit.expire_partitions(p_retention interval, p_drop boolean default false)
+returns setof text
+language plpgsql
+security definer
+set search_path = audit, pg_catalog, pg_temp
+as $$
+declare
+  r record;
+begin
+  perform pg_advisory_xact_lock(hashtext('audit.ensure_partitions'));
+
+  for r in
+    select c.relname,
+           substring(pg_get_expr(c.relpartbound, c.oid) from 'TO \(''([^'']+)''\)')::timestamptz as range_to
+      from pg_inherits i
+      join pg_class c on c.oid = i.inhrelid
+     where i.inhparent = 'audit.audit_logs'::regclass
+       and pg_get_expr(c.relpartbound, c.oid) <> 'DEFAULT'
+  loop
+    -- No parsable upper bound (MAXVALUE, a hand-attached partition): keep it
+    continue when r.range_to is null or r.range_to > now() - p_retention;
+    execute format('alter table audit.audit_logs detach partition audit.%I', r.relname);
+    if p_drop then
+      execute format('drop table audit.%I', r.relname);
+    end if;
+    return next r.relname;
+  end loop;
+end
+$$;
+
+-- Size report of every attached partition (estimates from pg_class)
+create or replace function audit.partition_report()
+returns table(
+  partition    text,
+  bounds       text,
+  row_estimate bigint,
+  table_bytes  bigint,
+  index_bytes  bigint,
+  total_bytes  bigint
+)
+language sql
+security definer
+set search_path = audit, pg_catalog, pg_temp
+as $$
+  select c.relname::text,
+         pg_get_expr(c.relpartbound, c.oid),
+         greatest(c.reltuples, 0)::bigint,
+         pg_table_size(c.oid),
+         pg_indexes_size(c.oid),
+         pg_total_relation_size(c.oid)
+    from pg_inherits i
+    join pg_class c on c.oid = i.inhrelid
+   where i.inhparent = 'audit.audit_logs'::regclass
+   order by c.relname;
+$$;
+
+revoke all on function audit.ensure_partitions(int) from public;
+revoke all on function audit.expire_partitions(interval, boolean) from public;
+revoke all on function audit.partition_report() from public;
+grant execute on function audit.ensure_partitions(int) to confmgr_db;
+grant execute on function audit.expire_partitions(interval, boolean) to confmgr_db;
+grant execute on function audit.partition_report() to confmgr_db;
+
+-- Cover the next months right away
+select audit.ensure_partitions(3);
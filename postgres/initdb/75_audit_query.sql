@@ -0,0 +1,14 @@
+-- 75_audit_query.sql
+-- Purpose: read path for GET /audit.
+-- Keyset pagination orders by (created_at, id); path-prefix filters use a
+-- "C"-collated range (see 71_prefix_indexes.sql). Defined on the partitioned
+-- parent, so every existing and future partition gets them.
+
+create index if not exists idx_audit_logs_created_id
+  on audit.audit_logs (created_at, id);
+
+create index if not exists idx_audit_logs_path_c_created
+  on audit.audit_logs (path collate "C", created_at);
+
+-- Reads go through the parent only; partitions inherit the check
+grant select on audit.audit_logs to confmgr_db;
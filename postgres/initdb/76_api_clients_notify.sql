@@ -0,0 +1,28 @@
+-- 76_api_clients_notify.sql
+-- Purpose: let backend workers drop their cached api_clients rows as soon as
+-- a client is disabled, deleted or gets a new secret.
+-- Payload on 'confmgr_changes': {"kind": "client", "path": "<client_id>", "version": null}
+
+create or replace function core.fn_notify_client_change()
+returns trigger language plpgsql as $$
+begin
+  if tg_op in ('UPDATE', 'DELETE') then
+    perform pg_notify(
+      'confmgr_changes',
+      json_build_object('kind', 'client', 'path', old.client_id, 'version', null)::text
+    );
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    perform pg_notify(
+      'confmgr_changes',
+      json_build_object('kind', 'client', 'path', new.client_id, 'version', null)::text
+    );
+  end if;
+  return null;
+end
+$$;
+
+drop trigger if exists trg_api_clients_notify on core.api_clients;
+create trigger trg_api_clients_notify
+after insert or update or delete on core.api_clients
+for each row execute function core.fn_notify_client_change();
@@ -0,0 +1,27 @@
+-- 77_envelope_keys.sql
+-- Purpose: envelope encryption for secrets (backend/app/crypto.py).
+-- Each secret item gets a data key (DEK), stored wrapped by a master key
+-- identified by kek_id. Versions sealed with the DEK use alg 'AES256-GCM-ENV';
+-- existing 'AES256-GCM' rows (sealed with DATA_KEY_HEX) stay readable.
+-- Master key rotation re-wraps only wrapped_dek: python -m app.rekey
+
+alter table core.secret_items
+  add column if not exists kek_id      text,
+  add column if not exists dek_nonce   bytea,
+  add column if not exists wrapped_dek bytea;
+
+alter table core.secret_items drop constraint if exists secret_items_dek_ck;
+alter table core.secret_items add constraint secret_items_dek_ck
+  check ((kek_id is null) = (wrapped_dek is null) and (kek_id is null) = (dek_nonce is null));
+
+alter table core.secret_versions drop constraint if exists secret_alg_ck;
+alter table core.secret_versions add constraint secret_alg_ck
+  check (alg in ('AES256-GCM', 'AES256-GCM-ENV'));
+
+-- Re-key scans items still wrapped by an old master key, in id order
+create index if not exists ix_secret_items_kek
+  on core.secret_items (kek_id, id) where kek_id is not null;
+
+-- Legacy migration (rekey --migrate-legacy) finds versions not yet on a DEK
+create index if not exists ix_secret_versions_legacy
+  on core.secret_versions (item_id) where alg = 'AES256-GCM';
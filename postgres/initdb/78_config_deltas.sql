@@ -0,0 +1,24 @@
+-- 78_config_deltas.sql
+-- Purpose: delta-encoded config history (backend/app/history.py).
+-- storage = 'full'  -> value_json holds the document (every current row)
+-- storage = 'delta' -> delta holds a JSON Patch that turns the next higher
+--                      version's value into this one; value_json is null
+-- Rows start as 'full'; the compactor (CONFIG_STORAGE=delta or
+-- python -m app.history) rewrites old ones, keeping a full snapshot every
+-- CONFIG_SNAPSHOT_INTERVAL versions.
+
+alter table core.config_versions
+  add column if not exists storage text not null default 'full',
+  add column if not exists delta   jsonb;
+
+alter table core.config_versions alter column value_json drop not null;
+
+alter table core.config_versions drop constraint if exists config_versions_storage_ck;
+alter table core.config_versions add constraint config_versions_storage_ck check (
+  (storage = 'full'  and value_json is not null and delta is null) or
+  (storage = 'delta' and value_json is null and delta is not null and not is_current)
+);
+
+-- Compactor scan: only rows that still hold a full copy of an old version
+create index if not exists ix_config_versions_compactable
+  on core.config_versions (item_id, version) where storage = 'full' and not is_current;
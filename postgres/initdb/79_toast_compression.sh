@@ -0,0 +1,43 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+# 79_toast_compression.sh
+# Purpose: cheaper storage for large values (runs only on first cluster init).
+# * Secret ciphertext is incompressible (the backend compresses before
+#   sealing, backend/app/crypto.py), so TOAST should not try: EXTERNAL stores
+#   large values out of line without a compression attempt. Always applied.
+# * Config documents stay jsonb (GIN index, server-side queries), so they are
+#   compressed by TOAST. TOAST_COMPRESSION=lz4 switches them from the default
+#   pglz to lz4: much faster at a similar ratio, but it needs a server built
+#   with lz4 (the official images are), and dumps restored onto a server
+#   without it fall back to pglz. Opt-in; compare first with
+#   `python -m bench.bench_compression --db`.
+# Applies to newly written rows; VACUUM FULL rewrites existing ones.
+: "${POSTGRES_DB:=postgres}"
+: "${POSTGRES_USER:=postgres}"
+TOAST_COMPRESSION="${TOAST_COMPRESSION:-pglz}"
+
+psql -v ON_ERROR_STOP=1 -U "$POSTGRES_USER" -d "$POSTGRES_DB" <<'SQL'
+alter table core.secret_versions alter column ciphertext set storage external;
+SQL
+
+if [[ "$TOAST_COMPRESSION" != "lz4" ]]; then
+  echo "[toast] config_versions keeps ${TOAST_COMPRESSION} (TOAST_COMPRESSION=lz4 to switch)"
+  exit 0
+fi
+
+psql -v ON_ERROR_STOP=1 -U "$POSTGRES_USER" -d "$POSTGRES_DB" <<'SQL'
+do $$
+begin
+  if exists (
+    select 1 from pg_settings
+     where name = 'default_toast_compression' and 'lz4' = any(enumvals)
+  ) then
+    alter table core.config_versions alter column value_json set compression lz4;
+    alter table core.config_versions alter column delta set compression lz4;
+  else
+    raise notice 'lz4 not available, config_versions keeps pglz';
+  end if;
+end
+$$;
+SQL
@@ -0,0 +1,11 @@
+-- 80_secret_versions_meta.sql
+-- Purpose: serve GET /secret/{path}:versions (metadata only) with an
+-- index-only scan. ix_secret_item_ver_desc gets the listed columns as INCLUDE
+-- payload, so a page never touches the heap rows holding the ciphertext.
+-- The wider index answers every (item_id, version desc) lookup the old one did.
+
+create index if not exists ix_secret_item_ver_desc_meta
+  on core.secret_versions (item_id, version desc)
+  include (is_current, alg, created_at, created_by);
+
+drop index if exists core.ix_secret_item_ver_desc;
@@ -0,0 +1,7 @@
+-- 81_audit_sink_grants.sql
+-- Purpose: let the background audit sink (backend/app/audit.py) COPY into
+-- audit.audit_logs as confmgr_db. The role already has INSERT on the table,
+-- but the id default calls nextval() on its bigserial sequence, which only the
+-- SECURITY DEFINER audit.log_event could do so far.
+
+grant usage on sequence audit.audit_logs_id_seq to confmgr_db;